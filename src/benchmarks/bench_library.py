@@ -0,0 +1,298 @@
+"""
+Micro-benchmarks for the CPU hot paths in library/ and the agents' prompt building
+
+Covers signing a user operation, encoding the USDC transfer call data,
+checksumming addresses, parsing balance and transaction responses, building
+the tools schema, compacting tool output and building the prompts of both
+agents. Everything runs offline with realistic inputs; no API is called.
+
+Each benchmark is timed with timeit (best of --repeat runs, loops calibrated
+to about 0.2s) and compared against a stored baseline. A benchmark slower
+than the baseline by more than --threshold is reported as a regression and
+the script exits with status 1. Baselines depend on the machine and Python
+version, so record one before making a change and compare on the same host.
+
+Usage:
+    python3 bench_library.py --save-baseline      # record baseline.json
+    python3 bench_library.py                      # compare against it
+    python3 bench_library.py --only sign parse --threshold 0.1
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+# The agents check for these at startup; nothing here talks to the APIs
+for name in ["CROSSMINT_SERVER_API_KEY", "OPENAI_API_KEY"]:
+    os.environ.setdefault(name, "bench")
+os.environ.setdefault("SIGNER_PRIVATE_KEY", "0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318")
+os.environ.setdefault("SIGNER_ADDRESS", "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23")
+# Keep the assistant agent's state file out of the real session state
+os.environ["AGENT_STATE_PATH"] = os.path.join(tempfile.mkdtemp(), "assistant_state.json")
+
+from web3 import Web3
+
+from library.tool_output import compact_tool_output
+from library.tools_schema import tools_schema
+from library.wallet_utils import encode_usdc_transfer, generate_signature, parse_usdc_balance
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+USER_OP_HASH = "0x9c1f2b7e5d0a3f4c8b6e1d2a7f3c5e9b0d4a6c8e2f1b3d5a7c9e0f2a4b6c8d0e"
+ADDRESS = "0x5b20a88375a7ae6d3d1efae9a86cc7225006518d"
+
+BALANCES_RESPONSE = json.dumps([
+    {"token": "eth", "decimals": 18, "balances": {"base-sepolia": "1250000000000000", "total": "1250000000000000"}},
+    {"token": "usdc", "decimals": 6, "balances": {"base-sepolia": "0", "total": "0"}},
+    {"token": "usdxm", "decimals": 6, "balances": {"base-sepolia": "105000000", "total": "105000000"}}
+])
+
+TRANSACTION_RESPONSE = json.dumps({
+    "id": "1b6c0e0a-6d6e-4f3b-9d1c-3f0a2b4c5d6e",
+    "walletType": "evm-smart-wallet",
+    "status": "success",
+    "approvals": {
+        "pending": [],
+        "submitted": [{
+            "signer": "evm-keypair:0x2c7536E3605D9C16a7a3D7b1898e529396a65c23",
+            "signature": "0x" + "ab" * 65,
+            "submittedAt": "2026-10-19T10:00:00.000Z"
+        }]
+    },
+    "params": {
+        "calls": [{
+            "to": "0x14196F08a4Fa0B66B7331bC40dd6bCd8A1dEeA9F",
+            "value": "0",
+            "data": encode_usdc_transfer(Web3.to_checksum_address(ADDRESS), 2_000_000)
+        }],
+        "chain": "base-sepolia"
+    },
+    "onChain": {
+        "userOperationHash": USER_OP_HASH,
+        "userOperation": {
+            "sender": "0x7a3c2b1d0e9f8a7b6c5d4e3f2a1b0c9d8e7f6a5b",
+            "nonce": "0x1",
+            "callData": "0x" + "00" * 228,
+            "callGasLimit": "0x1d4c0",
+            "verificationGasLimit": "0x5b8d8",
+            "preVerificationGas": "0xc350",
+            "maxFeePerGas": "0x59682f00",
+            "maxPriorityFeePerGas": "0x3b9aca00",
+            "paymasterAndData": "0x" + "cd" * 148,
+            "signature": "0x"
+        },
+        "txId": "0x" + "ef" * 32
+    },
+    "createdAt": "2026-10-19T10:00:00.000Z"
+})
+
+
+def _load_module(name: str, relative_path: str):
+    """Import one of the agents' run.py files under a unique module name"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(project_root, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_generate_signature():
+    private_key = os.environ["SIGNER_PRIVATE_KEY"]
+    return lambda: generate_signature(private_key, USER_OP_HASH)
+
+
+def bench_encode_usdc_transfer():
+    to_address = Web3.to_checksum_address(ADDRESS)
+    return lambda: encode_usdc_transfer(to_address, 2_000_000)
+
+
+def bench_to_checksum_address():
+    return lambda: Web3.to_checksum_address(ADDRESS)
+
+
+def bench_parse_balance_response():
+    return lambda: parse_usdc_balance(json.loads(BALANCES_RESPONSE), "base-sepolia")
+
+
+def bench_parse_transaction_response():
+    return lambda: json.loads(TRANSACTION_RESPONSE)
+
+
+def bench_tools_schema():
+    return tools_schema
+
+
+def bench_compact_tool_output():
+    result = {"status": "success", "timestamp": "2026-10-19T10:00:00", "transaction_data": json.loads(TRANSACTION_RESPONSE)}
+    return lambda: compact_tool_output("transfer_usdc", result)
+
+
+def bench_cli_prompt():
+    """The chat completions request built for each turn, with three wallets and a warm history"""
+    cli_run = _load_module("bench_cli_run", "cli-hello-world/run.py")
+    agent = cli_run.CryptoAIAgent(interactive=False)
+    agent.response_cache = None
+    agent.wallets.extend([{"address": Web3.to_checksum_address(f"0x{i:040x}"), "type": "evm-smart-wallet"} for i in range(1, 4)])
+
+    result = {"status": "success", "timestamp": "2026-10-19T10:00:00", "transaction_data": json.loads(TRANSACTION_RESPONSE)}
+    transaction = compact_tool_output("transfer_usdc", result)
+    for i in range(6):
+        agent.chat_history.add_user_message(f"Transfer {i + 1} USDC from wallet 1 to wallet 2")
+        agent.chat_history.add_assistant_message({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{i}",
+                "type": "function",
+                "function": {"name": "transfer_usdc", "arguments": json.dumps({"amount": i + 1})}
+            }]
+        })
+        agent.chat_history.add_tool_result(f"call_{i}", transaction)
+        agent.chat_history.add_assistant_message({"role": "assistant", "content": f"Sent {i + 1} USDC."})
+
+    # Building the request doesn't record the turn, so every call sees the same history
+    return lambda: agent._prepare_chat_request("What is the balance of wallet 2?")
+
+
+def bench_assistant_fingerprint():
+    """The assistant agent hashes its model, instructions and tools to reuse the assistant"""
+    assistant_run = _load_module("bench_assistant_run", "openai_assistant-hello-world/run.py")
+    return lambda: assistant_run.assistant_fingerprint(
+        assistant_run.ASSISTANT_MODEL, assistant_run.ASSISTANT_INSTRUCTIONS, tools_schema())
+
+
+BENCHMARKS = {
+    "generate_signature": bench_generate_signature,
+    "encode_usdc_transfer": bench_encode_usdc_transfer,
+    "to_checksum_address": bench_to_checksum_address,
+    "parse_balance_response": bench_parse_balance_response,
+    "parse_transaction_response": bench_parse_transaction_response,
+    "tools_schema": bench_tools_schema,
+    "compact_tool_output": bench_compact_tool_output,
+    "cli_prompt": bench_cli_prompt,
+    "assistant_fingerprint": bench_assistant_fingerprint,
+}
+
+
+def measure(func, repeat: int = 5, min_time: float = 0.2) -> dict:
+    """Best and median time per call in microseconds"""
+    timer = timeit.Timer(func)
+    func()
+    loops, elapsed = timer.autorange()
+    # autorange stops at 0.2s, scale up when asked for longer runs
+    loops = max(1, int(loops * min_time / 0.2)) if elapsed else loops
+    runs = [total / loops * 1e6 for total in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "best_us": round(min(runs), 3),
+        "median_us": round(statistics.median(runs), 3),
+        "loops": loops
+    }
+
+
+def run_benchmarks(names: list, repeat: int = 5, min_time: float = 0.2) -> dict:
+    results = {}
+    for name in names:
+        print(f"\r{name:<30}", end="", file=sys.stderr, flush=True)
+        results[name] = measure(BENCHMARKS[name](), repeat, min_time)
+    print("\r" + " " * 30 + "\r", end="", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> dict:
+    """
+    Compare best times against the baseline
+
+    Returns:
+        dict: Change per benchmark (e.g. 0.3 = 30% slower) and the names that
+        got slower or faster by more than threshold
+    """
+    changes = {}
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous:
+            changes[name] = result["best_us"] / previous["best_us"] - 1
+    return {
+        "changes": changes,
+        "regressions": [name for name, change in changes.items() if change > threshold],
+        "improvements": [name for name, change in changes.items() if change < -threshold]
+    }
+
+
+def print_results(results: dict, comparison: dict = None):
+    comparison = comparison or {"changes": {}, "regressions": [], "improvements": []}
+    print(f"\n{'benchmark':<28} {'best us':>10} {'median us':>10} {'vs base':>9}")
+    for name, result in results.items():
+        change = comparison["changes"].get(name)
+        delta = f"{change:+.1%}" if change is not None else "new"
+        flag = " REGRESSION" if name in comparison["regressions"] else ""
+        print(f"{name:<28} {result['best_us']:>10.2f} {result['median_us']:>10.2f} {delta:>9}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the library hot paths and compare with a baseline")
+    parser.add_argument("--only", nargs="+", metavar="NAME",
+                        help="Run the benchmarks whose name contains one of these strings")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown against the baseline reported as a regression (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark, the best one counts")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Approximate seconds per timed run")
+    parser.add_argument("--output", help="Also write the results and comparison as JSON to this file")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.only or any(part in name for part in args.only)]
+    if not names:
+        parser.error(f"No benchmark matches {args.only}, choose from: {', '.join(BENCHMARKS)}")
+
+    results = run_benchmarks(names, args.repeat, args.min_time)
+    environment = {"python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform()}
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        # Keep the entries of benchmarks that were not run this time
+        merged = {**baseline.get("results", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump({**environment, "recorded_at": datetime.utcnow().isoformat(), "results": merged}, f, indent=2)
+        print_results(results)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("python") != environment["python"] or baseline.get("machine") != environment["machine"]:
+            print(f"Warning: baseline was recorded on Python {baseline.get('python')} ({baseline.get('machine')}), "
+                  f"results may not be comparable", file=sys.stderr)
+    else:
+        print(f"No baseline at {args.baseline}, run with --save-baseline first", file=sys.stderr)
+
+    comparison = compare(results, baseline, args.threshold)
+    print_results(results, comparison)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({**environment, "results": results, **comparison}, f, indent=2)
+
+    if comparison["regressions"]:
+        print(f"\n{len(comparison['regressions'])} benchmark(s) more than {args.threshold:.0%} slower than the baseline: "
+              f"{', '.join(comparison['regressions'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Headless batch mode for CryptoAIAgent
+
+Reads one session per JSONL line from a file (or stdin) and runs the sessions
+concurrently, each with its own agent. Results and timings are written as JSONL.
+
+Input line format:
+    {"id": "s1", "prompts": ["Create an evm wallet", "Create a transaction"],
+     "wallet_address": "0x...", "wallets": [{"address": "0x...", "type": "evm-smart-wallet"}]}
+
+"prompt" may be used instead of "prompts" for single-turn sessions. The
+optional "wallet_address" answers wallet selection prompts, and "wallets"
+pre-loads tracked wallets into the session.
+
+Usage:
+    python3 batch.py prompts.jsonl --workers 4 --output results.jsonl
+    cat prompts.jsonl | python3 batch.py - > results.jsonl
+
+Crossmint calls are sent as bulk requests by default, so interactive agents
+sharing the API key and process quota keep their reserved capacity.
+"""
+import argparse
+import contextlib
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from run import CryptoAIAgent
+from library.request_scheduler import PRIORITIES
+from library.transaction_waiter import start_webhook_receiver
+from library.wallet_utils import get_scheduler, prewarm_in_background
+
+
+def read_sessions(source):
+    """
+    Parse JSONL session records, skipping blank lines
+
+    A line that isn't a JSON object is kept as a record with a "parse_error",
+    so it is reported as a failed session instead of aborting the batch.
+    """
+    sessions = []
+    for line_number, line in enumerate(source, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            sessions.append({"id": f"line-{line_number}", "line": line_number,
+                             "parse_error": f"Malformed session on line {line_number}: {e}"})
+            continue
+        record.setdefault("id", f"line-{line_number}")
+        if "prompts" not in record:
+            record["prompts"] = [record["prompt"]] if record.get("prompt") else []
+        sessions.append(record)
+    return sessions
+
+
+def run_session(record: dict, priority: str = "bulk") -> dict:
+    """Run every prompt of a session against a fresh, non-interactive agent"""
+    if "parse_error" in record:
+        return {
+            "id": record["id"],
+            "line": record["line"],
+            "status": "error",
+            "error": record["parse_error"],
+            "turns": [],
+            "usage": None,
+            "duration_s": 0.0
+        }
+
+    session_start = time.perf_counter()
+    turns = []
+    agent = None
+
+    try:
+        agent = CryptoAIAgent(interactive=False, priority=priority)
+        agent.wallets.extend(record.get("wallets", []))
+
+        for prompt in record["prompts"]:
+            turn_start = time.perf_counter()
+            response = agent.chat_completion(prompt)
+            llm_seconds = time.perf_counter() - turn_start
+
+            tool_calls = []
+            for tool_call in response.tool_calls or []:
+                args = json.loads(tool_call.function.arguments)
+                if tool_call.function.name == "create_transaction" and not args.get("wallet_address"):
+                    args["wallet_address"] = record.get("wallet_address")
+
+                tool_start = time.perf_counter()
+                result = agent.execute_tool_call(tool_call.function.name, args)
+                agent.remember_tool_result(tool_call, result)
+                tool_calls.append({
+                    "name": tool_call.function.name,
+                    "arguments": args,
+                    "status": (result or {}).get("status"),
+                    "result": result,
+                    "duration_s": round(time.perf_counter() - tool_start, 3)
+                })
+
+            turns.append({
+                "prompt": prompt,
+                "response": response.content,
+                "tool_calls": tool_calls,
+                "llm_duration_s": round(llm_seconds, 3),
+                "duration_s": round(time.perf_counter() - turn_start, 3)
+            })
+
+        status = "success"
+        error = None
+        usage = agent.usage.snapshot()["session"]
+        usage["fast_path"] = agent.fast_path_stats()
+
+    except Exception as e:
+        status = "error"
+        error = str(e)
+        usage = None
+
+    finally:
+        if agent is not None:
+            agent.memory.close()
+
+    return {
+        "id": record["id"],
+        "status": status,
+        "error": error,
+        "turns": turns,
+        "usage": usage,
+        "duration_s": round(time.perf_counter() - session_start, 3)
+    }
+
+
+def run_batch(sessions: list, workers: int, output, priority: str = "bulk") -> dict:
+    """
+    Run sessions on a bounded worker pool, writing each result as it finishes
+
+    Returns:
+        dict: Summary with session counts and wall clock time
+    """
+    write_lock = threading.Lock()
+    counts = {"success": 0, "error": 0}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_session, record, priority) for record in sessions]
+        for future in as_completed(futures):
+            result = future.result()
+            counts[result["status"]] += 1
+            with write_lock:
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+
+    return {
+        "sessions": len(sessions),
+        "succeeded": counts["success"],
+        "failed": counts["error"],
+        "workers": workers,
+        "duration_s": round(time.perf_counter() - start, 3),
+        "crossmint_requests": get_scheduler().stats()["classes"][priority]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run CryptoAIAgent sessions from a JSONL file")
+    parser.add_argument("input", help="JSONL file with one session per line, or '-' for stdin")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent sessions")
+    parser.add_argument("--output", help="Where to write JSONL results (default: stdout)")
+    parser.add_argument("--priority", choices=PRIORITIES, default="bulk", help="Request class of the Crossmint calls")
+    args = parser.parse_args()
+
+    if args.input == "-":
+        sessions = read_sessions(sys.stdin)
+    else:
+        with open(args.input) as f:
+            sessions = read_sessions(f)
+
+    output = open(args.output, "w") if args.output else sys.stdout
+
+    # One warm Crossmint connection per worker before the sessions start
+    prewarm_in_background(connections=args.workers)
+    start_webhook_receiver()
+
+    # Agent progress messages go to stderr so stdout stays valid JSONL
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_batch(sessions, args.workers, output, args.priority)
+
+    if args.output:
+        output.close()
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
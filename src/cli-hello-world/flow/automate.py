@@ -1,8 +1,8 @@
+import argparse
 import os
 import sys
 from pathlib import Path
 import json
-import time
 from dotenv import load_dotenv
 
 project_root = str(Path(__file__).parent.parent.parent)
@@ -10,100 +10,160 @@ sys.path.append(project_root)
 
 from library.wallet_utils import (
     create_wallet,
-    transfer_usdc,
-    get_transaction,
-    get_usdc_from_faucet,
-    get_wallet_balance
+    transfer_usdc
 )
+from library.faucet_scheduler import FaucetScheduler, get_faucet_scheduler
+from library.transaction_waiter import get_transaction_waiter, start_webhook_receiver
+from library.ledger import USDC_BASE_UNITS, WalletLedger
+from library.flow_dag import FlowCheckpoint, FlowExecutor, FlowStep
+from library import profiling
 load_dotenv()
 
-
-def automate_wallet_flow():
-    try:
-        api_key = os.getenv('CROSSMINT_SERVER_API_KEY')
-        signer_address = os.getenv('SIGNER_ADDRESS')
-        private_key = os.getenv('SIGNER_PRIVATE_KEY')
-
-        # Step 1: Create first wallet
-        print("\n1. Creating First EVM Smart Wallet...")
-        wallet1_response = create_wallet(api_key, "evm-smart-wallet", signer_address)
-
-        if wallet1_response.get("status") != "success":
-            raise Exception(f"First wallet creation failed: {wallet1_response.get('error')}")
-
-        wallet1_address = wallet1_response.get("wallet_data", {}).get("address")
-        if not wallet1_address:
-            raise Exception("First wallet address not found in response")
-        print(f"First wallet created successfully: {wallet1_address}")
-
-        # Step 2: Create second wallet
-        print("\n2. Creating Second EVM Smart Wallet...")
-        wallet2_response = create_wallet(api_key, "evm-smart-wallet", signer_address)
-
-        if wallet2_response.get("status") != "success":
-            raise Exception(f"Second wallet creation failed: {wallet2_response.get('error')}")
-
-        wallet2_address = wallet2_response.get("wallet_data", {}).get("address")
-        if not wallet2_address:
-            raise Exception("Second wallet address not found in response")
-        print(f"Second wallet created successfully: {wallet2_address}")
-
-        # Step 3: Get USDC from faucet for first wallet
-        fund_amount = 100
-        print(f"\n3. Getting {fund_amount} USDC from faucet for first wallet...")
-        faucet_response = get_usdc_from_faucet(api_key, "base-sepolia", wallet1_address, fund_amount)
-        if faucet_response.get("status") != "success":
-            raise Exception(f"Failed to get USDC from faucet: {faucet_response.get('error')}")
-
-        # Wait and check balance of first wallet
-        print("Waiting for faucet transaction to process...")
-        time.sleep(5)
-
-        # Step 4: Transfer half of USDC to second wallet
+DEFAULT_STATE_PATH = os.getenv("AUTOMATE_STATE_PATH", ".automate_state.json")
+DEFAULT_LEDGER_PATH = os.getenv("WALLET_LEDGER_PATH", ".wallet_ledger.sqlite3")
+
+
+def _require_success(response: dict, what: str) -> dict:
+    if response.get("status") != "success":
+        raise Exception(f"{what} failed: {response.get('error')}")
+    return response
+
+
+def build_flow_steps(api_key: str, signer_address: str, private_key: str, ledger: WalletLedger,
+                     fund_amount: int = 100, transfer_timeout: float = 120,
+                     faucet_scheduler: FaucetScheduler = None, transaction_waiter=None) -> list:
+    """
+    The wallet flow as a dependency graph
+
+    The two wallet creations run in parallel. Funding goes through the faucet
+    scheduler and completes once the USDC shows up in the balance. The wait
+    for the transfer is its own step so it shows up on the waterfall; the
+    transaction waiter returns once the transaction is final, from a status
+    webhook when one is configured or by polling otherwise. The final step
+    reconciles both wallets against the ledger, which must be attached to
+    record the flow's faucet credit and transfer; the caller owns it and
+    detaches it once its flows are done.
+    """
+    faucet_scheduler = faucet_scheduler or get_faucet_scheduler(api_key, "base-sepolia")
+    transaction_waiter = transaction_waiter or get_transaction_waiter(api_key)
+
+    def create_wallet_step(label):
+        def step(outputs):
+            print(f"\nCreating {label} EVM Smart Wallet...")
+            response = _require_success(create_wallet(api_key, "evm-smart-wallet", signer_address), f"{label} wallet creation")
+            address = response.get("wallet_data", {}).get("address")
+            if not address:
+                raise Exception(f"{label} wallet address not found in response")
+            print(f"{label} wallet created successfully: {address}")
+            return address
+        return step
+
+    def fund_wallet1(outputs):
+        print(f"\nGetting {fund_amount} USDC from faucet for first wallet...")
+        future = faucet_scheduler.request(outputs["create_wallet1"], fund_amount)
+        with profiling.span("wait for faucet funds", "sleep"):
+            result = faucet_scheduler.wait(future)
+        return _require_success(result, "Getting USDC from faucet")
+
+    def transfer(outputs):
         # Convert to base units (1 USDC = 1,000,000 base units)
         transfer_amount = (fund_amount * 1000000) / 2
-        print(f"\n4. Transferring {transfer_amount / 1000000} USDC to second wallet...")
-        transaction_response = transfer_usdc(
+        print(f"\nTransferring {transfer_amount / 1000000} USDC to second wallet...")
+        response = _require_success(transfer_usdc(
             api_key,
-            wallet1_address,
-            wallet2_address,
+            outputs["create_wallet1"],
+            outputs["create_wallet2"],
             int(transfer_amount),  # Convert to integer since we need whole base units
             "base-sepolia",
             private_key
-        )
-
-        if transaction_response.get("status") != "success":
-            raise Exception(f"Transaction creation failed: {transaction_response.get('error')}")
+        ), "Transaction creation")
 
-        transaction_data = transaction_response.get("transaction_data", {})
-        transaction_id = transaction_data.get("id")
+        transaction_id = response.get("transaction_data", {}).get("id")
         if not transaction_id:
             raise Exception("Transaction ID not found in response")
-
         print(f"Transaction created successfully. ID: {transaction_id}")
+        return transaction_id
+
+    def wait_for_transfer(outputs):
+        print("Waiting for transaction to process...")
+        return _require_success(
+            transaction_waiter.wait(outputs["create_wallet1"], outputs["transfer"], transfer_timeout),
+            "Waiting for the transaction"
+        )
 
-        # Wait for transaction to process
-        print("\n7. Verifying transaction and final balances...")
-        time.sleep(10)
+    def verify_transaction(outputs):
+        print("\nVerifying transaction...")
+        response = outputs["wait_for_transfer"]
+        status = response["transaction_data"].get("status")
+        if status != "success":
+            raise Exception(f"Transaction verification failed: transaction {status}")
+        return response
+
+    def reconcile(outputs):
+        # Only the wallets this flow touched are fetched, not every wallet in the ledger
+        print("\nReconciling balances with the ledger...")
+        wallets = [outputs["create_wallet1"], outputs["create_wallet2"]]
+        report = ledger.reconcile(api_key, "base-sepolia", wallets=wallets)
+        if report["errors"]:
+            raise Exception(f"Getting balances failed: {report['errors'][0]['error']}")
+        for wallet in wallets:
+            report["balances"].setdefault(wallet.lower(), ledger.expected_balance(wallet) / USDC_BASE_UNITS)
+        for mismatch in report["mismatches"]:
+            print(f"Balance mismatch for {mismatch['wallet_address']}: "
+                  f"expected {mismatch['expected']} USDC, observed {mismatch['observed']} USDC")
+        return report
+
+    return [
+        FlowStep("create_wallet1", create_wallet_step("First")),
+        FlowStep("create_wallet2", create_wallet_step("Second")),
+        FlowStep("fund_wallet1", fund_wallet1, ["create_wallet1"]),
+        FlowStep("transfer", transfer, ["fund_wallet1", "create_wallet2"]),
+        # Reads are run again on a resumed run rather than reusing stale statuses and balances
+        FlowStep("wait_for_transfer", wait_for_transfer, ["transfer"], checkpoint=False),
+        # A failed transaction is final, forget it so a resumed run sends a new transfer
+        FlowStep("verify_transaction", verify_transaction, ["wait_for_transfer"], checkpoint=False, resets=["transfer"]),
+        FlowStep("reconcile", reconcile, ["verify_transaction"], checkpoint=False),
+    ]
+
+
+def automate_wallet_flow(show_waterfall: bool = True, state_path: str = DEFAULT_STATE_PATH, fresh: bool = False,
+                         ledger_path: str = DEFAULT_LEDGER_PATH):
+    """
+    Run the wallet flow, resuming from the checkpoint at state_path if a previous run failed
+
+    Completed steps (wallets, faucet funding, the transfer) are skipped on a
+    rerun. The checkpoint is removed once the flow succeeds, or up front
+    when fresh is set. Pass state_path=None to disable checkpointing.
+    Faucet credits and transfers are recorded in the ledger at ledger_path.
+    """
+    executor = None
+    ledger = WalletLedger(ledger_path).attach()
+    try:
+        api_key = os.getenv('CROSSMINT_SERVER_API_KEY')
+        signer_address = os.getenv('SIGNER_ADDRESS')
+        private_key = os.getenv('SIGNER_PRIVATE_KEY')
 
-        transaction_status = get_transaction(api_key, wallet1_address, transaction_id)
-        if transaction_status.get("status") != "success":
-            raise Exception(f"Transaction verification failed: {transaction_status.get('error')}")
+        checkpoint = FlowCheckpoint(state_path, "automate_wallet_flow", fresh=fresh) if state_path else None
+        if checkpoint is not None:
+            if checkpoint.outputs:
+                print(f"Resuming from {state_path}, skipping: {', '.join(checkpoint.outputs)}")
 
-        # Check final balances of both wallets
-        print("\nChecking final balances...")
-        wallet1_final = get_wallet_balance(api_key, "base-sepolia", wallet1_address)
-        if wallet1_final.get("status") != "success":
-            raise Exception(f"Failed to get wallet1 balance: {wallet1_final.get('error')}")
+        executor = FlowExecutor(build_flow_steps(api_key, signer_address, private_key, ledger=ledger), checkpoint=checkpoint)
+        with profiling.span("automate_wallet_flow", "flow"):
+            outputs = executor.run()
+        if checkpoint is not None:
+            checkpoint.clear()
 
-        wallet2_final = get_wallet_balance(api_key, "base-sepolia", wallet2_address)
-        if wallet2_final.get("status") != "success":
-            raise Exception(f"Failed to get wallet2 balance: {wallet2_final.get('error')}")
+        wallet1_address = outputs["create_wallet1"]
+        wallet2_address = outputs["create_wallet2"]
+        reconciliation = outputs["reconcile"]
+        wallet1_balance = reconciliation["balances"][wallet1_address.lower()]
+        wallet2_balance = reconciliation["balances"][wallet2_address.lower()]
 
         print(f"\nWallet 1 (was funded with USDC from faucet): {wallet1_address}")
-        print(f"Final First Wallet Balance: {wallet1_final.get('balance')} USDC")
+        print(f"Final First Wallet Balance: {wallet1_balance} USDC")
         print(f"\nWallet 2 (received USDC from first wallet): {wallet2_address}")
-        print(f"Final Second Wallet Balance: {wallet2_final.get('balance')} USDC")
+        print(f"Final Second Wallet Balance: {wallet2_balance} USDC")
 
         return {
             "status": "success",
@@ -111,10 +171,11 @@ def automate_wallet_flow():
             "data": {
                 "wallet1_address": wallet1_address,
                 "wallet2_address": wallet2_address,
-                "transaction_id": transaction_id,
-                "final_status": transaction_status,
-                "wallet1_final_balance": wallet1_final.get("balance"),
-                "wallet2_final_balance": wallet2_final.get("balance"),
+                "transaction_id": outputs["transfer"],
+                "final_status": outputs["verify_transaction"],
+                "wallet1_final_balance": wallet1_balance,
+                "wallet2_final_balance": wallet2_balance,
+                "balance_mismatches": reconciliation["mismatches"],
                 "explorer_links": {
                     "wallet1": f"https://sepolia.basescan.org/address/{wallet1_address}#tokentxns",
                     "wallet2": f"https://sepolia.basescan.org/address/{wallet2_address}#tokentxns"
@@ -128,8 +189,38 @@ def automate_wallet_flow():
             "message": str(e)
         }
 
+    finally:
+        ledger.close()
+        if show_waterfall and executor is not None and executor.timings:
+            executor.print_waterfall()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the automated wallet flow")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Checkpoint file used to resume a failed run")
+    parser.add_argument("--fresh", action="store_true", help="Ignore any checkpoint and start from scratch")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER_PATH, help="Ledger of faucet credits and transfers")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Only reconcile the wallets whose expected balance changed, then exit")
+    parser.add_argument("--profile", nargs="?", const="profile_trace.json", metavar="TRACE",
+                        help="Record a span profile and write it to TRACE (.json for Chrome trace, .folded for flamegraph.pl)")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable(args.profile)
+    else:
+        profiling.enable_from_env()
+
+    if args.reconcile:
+        ledger = WalletLedger(args.ledger)
+        try:
+            report = ledger.reconcile(os.getenv('CROSSMINT_SERVER_API_KEY'))
+        finally:
+            ledger.close()
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report["mismatches"] or report["errors"] else 0)
+
     print("Starting automated wallet flow...")
-    result = automate_wallet_flow()
+    start_webhook_receiver()
+    result = automate_wallet_flow(state_path=args.state, fresh=args.fresh, ledger_path=args.ledger)
     print(f"\nFinal Result: {json.dumps(result, indent=2)}")
@@ -0,0 +1,296 @@
+"""
+Local stand-in for the Crossmint wallet endpoints used by library/wallet_utils.py
+
+Serves wallet creation, the USDC faucet, balances and transactions with
+approvals from memory, so flows can be exercised and load tested offline
+by pointing wallet_utils at it:
+
+    CROSSMINT_BASE_URL=http://127.0.0.1:8766 python3 automate.py
+
+Transfers are decoded from the transaction call data and applied to the
+balances once approved, and approved transactions report "success" after
+--settle-time seconds. --latency adds a delay to every request and
+--faucet-limit caps faucet calls per --faucet-window seconds with a 429.
+
+With --webhook-url and --webhook-secret, a signed transaction status
+callback (svix headers, like Crossmint's webhooks) is sent when an
+approved transaction settles. --webhook-drop-rate skips a fraction of the
+callbacks to exercise the receiver's fallback to polling.
+
+Usage:
+    python3 crossmint_stub.py --port 8766 --latency 0.05
+"""
+import argparse
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+project_root = str(Path(__file__).parent.parent.parent)
+sys.path.append(project_root)
+
+from library.transaction_waiter import sign_webhook
+
+TRANSFER_SELECTOR = "a9059cbb"
+
+
+def _random_hex(length: int) -> str:
+    return "0x" + secrets.token_hex(length // 2)
+
+
+class CrossmintStub:
+    """In-memory state of the stand-in: wallets, balances and transactions"""
+
+    def __init__(self, latency: float = 0.0, settle_time: float = 0.5, faucet_limit: int = 0,
+                 faucet_window: float = 60.0, error_rate: float = 0.0, webhook_url: str = None,
+                 webhook_secret: str = None, webhook_drop_rate: float = 0.0):
+        self.latency = latency
+        self.settle_time = settle_time
+        self.faucet_limit = faucet_limit
+        self.faucet_window = faucet_window
+        self.error_rate = error_rate
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.webhook_drop_rate = webhook_drop_rate
+        self.webhook_counts = Counter()
+        self.wallets = {}
+        self.balances = Counter()
+        self.transactions = {}
+        self.faucet_calls = deque()
+        self.request_counts = Counter()
+        self.lock = threading.RLock()
+
+    def create_wallet(self, body):
+        wallet = {
+            "type": body.get("type"),
+            "address": _random_hex(40),
+            "config": body.get("config", {}),
+            "createdAt": datetime.utcnow().isoformat()
+        }
+        with self.lock:
+            self.wallets[wallet["address"].lower()] = wallet
+        return 201, wallet
+
+    def faucet(self, address, body):
+        with self.lock:
+            now = time.monotonic()
+            while self.faucet_calls and self.faucet_calls[0] < now - self.faucet_window:
+                self.faucet_calls.popleft()
+            if self.faucet_limit and len(self.faucet_calls) >= self.faucet_limit:
+                return 429, {"error": True, "message": "Too many faucet requests, please try again later"}
+            self.faucet_calls.append(now)
+            self.balances[(address.lower(), body.get("chain"))] += int(body.get("amount", 0)) * 10**6
+        return 200, {"txId": _random_hex(64), "amount": body.get("amount"), "token": body.get("token")}
+
+    def balances_for(self, address, query):
+        chains = query.get("chains", [""])[0].split(",")
+        with self.lock:
+            balances = {chain: str(self.balances[(address.lower(), chain)]) for chain in chains if chain}
+        total = sum(int(value) for value in balances.values())
+        return 200, [{"token": "usdxm", "decimals": 6, "balances": dict(balances, total=str(total))}]
+
+    def create_transaction(self, address, body):
+        wallet = self.wallets.get(address.lower())
+        if wallet is None:
+            return 404, {"error": True, "message": f"Wallet {address} not found"}
+        signer = wallet["config"].get("adminSigner", {})
+        user_op_hash = _random_hex(64)
+        transaction = {
+            "id": str(uuid.uuid4()),
+            "walletType": wallet["type"],
+            "status": "awaiting-approval",
+            "approvals": {
+                "pending": [{"signer": f"{signer.get('type')}:{signer.get('address')}", "message": user_op_hash}],
+                "submitted": []
+            },
+            "params": body.get("params", {}),
+            "onChain": {"userOperationHash": user_op_hash},
+            "createdAt": datetime.utcnow().isoformat()
+        }
+        with self.lock:
+            self.transactions[transaction["id"]] = {"transaction": transaction, "sender": address.lower(), "settles_at": None}
+        return 201, transaction
+
+    def approve(self, transaction_id, body):
+        with self.lock:
+            entry = self.transactions.get(transaction_id)
+            if entry is None:
+                return 404, {"error": True, "message": f"Transaction {transaction_id} not found"}
+            transaction = entry["transaction"]
+            if transaction["status"] != "awaiting-approval":
+                return 400, {"error": True, "message": f"Transaction is {transaction['status']}"}
+
+            transaction["approvals"]["submitted"] = body.get("approvals", [])
+            transaction["approvals"]["pending"] = []
+            transaction["status"] = "pending"
+            entry["settles_at"] = time.monotonic() + self.settle_time
+            self._apply_calls(entry["sender"], transaction["params"])
+        if self.webhook_url:
+            timer = threading.Timer(self.settle_time, self._notify, [transaction_id])
+            timer.daemon = True
+            timer.start()
+        return 201, transaction
+
+    def _apply_calls(self, sender, params):
+        """Move balances for ERC-20 transfer calls"""
+        chain = params.get("chain")
+        for call in params.get("calls", []):
+            data = call.get("data", "")[2:]
+            if not data.startswith(TRANSFER_SELECTOR) or len(data) < 8 + 128:
+                continue
+            recipient = "0x" + data[8 + 24:8 + 64]
+            amount = int(data[8 + 64:8 + 128], 16)
+            self.balances[(sender, chain)] -= amount
+            self.balances[(recipient.lower(), chain)] += amount
+
+    def _settle(self, entry):
+        transaction = entry["transaction"]
+        if transaction["status"] == "pending" and time.monotonic() >= entry["settles_at"]:
+            transaction["status"] = "success"
+            transaction["onChain"]["txId"] = _random_hex(64)
+
+    def get_transaction(self, transaction_id):
+        with self.lock:
+            entry = self.transactions.get(transaction_id)
+            if entry is None:
+                return 404, {"error": True, "message": f"Transaction {transaction_id} not found"}
+            self._settle(entry)
+            return 200, entry["transaction"]
+
+    def _notify(self, transaction_id):
+        """Send the signed status callback of a settled transaction to webhook_url"""
+        with self.lock:
+            entry = self.transactions[transaction_id]
+            self._settle(entry)
+            transaction = json.loads(json.dumps(entry["transaction"]))
+        if self.webhook_drop_rate and random.random() < self.webhook_drop_rate:
+            with self.lock:
+                self.webhook_counts["dropped"] += 1
+            return
+
+        body = json.dumps({"type": f"wallets.transaction.{transaction['status']}", "data": transaction}).encode()
+        message_id = f"msg_{uuid.uuid4().hex}"
+        timestamp = int(time.time())
+        request = urllib.request.Request(self.webhook_url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "svix-id": message_id,
+            "svix-timestamp": str(timestamp),
+            "svix-signature": sign_webhook(self.webhook_secret, message_id, timestamp, body)
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                outcome = "sent"
+        except OSError:
+            outcome = "failed"
+        with self.lock:
+            self.webhook_counts[outcome] += 1
+
+
+def make_handler(stub: CrossmintStub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def _route(self, method):
+            url = urlparse(self.path)
+            # /api/<version>/wallets/...
+            parts = [p for p in url.path.split("/") if p][2:]
+            query = parse_qs(url.query)
+            body = self._body() if method == "POST" else {}
+            stub.request_counts[f"{method} {'/'.join('{id}' if i % 2 else p for i, p in enumerate(parts))}"] += 1
+
+            if stub.latency:
+                time.sleep(stub.latency * random.uniform(0.5, 1.5))
+            if stub.error_rate and random.random() < stub.error_rate:
+                return self._send_json(500, {"error": True, "message": "Injected server error"})
+
+            if parts == ["wallets"] and method == "POST":
+                return self._send_json(*stub.create_wallet(body))
+            if len(parts) == 3 and parts[2] == "balances":
+                if method == "POST":
+                    return self._send_json(*stub.faucet(parts[1], body))
+                return self._send_json(*stub.balances_for(parts[1], query))
+            if len(parts) == 3 and parts[2] == "transactions" and method == "POST":
+                return self._send_json(*stub.create_transaction(parts[1], body))
+            if len(parts) == 4 and parts[2] == "transactions" and method == "GET":
+                return self._send_json(*stub.get_transaction(parts[3]))
+            if len(parts) == 5 and parts[4] == "approvals" and method == "POST":
+                return self._send_json(*stub.approve(parts[3], body))
+
+            self._send_json(404, {"error": True, "message": f"Not implemented: {method} {url.path}"})
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(port: int = 0, **options):
+    """
+    Start the stand-in on a background thread
+
+    Returns:
+        tuple: (server, stub, base_url) to use as CROSSMINT_BASE_URL
+    """
+    stub = CrossmintStub(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Crossmint wallet API")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="Average seconds added to every request")
+    parser.add_argument("--settle-time", type=float, default=0.5, help="Seconds before an approved transaction succeeds")
+    parser.add_argument("--faucet-limit", type=int, default=0, help="Faucet calls allowed per window (0 = unlimited)")
+    parser.add_argument("--faucet-window", type=float, default=60.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail with a 500")
+    parser.add_argument("--webhook-url", help="Send transaction status callbacks to this URL")
+    parser.add_argument("--webhook-secret", help="Signing secret for the callbacks (whsec_...)")
+    parser.add_argument("--webhook-drop-rate", type=float, default=0.0, help="Fraction of callbacks not sent")
+    args = parser.parse_args()
+
+    server, stub, base_url = start_stub(
+        args.port,
+        latency=args.latency,
+        settle_time=args.settle_time,
+        faucet_limit=args.faucet_limit,
+        faucet_window=args.faucet_window,
+        error_rate=args.error_rate,
+        webhook_url=args.webhook_url,
+        webhook_secret=args.webhook_secret,
+        webhook_drop_rate=args.webhook_drop_rate
+    )
+    print(f"Crossmint stand-in listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,114 @@
+"""
+Query the operation journal written by wallet_utils
+
+Set CROSSMINT_JOURNAL_DIR when running the agents, flows or loadgen to
+record every Crossmint operation, then query the directory without loading
+the whole journal:
+
+    python3 journal_query.py journal/ stats
+    python3 journal_query.py journal/ latency --operation submit_approval --by hour --since 24h
+    python3 journal_query.py journal/ latency --by operation --json
+    python3 journal_query.py journal/ records --wallet 0x... --operation transfer
+    python3 journal_query.py journal/ records --transaction <transaction id>
+
+--since and --until take a relative age (30m, 24h, 7d) or an ISO date/time (UTC).
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent.parent)
+sys.path.append(project_root)
+
+from library.journal import OPERATIONS, JournalReader
+
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(value: str) -> float:
+    """Unix time from a relative age such as "24h" or an ISO date/time (UTC unless it has an offset)"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value)
+    if match:
+        return time.time() - float(match.group(1)) * _AGE_UNITS[match.group(2)]
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def print_latency(report: dict, percentiles: list):
+    columns = [f"p{pct:g}" for pct in percentiles]
+    print(f"{'group':<20} {'count':>8} {'errors':>7} " + " ".join(f"{column + ' s':>9}" for column in columns))
+    for key, entry in report.items():
+        values = " ".join(f"{entry[column + '_s']:>9.3f}" for column in columns)
+        print(f"{key:<20} {entry['count']:>8} {entry['errors']:>7} {values}")
+
+
+def print_records(records: list):
+    for record in records:
+        details = [record["wallet"]]
+        if record["counterparty"]:
+            details.append(f"-> {record['counterparty']}")
+        if record["amount"]:
+            details.append(f"{record['amount'] / 10**6:g} USDC")
+        if record["transaction_id"]:
+            details.append(record["transaction_id"])
+        if record["transaction_status"]:
+            details.append(f"({record['transaction_status']})")
+        print(f"{record['time'][:23]} {record['operation']:<18} {record['status']:<8} "
+              f"{record['duration_s']:>8.3f}s {' '.join(detail for detail in details if detail)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the wallet_utils operation journal")
+    parser.add_argument("directory", help="Journal directory (CROSSMINT_JOURNAL_DIR)")
+    parser.add_argument("query", choices=["latency", "records", "stats"])
+    parser.add_argument("--operation", choices=OPERATIONS, help="Only this operation")
+    parser.add_argument("--wallet", help="Only operations involving this wallet")
+    parser.add_argument("--transaction", help="Only operations on this transaction id")
+    parser.add_argument("--since", help="Only operations that ended at or after this time")
+    parser.add_argument("--until", help="Only operations that ended before this time")
+    parser.add_argument("--by", choices=["operation", "hour", "day"], help="Group latency by")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=[50, 95, 99])
+    parser.add_argument("--limit", type=int, help="Show at most this many records (the latest)")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    reader = JournalReader(args.directory)
+    if args.query == "stats":
+        print(json.dumps(reader.stats(), indent=2))
+        return
+
+    filters = {
+        "since": parse_time(args.since) if args.since else None,
+        "until": parse_time(args.until) if args.until else None,
+        "operation": args.operation,
+        "wallet": args.wallet,
+        "transaction_id": args.transaction
+    }
+
+    if args.query == "latency":
+        # Group by operation when no operation is picked, mixing them hides every one of them
+        group_by = args.by or (None if args.operation else "operation")
+        report = reader.latency(group_by, tuple(args.percentiles), **filters)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_latency(report, args.percentiles)
+        return
+
+    records = sorted(reader.scan(**filters), key=lambda record: record["time"])
+    if args.limit:
+        records = records[-args.limit:]
+    if args.json:
+        print(json.dumps(records, indent=2))
+    else:
+        print_records(records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Load generator for the automate.py wallet flow
+
+Runs N copies of the create -> fund -> transfer -> verify flow with a bounded
+number running at once, ramping the workers up over --ramp-up seconds.
+Reports throughput in cycles per minute, p50/p95/p99 latency for the whole
+flow and for each step, and a breakdown of errors, as a terminal summary
+and optionally as JSON.
+
+The flows' Crossmint calls are sent as bulk requests (--priority). With
+--probe-interval an interactive balance check runs alongside them, to see
+how long a user's request waits behind the load.
+
+Run it against a local stand-in API rather than staging, either one
+started separately (--base-url) or in-process (--stub). With --webhooks the
+in-process stand-in sends transaction status callbacks to a local receiver
+instead of the flows polling for the transfer status:
+
+    python3 loadgen.py --stub --flows 50 --concurrency 10 --ramp-up 5
+    python3 loadgen.py --stub --webhooks --flows 50 --concurrency 10
+    python3 loadgen.py --stub --flows 50 --concurrency 20 --max-in-flight 8 --probe-interval 0.5
+    python3 loadgen.py --base-url http://127.0.0.1:8766 --flows 20 --output load.json
+"""
+import argparse
+import base64
+import contextlib
+import json
+import math
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from automate import build_flow_steps
+from library import wallet_utils
+from library.endpoints import ENVIRONMENTS, CrossmintEndpoints
+from library.faucet_scheduler import FaucetScheduler
+from library.flow_dag import FlowExecutor
+from library.ledger import WalletLedger
+from library.request_scheduler import PRIORITIES, RequestScheduler, request_priority
+from library.transaction_waiter import PollingWaiter, WebhookReceiver, WebhookWaiter
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "p50_s": round(percentile(values, 50), 3),
+        "p95_s": round(percentile(values, 95), 3),
+        "p99_s": round(percentile(values, 99), 3),
+        "mean_s": round(statistics.mean(values), 3) if values else 0.0,
+        "max_s": round(max(values), 3) if values else 0.0
+    }
+
+
+def run_flow(index: int, start_at: float, credentials: dict, flow_options: dict, priority: str = "bulk") -> dict:
+    """Run one wallet flow after its ramp-up delay, returning timings and any error"""
+    delay = start_at - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+    executor = FlowExecutor(build_flow_steps(**credentials, **flow_options))
+    start = time.perf_counter()
+    error = None
+    try:
+        with request_priority(priority):
+            executor.run()
+    except Exception as e:
+        error = str(e)
+
+    return {
+        "index": index,
+        "status": "error" if error else "success",
+        "error": error,
+        "failed_step": next(iter(executor.errors), None),
+        "duration_s": time.perf_counter() - start,
+        "steps": {name: end - begin for name, (begin, end) in executor.timings.items() if name not in executor.errors},
+        "mismatches": executor.outputs.get("reconcile", {}).get("mismatches", [])
+    }
+
+
+def run_probe(api_key: str, signer_address: str, interval: float, done: threading.Event) -> list:
+    """Check a wallet balance as an interactive request every interval seconds until done, returning the latencies"""
+    latencies = []
+    with request_priority("interactive"):
+        wallet = wallet_utils.create_wallet(api_key, "evm-smart-wallet", signer_address)
+        address = wallet.get("wallet_data", {}).get("address")
+        while address and not done.wait(interval):
+            start = time.perf_counter()
+            if wallet_utils.get_wallet_balance(api_key, "base-sepolia", address).get("status") == "success":
+                latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_load(flows: int, concurrency: int, ramp_up: float, credentials: dict, flow_options: dict,
+             priority: str = "bulk", probe_interval: float = 0.0) -> dict:
+    """
+    Run the flows and aggregate their results
+
+    Returns:
+        dict: Throughput, flow and per-step latency percentiles, error counts and
+        the queueing delay of each request class
+    """
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    probe_done = threading.Event()
+    probe_latencies = []
+    probe = None
+    if probe_interval:
+        probe = threading.Thread(
+            target=lambda: probe_latencies.extend(run_probe(credentials["api_key"], credentials["signer_address"], probe_interval, probe_done)),
+            daemon=True)
+        probe.start()
+
+    def record(future):
+        result = future.result()
+        with lock:
+            results.append(result)
+            print(f"\r{len(results)}/{flows} flows done", end="", file=sys.stderr, flush=True)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for index in range(flows):
+            # Only the first wave is staggered, later flows queue behind the workers
+            offset = ramp_up * index / concurrency if index < concurrency else 0
+            future = executor.submit(run_flow, index, start + offset, credentials, flow_options, priority)
+            future.add_done_callback(record)
+    print(file=sys.stderr)
+    probe_done.set()
+    if probe is not None:
+        probe.join()
+
+    duration = time.perf_counter() - start
+    succeeded = [r for r in results if r["status"] == "success"]
+    step_durations = defaultdict(list)
+    for result in results:
+        for name, seconds in result["steps"].items():
+            step_durations[name].append(seconds)
+
+    errors = Counter(f"{r['failed_step']}: {r['error']}" for r in results if r["status"] == "error")
+
+    return {
+        "base_url": wallet_utils.get_endpoints().base_url,
+        "flows": flows,
+        "concurrency": concurrency,
+        "ramp_up_s": ramp_up,
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "duration_s": round(duration, 3),
+        "cycles_per_minute": round(len(succeeded) / duration * 60, 2) if duration else 0.0,
+        "flow_latency": summarize([r["duration_s"] for r in succeeded]),
+        "steps": {name: summarize(values) for name, values in step_durations.items()},
+        "faucet": flow_options["faucet_scheduler"].stats(),
+        "transaction_waits": flow_options["transaction_waiter"].stats(),
+        "balance_mismatches": sum(len(r["mismatches"]) for r in results),
+        "priority": priority,
+        "request_scheduler": wallet_utils.get_scheduler().stats(),
+        "interactive_probe": summarize(probe_latencies) if probe_interval else None,
+        "errors": dict(errors.most_common())
+    }
+
+
+def print_report(report: dict):
+    print(f"\nTarget:      {report['base_url']}")
+    print(f"Flows:       {report['succeeded']} succeeded, {report['failed']} failed "
+          f"({report['concurrency']} concurrent, {report['ramp_up_s']}s ramp-up)")
+    print(f"Duration:    {report['duration_s']:.2f}s")
+    print(f"Throughput:  {report['cycles_per_minute']:.2f} cycles/minute")
+    print(f"Faucet:      {report['faucet']['faucet_calls']} calls, {report['faucet']['rate_limited']} rate limited")
+    waits = report["transaction_waits"]
+    print(f"Tx status:   {waits['polls']} status polls, {waits.get('resolved_by_webhook', 0)} resolved by webhook, "
+          f"{waits['resolved_by_poll']} by polling")
+    scheduler = report["request_scheduler"]
+    print(f"Requests:    {scheduler['max_concurrency']} in flight max, {scheduler['reserved_slots']} reserved "
+          f"for interactive, {scheduler['throttled']} throttled (flows sent as {report['priority']})")
+    for priority, stats in scheduler["classes"].items():
+        if stats["requests"]:
+            print(f"  {priority:<12} {stats['requests']:>6} requests, {stats['queued']:>6} queued, "
+                  f"wait mean {stats['mean_delay_s']:.3f}s p95 {stats['p95_delay_s']:.3f}s max {stats['max_delay_s']:.3f}s")
+    if report["interactive_probe"]:
+        probe = report["interactive_probe"]
+        print(f"Probe:       {probe['count']} interactive balance checks, p50 {probe['p50_s']:.3f}s "
+              f"p95 {probe['p95_s']:.3f}s max {probe['max_s']:.3f}s")
+
+    print(f"\n{'step':<20} {'count':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'max s':>8}")
+    rows = list(report["steps"].items()) + [("whole flow", report["flow_latency"])]
+    for name, stats in rows:
+        print(f"{name:<20} {stats['count']:>6} {stats['p50_s']:>8.3f} {stats['p95_s']:>8.3f} "
+              f"{stats['p99_s']:>8.3f} {stats['max_s']:>8.3f}")
+
+    if report["errors"]:
+        print("\nErrors:")
+        for error, count in report["errors"].items():
+            print(f"  {count:>5}  {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many wallet flows concurrently and report throughput")
+    parser.add_argument("--flows", type=int, default=10, help="Total number of flows to run")
+    parser.add_argument("--concurrency", type=int, default=5, help="Maximum flows running at once")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which to start the workers")
+    parser.add_argument("--base-url", help="Crossmint API base URL (default: CROSSMINT_BASE_URL)")
+    parser.add_argument("--stub", action="store_true", help="Start a local stand-in API in-process")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Average latency of the stand-in per request")
+    parser.add_argument("--faucet-interval", type=float, default=2.0, help="Minimum seconds between faucet calls")
+    parser.add_argument("--settle-time", type=float, default=1.0,
+                        help="Seconds before the stand-in reports an approved transaction as successful")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between transaction status polls")
+    parser.add_argument("--webhooks", action="store_true",
+                        help="Have the in-process stand-in send status callbacks to a local webhook receiver")
+    parser.add_argument("--webhook-drop-rate", type=float, default=0.0,
+                        help="Fraction of callbacks the stand-in drops, to exercise the fallback to polling")
+    parser.add_argument("--webhook-fallback-after", type=float, default=5.0,
+                        help="Seconds without a callback before a wait starts polling")
+    parser.add_argument("--priority", choices=PRIORITIES, default="bulk", help="Request class of the flows' calls")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Crossmint requests in flight at once (default: CROSSMINT_MAX_IN_FLIGHT)")
+    parser.add_argument("--rate-limit", type=float,
+                        help="Crossmint requests per second (default: CROSSMINT_RATE_LIMIT)")
+    parser.add_argument("--probe-interval", type=float, default=0.0,
+                        help="Seconds between interactive balance checks run alongside the flows, 0 for none")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if args.webhooks and not args.stub:
+        parser.error("--webhooks needs --stub")
+
+    credentials = {
+        "api_key": os.getenv("CROSSMINT_SERVER_API_KEY"),
+        "signer_address": os.getenv("SIGNER_ADDRESS"),
+        "private_key": os.getenv("SIGNER_PRIVATE_KEY")
+    }
+
+    if args.stub:
+        from crossmint_stub import start_stub
+        from eth_account import Account
+
+        webhook_options = {}
+        if args.webhooks:
+            secret = "whsec_" + base64.b64encode(secrets.token_bytes(24)).decode()
+            receiver = WebhookReceiver(secret).start()
+            webhook_options = {"webhook_url": receiver.url, "webhook_secret": secret,
+                               "webhook_drop_rate": args.webhook_drop_rate}
+        server, _, base_url = start_stub(latency=args.stub_latency, settle_time=args.settle_time, **webhook_options)
+        wallet_utils.set_endpoints(CrossmintEndpoints(base_url=base_url))
+        if not credentials["private_key"]:
+            account = Account.create()
+            credentials.update(api_key="stub", signer_address=account.address, private_key=account.key.hex())
+    elif args.base_url:
+        wallet_utils.set_endpoints(CrossmintEndpoints(base_url=args.base_url))
+
+    endpoints = wallet_utils.get_endpoints()
+    if endpoints.base_url in ENVIRONMENTS.values():
+        print(f"Warning: generating load against Crossmint {endpoints.environment}", file=sys.stderr)
+
+    if args.max_in_flight or args.rate_limit:
+        current = wallet_utils.get_scheduler()
+        wallet_utils.set_scheduler(RequestScheduler(
+            rate=args.rate_limit if args.rate_limit is not None else current.rate,
+            max_concurrency=args.max_in_flight or current.max_concurrency,
+            interactive_reserve=current.interactive_reserve
+        ))
+
+    # One warm connection per concurrent flow
+    wallet_utils.prewarm(args.concurrency)
+
+    # One scheduler for all flows so they share the faucet quota, and one ledger to record them
+    faucet_scheduler = FaucetScheduler(credentials["api_key"], min_interval=args.faucet_interval, poll_interval=0.5)
+    ledger = WalletLedger().attach()
+    transaction_waiter = PollingWaiter(credentials["api_key"], args.poll_interval)
+    if args.webhooks:
+        transaction_waiter = WebhookWaiter(receiver, transaction_waiter, args.webhook_fallback_after)
+
+    # Step progress messages from the flows would interleave, keep only the report
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = run_load(
+                args.flows,
+                args.concurrency,
+                args.ramp_up,
+                credentials,
+                {"faucet_scheduler": faucet_scheduler, "ledger": ledger, "transaction_waiter": transaction_waiter},
+                args.priority,
+                args.probe_interval
+            )
+    finally:
+        ledger.close()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import time
 import json
-from openai import OpenAI
+import re
+import uuid
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletionMessage
 import os
 import sys
 from pathlib import Path
@@ -10,10 +13,23 @@ project_root = str(Path(__file__).parent.parent)
 sys.path.append(project_root)
 
 from library.tools_schema import tools_schema
+from library.conversation_memory import ConversationMemory
+from library.agent_memory import AgentMemory, AgentStore
+from library.response_cache import ResponseCache, make_cache_key
+from library.tool_output import compact_tool_output
+from library.intent_parser import ADDRESS, IntentParser
+from library.faucet_scheduler import get_faucet_scheduler
+from library.transaction_waiter import get_transaction_waiter, start_webhook_receiver
+from library.request_scheduler import request_priority
+from library.prefetch import get_prefetcher
+from library import profiling
+from library.usage_meter import (
+    usage_meter_from_env, start_metrics_server
+)
 from library.wallet_utils import (
     create_wallet,
     create_transaction, generate_signature, submit_transaction_approval,
-    get_transaction, transfer_usdc, get_usdc_from_faucet
+    transfer_usdc, prewarm_in_background
 )
 
 from dotenv import load_dotenv
@@ -23,7 +39,8 @@ load_dotenv()
 
 
 class CryptoAIAgent:
-    def __init__(self):
+    def __init__(self, interactive: bool = True, priority: str = "interactive", openai_client: OpenAI = None,
+                 async_openai_client: AsyncOpenAI = None, memory_store: AgentStore = None, session_id: str = None):
         self.api_key = os.getenv('CROSSMINT_SERVER_API_KEY')
         if not self.api_key:
             raise ValueError("No API key found in .env file")
@@ -37,6 +54,10 @@ class CryptoAIAgent:
             raise ValueError(
                 "No signer address found in .env file, be sure to run 'python generate_keys.py' inside '/src/library' to generate a new set of keys")
 
+        self.interactive = interactive
+        # Request class of this agent's Crossmint calls (library/request_scheduler.py)
+        self.priority = priority
+
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         if not self.openai_api_key:
             raise ValueError("No OpenAI API key found in .env file")
@@ -48,27 +69,72 @@ class CryptoAIAgent:
             "ethereum-sepolia": "https://sepolia.etherscan.io",
             "solana-devnet": "https://explorer.solana.com/?cluster=devnet"
         }
-        self.chat_history = []
-        self.openai_client = OpenAI()
-        self.wallets = []
-        self.api_calls = 0
-        self.max_api_calls = 20
+        self.chat_history = ConversationMemory(
+            max_tokens=int(os.getenv('AGENT_MEMORY_MAX_TOKENS', '3000')),
+            max_tool_output_chars=int(
+                os.getenv('AGENT_MEMORY_MAX_TOOL_OUTPUT_CHARS', '1500'))
+        )
+        # The service shares its clients and store across sessions, agents on their own create them
+        self.openai_client = openai_client or OpenAI()
+        # Created on first use unless shared
+        self.async_openai_client = async_openai_client
+        # Wallet summaries stay in memory up to AGENT_MAX_RESIDENT_WALLETS, the
+        # rest (and the full payloads) spill to a local sqlite store
+        self.memory = AgentMemory(namespace=session_id or uuid.uuid4().hex, store=memory_store)
+        self.wallets = self.memory.wallets
+        # Token and cost metering, budgets come from AGENT_*_BUDGET_* in .env
+        self.usage = usage_meter_from_env(
+            default_soft_usd=0.05, default_hard_usd=0.10)
+
+        # Unambiguous commands skip the LLM, AGENT_FAST_PATH=0 disables this
+        self.intent_parser = None
+        if os.getenv('AGENT_FAST_PATH', '1') != '0':
+            self.intent_parser = IntentParser()
+
+        # Balances and pending transactions refreshed while the LLM call runs, AGENT_PREFETCH=0 disables this
+        self.prefetcher = get_prefetcher(self.api_key)
+
+        # Optional cache of side-effect free turns: AGENT_RESPONSE_CACHE=memory|disk
+        self.response_cache = None
+        cache_backend = os.getenv('AGENT_RESPONSE_CACHE')
+        if cache_backend:
+            self.response_cache = ResponseCache(
+                backend=cache_backend,
+                ttl=float(os.getenv('AGENT_RESPONSE_CACHE_TTL', '600')),
+                max_entries=int(os.getenv('AGENT_RESPONSE_CACHE_SIZE', '256')),
+                path=os.getenv('AGENT_RESPONSE_CACHE_PATH',
+                               '.agent_response_cache.sqlite3')
+            )
 
     def create_new_wallet(self, wallet_type):
         """Agent method to create and track new wallets"""
         result = create_wallet(self.api_key, wallet_type, self.signer_address)
 
         if result.get("status") == "success":
-            self.wallets.append(result["wallet_data"])
+            self.wallets.add(result["wallet_data"])
 
         return result
 
-    def select_wallet(self):
+    def select_wallet(self, wallet_address: str = None):
         """Prompt user to select a wallet from their available wallets"""
         if not self.wallets:
             print("No wallets available. Please create a wallet first.")
             return None
 
+        # A wallet named in the tool call arguments skips the prompt
+        if wallet_address:
+            if self.wallets.get(wallet_address):
+                return wallet_address
+            print(f"Wallet {wallet_address} is not in tracked wallets.")
+            return None
+
+        # Headless sessions can't prompt, so only an unambiguous choice is made
+        if not self.interactive:
+            if len(self.wallets) == 1:
+                return self.wallets[0]['address']
+            print("Multiple wallets available and no wallet address given.")
+            return None
+
         print("\nAvailable wallets:")
         for i, wallet in enumerate(self.wallets):
             print(f"{i+1}. {wallet['address']} (Type: {wallet['type']})")
@@ -110,18 +176,19 @@ class CryptoAIAgent:
                 wallet_address,
                 transaction_id,
                 signer_id,
-                signature
+                signature,
+                user_op_hash=user_op_hash
             )
 
             if submit_response.get("status") != "success":
-                return {"status": "error", "message": "Signature submission failed"}
+                return {"status": "error", "message": "Signature submission failed", "error": submit_response.get("error")}
 
             # Step 4: Verify transaction
             print("Verifying transaction...")
-            time.sleep(10)  # Allow transaction to process
-
-            transaction_status = get_transaction(
-                self.api_key, wallet_address, transaction_id)
+            # Returns once the transaction succeeded or failed, from a status webhook or by polling
+            transaction_status = get_transaction_waiter(self.api_key).wait(
+                wallet_address, transaction_id)
+            self._after_transaction([wallet_address], wallet_address, transaction_id, transaction_status)
 
             return {
                 "status": "success",
@@ -148,29 +215,43 @@ class CryptoAIAgent:
 
     def get_wallet_balance(self, wallet_address):
         """Agent method to get the balance of a wallet"""
-        wallet = next(
-            (w for w in self.wallets if w['address'] == wallet_address), None)
+        wallet = self.wallets.get(wallet_address)
         if not wallet:
             return {"status": "error", "message": "Wallet not found in tracked wallets"}
 
         chain = "base-sepolia" if wallet['type'] == "evm-smart-wallet" else "solana-devnet"
         explorer_url = self.get_explorer_url(wallet_address, chain)
 
-        return {
+        result = {
             "status": "success",
             "message": f"View wallet balance and transactions at: {explorer_url}",
             "explorer_url": explorer_url
         }
 
+        # Answered from the balance prefetched during the LLM call when it is still fresh
+        if self.prefetcher:
+            balance = self.prefetcher.balance(wallet_address, chain)
+            if balance.get("status") == "success":
+                result["balance"] = balance["balance"]
+                result["message"] = f"Balance: {balance['balance']} USDC. {result['message']}"
+            pending = [self.prefetcher.transaction_status(tx_id) or {"transaction_data": {"id": tx_id}}
+                       for tx_id in self.prefetcher.pending_transactions(wallet_address)]
+            if pending:
+                result["pending_transactions"] = [
+                    {"id": tx["transaction_data"].get("id"), "status": tx["transaction_data"].get("status", "unknown")}
+                    for tx in pending
+                ]
+
+        return result
+
     def get_usdc_tokens(self, wallet_address: str, amount: int):
         """Get USDC tokens from faucet for a wallet"""
-        result = get_usdc_from_faucet(
-            self.api_key, "base-sepolia", wallet_address, amount)
+        # The shared scheduler spaces out faucet calls and waits until the funds show up
+        print(f"Waiting for faucet transaction to process...")
+        scheduler = get_faucet_scheduler(self.api_key, "base-sepolia")
+        result = scheduler.wait(scheduler.request(wallet_address, amount))
 
         if result.get("status") == "success":
-            print(f"Waiting for faucet transaction to process...")
-            time.sleep(5)
-
             # Provide explorer link instead of balance
             explorer_url = self.get_explorer_url(wallet_address)
             print(f"\nView your USDC balance and transactions at: {
@@ -198,9 +279,18 @@ class CryptoAIAgent:
 
         transaction_data = transaction_response.get("transaction_data", {})
 
-        # Wait for transaction to process
+        # Wait for the transaction to succeed or fail instead of a fixed sleep
         print("Waiting for transaction to process...")
-        time.sleep(10)
+        final_status = get_transaction_waiter(self.api_key).wait(from_wallet, transaction_data.get("id"))
+        self._after_transaction([from_wallet, to_wallet], from_wallet, transaction_data.get("id"), final_status)
+        if final_status.get("status") == "success":
+            transaction_data = final_status["transaction_data"]
+            if transaction_data.get("status") == "failed":
+                return {
+                    "status": "error",
+                    "message": "USDC transfer failed on chain",
+                    "data": {"transaction_data": transaction_data}
+                }
 
         # Get the explorer URL for both wallets
         from_explorer = self.get_explorer_url(from_wallet)
@@ -211,18 +301,84 @@ class CryptoAIAgent:
             "message": "USDC transfer completed",
             "data": {
                 "transaction_data": transaction_data,
+                "amount": amount,
                 "from_wallet_explorer": from_explorer,
                 "to_wallet_explorer": to_explorer
             }
         }
 
-    def chat_completion(self, user_input):
-        """Handle chat completion with OpenAI"""
-        if self.api_calls >= self.max_api_calls:
-            raise Exception(
-                "Maximum API calls reached. Please restart the program.")
+    def _after_transaction(self, wallets: list, sender: str, transaction_id: str, wait_result: dict):
+        """Drop prefetched balances the transaction changed, and keep refreshing it if it isn't final yet"""
+        if not self.prefetcher:
+            return
+        for wallet_address in wallets:
+            self.prefetcher.invalidate(wallet_address)
+        if wait_result.get("status") != "success" and transaction_id:
+            self.prefetcher.track_transaction(sender, transaction_id)
+
+    def _prefetch(self, user_input):
+        """Start refreshing the wallets mentioned in the input, then the most recently used ones"""
+        if not self.prefetcher:
+            return
+        candidates = []
+        for address in re.findall(ADDRESS, user_input) + [w["address"] for w in reversed(list(self.wallets))]:
+            wallet = self.wallets.get(address)
+            if wallet and wallet["address"] not in [c[0] for c in candidates]:
+                chain = "base-sepolia" if wallet['type'] == "evm-smart-wallet" else "solana-devnet"
+                candidates.append((wallet["address"], chain))
+            if len(candidates) >= self.prefetcher.max_wallets:
+                break
+        with profiling.span("prefetch wallet state", "other", wallets=len(candidates)):
+            self.prefetcher.prefetch(candidates)
+
+    def _fast_path(self, user_input):
+        """Turn an unambiguous command into a local tool call without an LLM round trip"""
+        if not self.intent_parser:
+            return None
+
+        intent = self.intent_parser.parse(user_input)
+        if not intent:
+            return None
+
+        tool_name, args = intent
+        message = ChatCompletionMessage.model_validate({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"local_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": tool_name, "arguments": json.dumps(args)}
+            }]
+        })
+        self.chat_history.add_user_message(user_input)
+        self.chat_history.add_assistant_message(message)
+        return message
+
+    def fast_path_stats(self):
+        """Fast path hit rate and the LLM time it saved at the session's average latency"""
+        if not self.intent_parser:
+            return None
+        return self.intent_parser.stats(
+            self.usage.snapshot()['session']['avg_latency_s'])
+
+    def memory_report(self):
+        """How much agent state is held in memory and how much was spilled to the store"""
+        return self.memory.report(
+            chat_history={
+                "turns": len(self.chat_history.turns),
+                "summary_lines": len(self.chat_history.summary_lines),
+                "tokens": self.chat_history.token_count(),
+                "max_tokens": self.chat_history.max_tokens
+            },
+            response_cache=self.response_cache.stats()["entries"] if self.response_cache else None
+        )
 
-        self.api_calls += 1
+    def _prepare_chat_request(self, user_input):
+        """Check the budget, record the user turn and build the chat request"""
+        # Raises BudgetExceededError once a hard limit is reached
+        warning = self.usage.check_budget()
+        if warning:
+            print(f"\n{warning}")
 
         # Create wallet context
         wallet_context = "No wallets created yet."
@@ -230,6 +386,9 @@ class CryptoAIAgent:
             wallet_details = [f"Wallet {i+1}: {w.get('address', 'No address')} (Type: {w.get('type', 'unknown')})"
                               for i, w in enumerate(self.wallets)]
             wallet_context = "Available wallets:\n" + "\n".join(wallet_details)
+            older = self.wallets.count() - len(self.wallets)
+            if older > 0:
+                wallet_context += f"\n({older} older wallets are not listed but can be used by address)"
 
         # Base contextual prompt where we include any wallet context
         contextual_prompt = f"""You are a super helpful AI web3 assistant that can perform actions on the blockchain using Crossmint's API.
@@ -239,23 +398,194 @@ class CryptoAIAgent:
 
         You can create new wallets, check the balance of existing wallets, deposit tokens to a wallet, transfer tokens between wallets, and more."""
 
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
+        # The user message is only recorded once the turn has a reply, so a
+        # failed completion doesn't leave it dangling in the history
+        request = {
+            "model": "gpt-4o-mini",
+            "messages": [
                 {"role": "system", "content": contextual_prompt},
+                *self.chat_history.messages(),
                 {"role": "user", "content": user_input}
             ],
-            tools=tools_schema(),
-            tool_choice="auto"
-        )
-        return response.choices[0].message
+            "tools": tools_schema(),
+            "tool_choice": "auto"
+        }
+
+        # Identical side-effect free turns can be answered from the cache
+        cache_key = None
+        cached_message = None
+        if self.response_cache:
+            cache_key = make_cache_key(
+                request["model"], request["messages"], request["tools"])
+            cached = self.response_cache.get(cache_key)
+            if cached:
+                cached_message = ChatCompletionMessage.model_validate(cached)
+                self.chat_history.add_user_message(user_input)
+                self.chat_history.add_assistant_message(cached_message)
+
+        return request, cache_key, cached_message
+
+    def _finish_chat_completion(self, user_input, response, latency, cache_key):
+        """Meter the response, cache it if possible and record the turn in history"""
+        self.usage.record_chat_completion(response, latency)
+
+        message = response.choices[0].message
+        if cache_key:
+            self.response_cache.put(
+                cache_key, message.model_dump(exclude_none=True), latency)
+
+        self.chat_history.add_user_message(user_input)
+        self.chat_history.add_assistant_message(message)
+        return message
+
+    def chat_completion(self, user_input):
+        """Handle chat completion with OpenAI"""
+        fast_path_message = self._fast_path(user_input)
+        if fast_path_message:
+            return fast_path_message
+
+        request, cache_key, cached_message = self._prepare_chat_request(
+            user_input)
+        if cached_message:
+            return cached_message
+
+        # Warm up wallet state in the background while the model thinks
+        self._prefetch(user_input)
+
+        start = time.perf_counter()
+        try:
+            with profiling.span("chat.completions.create", "llm", model=request["model"]):
+                response = self.openai_client.chat.completions.create(**request)
+        except Exception:
+            self.usage.record("chat_completion", request["model"], 0, 0,
+                              time.perf_counter() - start, error=True)
+            raise
+
+        return self._finish_chat_completion(
+            user_input, response, time.perf_counter() - start, cache_key)
+
+    async def achat_completion(self, user_input):
+        """Async variant of chat_completion used by the multi-session service"""
+        fast_path_message = self._fast_path(user_input)
+        if fast_path_message:
+            return fast_path_message
+
+        if self.async_openai_client is None:
+            self.async_openai_client = AsyncOpenAI()
+
+        request, cache_key, cached_message = self._prepare_chat_request(
+            user_input)
+        if cached_message:
+            return cached_message
+
+        self._prefetch(user_input)
+
+        start = time.perf_counter()
+        try:
+            response = await self.async_openai_client.chat.completions.create(**request)
+        except Exception:
+            self.usage.record("chat_completion", request["model"], 0, 0,
+                              time.perf_counter() - start, error=True)
+            raise
+
+        return self._finish_chat_completion(
+            user_input, response, time.perf_counter() - start, cache_key)
+
+    def remember_tool_result(self, tool_call, result):
+        """Add a compact projection of a tool result to the conversation history"""
+        with profiling.span("compact tool output", "json"):
+            self.chat_history.add_tool_result(
+                tool_call.id, compact_tool_output(tool_call.function.name, result))
+
+    def execute_tool_call(self, name: str, args: dict):
+        """Run the agent method behind a tool call and report the outcome"""
+        with profiling.span(f"tool {name}", "tool"), request_priority(self.priority):
+            result = self._dispatch_tool_call(name, args)
+        # Full results for the memory report, the history only gets a compact projection
+        self.memory.tool_results.append({"tool": name, "result": result})
+        return result
+
+    def _dispatch_tool_call(self, name: str, args: dict):
+        if name == "create_new_wallet":
+            result = self.create_new_wallet(args["wallet_type"])
+            if result.get("status") == "success":
+                print(f"\nWallet Created Successfully!")
+            else:
+                print(f"\nWallet Creation Failed!")
+
+            print(f"Result: {json.dumps(result, indent=2)}")
+
+        elif name == "get_wallet_balance":
+            result = self.get_wallet_balance(args["wallet_address"])
+            if result.get("status") == "success":
+                print(f"\n{result.get('message')}")
+            else:
+                print(f"\nError: {result.get('message')}")
+
+        elif name == "create_transaction":
+            # Let user select the wallet unless the call already names one
+            wallet_address = self.select_wallet(args.get("wallet_address"))
+            if wallet_address:
+                result = self.create_transaction(wallet_address)
+                if result.get("status") == "success":
+                    print("\nTransaction Completed Successfully!")
+                else:
+                    print(f"\nTransaction Failed: {
+                          result.get('message', 'Unknown error')}")
+                print(f"Result: {json.dumps(result, indent=2)}")
+            else:
+                result = {"status": "error",
+                          "message": "No wallet selected for transaction"}
+                print("\nNo wallet selected for transaction.")
+
+        elif name == "get_usdc_from_faucet":
+            result = self.get_usdc_tokens(
+                args["wallet_address"], args["amount"])
+            if result.get("status") == "success":
+                print("\nUSDC tokens requested successfully!")
+            else:
+                print(f"\nFailed to get USDC tokens: {
+                      result.get('message', 'Unknown error')}")
+
+        elif name == "transfer_usdc":
+            result = self.transfer_usdc_tokens(
+                args["from_wallet_address"],
+                args["to_wallet_address"],
+                args["amount"]
+            )
+            if result.get("status") == "success":
+                print("\nUSDC transfer completed successfully!")
+                print(f"\nView source wallet at: {
+                      result['data']['from_wallet_explorer']}")
+                print(f"View destination wallet at: {
+                      result['data']['to_wallet_explorer']}")
+            else:
+                print(f"\nUSDC transfer failed: {
+                      result.get('message', 'Unknown error')}")
+            print(f"Result: {json.dumps(result, indent=2)}")
+
+        else:
+            result = {"status": "error", "message": f"Unknown tool: {name}"}
+
+        return result
 
 
 def main():
+    # AGENT_PROFILE=1 (or a trace file path) records a span profile of each turn
+    profiling.enable_from_env()
     try:
         agent = CryptoAIAgent()
+        # Connect to the Crossmint API while the user types the first request
+        prewarm_in_background()
+        # Transaction status callbacks, when CROSSMINT_WEBHOOK_SECRET is set
+        start_webhook_receiver()
         print("Welcome to the AI Agent! (Type 'exit' or 'q' to quit)")
-        print(f"Maximum API calls: {agent.max_api_calls}")
+        print(f"Usage budget: {agent.usage.describe_budget()}")
+
+        metrics_port = os.getenv('AGENT_METRICS_PORT')
+        if metrics_port:
+            start_metrics_server(int(metrics_port))
+            print(f"Metrics available at http://127.0.0.1:{metrics_port}/metrics")
 
         while True:
             user_input = input("\nAsk anything -> ").strip()
@@ -263,80 +593,48 @@ def main():
             if user_input.lower() in ['exit', 'q']:
                 import random
                 farewell = random.choice(["Goodbye!", "See ya!", "Take care!"])
+                print(f"Usage: {json.dumps(agent.usage.snapshot()['session'])}")
+                if agent.response_cache:
+                    print(f"Response cache: {json.dumps(agent.response_cache.stats())}")
+                if agent.intent_parser:
+                    print(f"Fast path: {json.dumps(agent.fast_path_stats())}")
+                if agent.prefetcher:
+                    print(f"Prefetch: {json.dumps(agent.prefetcher.stats())}")
                 print(farewell)
                 break
 
-            # Get AI response
-            response = agent.chat_completion(user_input)
-
-            # Handle normal response
-            if response.content:
-                print(f"\nAI Agent: {response.content}")
-
-            # Handle function calls
-            if response.tool_calls:
-                for tool_call in response.tool_calls:
-                    if tool_call.function.name == "create_new_wallet":
-                        # Parse JSON string into dict
-                        args = json.loads(tool_call.function.arguments)
-                        result = agent.create_new_wallet(args["wallet_type"])
-                        if result.get("status") == "success":
-                            print(f"\nWallet Created Successfully!")
-                        else:
-                            print(f"\nWallet Creation Failed!")
-
-                        print(f"Result: {json.dumps(result, indent=2)}")
-
-                    elif tool_call.function.name == "get_wallet_balance":
-                        args = json.loads(tool_call.function.arguments)
-                        result = agent.get_wallet_balance(
-                            args["wallet_address"])
-                        if result.get("status") == "success":
-                            print(f"\n{result.get('message')}")
-                        else:
-                            print(f"\nError: {result.get('message')}")
-
-                    elif tool_call.function.name == "create_transaction":
-                        args = json.loads(tool_call.function.arguments)
-                        wallet_address = agent.select_wallet()  # Let user select the wallet
-                        if wallet_address:
-                            result = agent.create_transaction(wallet_address)
-                            if result.get("status") == "success":
-                                print("\nTransaction Completed Successfully!")
-                            else:
-                                print(f"\nTransaction Failed: {
-                                      result.get('message', 'Unknown error')}")
-                            print(f"Result: {json.dumps(result, indent=2)}")
-                        else:
-                            print("\nNo wallet selected for transaction.")
-
-                    elif tool_call.function.name == "get_usdc_from_faucet":
-                        args = json.loads(tool_call.function.arguments)
-                        result = agent.get_usdc_tokens(
-                            args["wallet_address"], args["amount"])
-                        if result.get("status") == "success":
-                            print("\nUSDC tokens requested successfully!")
-                        else:
-                            print(f"\nFailed to get USDC tokens: {
-                                  result.get('message', 'Unknown error')}")
-
-                    elif tool_call.function.name == "transfer_usdc":
-                        args = json.loads(tool_call.function.arguments)
-                        result = agent.transfer_usdc_tokens(
-                            args["from_wallet_address"],
-                            args["to_wallet_address"],
-                            args["amount"]
-                        )
-                        if result.get("status") == "success":
-                            print("\nUSDC transfer completed successfully!")
-                            print(f"\nView source wallet at: {
-                                  result['data']['from_wallet_explorer']}")
-                            print(f"View destination wallet at: {
-                                  result['data']['to_wallet_explorer']}")
-                        else:
-                            print(f"\nUSDC transfer failed: {
-                                  result.get('message', 'Unknown error')}")
-                        print(f"Result: {json.dumps(result, indent=2)}")
+            if user_input.lower() == 'usage':
+                print(json.dumps(agent.usage.snapshot(), indent=2))
+                if agent.response_cache:
+                    print(f"Response cache: {json.dumps(agent.response_cache.stats())}")
+                if agent.intent_parser:
+                    print(f"Fast path: {json.dumps(agent.fast_path_stats())}")
+                if agent.prefetcher:
+                    print(f"Prefetch: {json.dumps(agent.prefetcher.stats())}")
+                continue
+
+            if user_input.lower() == 'memory':
+                print(json.dumps(agent.memory_report(), indent=2))
+                continue
+
+            with profiling.span("turn", "turn", prompt=user_input[:80]):
+                # Get AI response
+                response = agent.chat_completion(user_input)
+
+                # Handle normal response
+                if response.content:
+                    print(f"\nAI Agent: {response.content}")
+
+                # Handle function calls
+                if response.tool_calls:
+                    for tool_call in response.tool_calls:
+                        with profiling.span("parse tool arguments", "json"):
+                            args = json.loads(tool_call.function.arguments)
+                        result = agent.execute_tool_call(
+                            tool_call.function.name, args)
+
+                        # Remember the outcome so follow-up questions have context
+                        agent.remember_tool_result(tool_call, result)
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
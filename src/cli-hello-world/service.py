@@ -0,0 +1,385 @@
+"""
+Multi-session HTTP service for CryptoAIAgent
+
+Each session gets its own agent (wallets, conversation history and usage
+budget). OpenAI calls are awaited with the async client and Crossmint tool
+calls run on a pool of --tool-threads threads, so one process serves many
+sessions at once. Session ids are always generated by the service.
+
+With --workers N the service starts N worker processes and a front router
+that forwards every request for a session to the same worker (session
+affinity by hashing the session id).
+
+With CROSSMINT_WEBHOOK_SECRET set, Crossmint transaction status webhooks
+are accepted on POST /webhooks/crossmint of the service port. The router
+passes each one on to every worker, since any of them may be waiting for
+the transaction.
+
+Endpoints:
+    POST   /sessions                   -> {"session_id": "..."}
+    POST   /sessions/{id}/messages     {"message": "...", "wallet_address": "0x..."}
+    GET    /sessions/{id}              -> wallets, usage, history size and memory report
+    DELETE /sessions/{id}              409 while a turn of the session is running
+    GET    /metrics                    -> Prometheus metrics, incl. Crossmint request queueing (per worker on the router)
+    POST   /webhooks/crossmint         Crossmint transaction status webhooks
+    GET    /healthz
+
+Usage:
+    python3 service.py --port 8080
+    python3 service.py --port 8080 --workers 4
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import ClientSession, web
+from openai import AsyncOpenAI, OpenAI
+
+from run import CryptoAIAgent
+from library.agent_memory import agent_store_from_env
+from library.transaction_waiter import get_webhook_receiver
+from library.usage_meter import prometheus_metrics
+from library.wallet_utils import get_scheduler, prewarm_in_background
+
+# Header the router sends the id it picked for a new session in
+ROUTER_SESSION_HEADER = "X-Router-Session-Id"
+
+
+class SessionManager:
+    """
+    Holds the per-session agents of one worker process
+
+    Turns within a session are serialized with a per-session lock, different
+    sessions run concurrently. Idle sessions are dropped after session_ttl seconds.
+    The agents share the worker's OpenAI clients (and their connection pools)
+    and one memory store, where each session's rows are kept under its id and
+    deleted with the session.
+    """
+
+    def __init__(self, session_ttl: float = 3600, max_sessions: int = 1000):
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.openai_client = OpenAI()
+        self.async_openai_client = AsyncOpenAI()
+        self.store = agent_store_from_env()
+
+    def create(self, session_id: str = None) -> str:
+        """
+        Start a session, with a new random id unless the router assigned one
+
+        Never hands out an existing session: the id is what gives access to
+        its agent, wallets and budget.
+        """
+        self.evict_idle()
+        if len(self.sessions) >= self.max_sessions:
+            raise web.HTTPServiceUnavailable(text="Too many active sessions")
+
+        session_id = session_id or uuid.uuid4().hex
+        if session_id in self.sessions:
+            raise web.HTTPConflict(text=f"Session already exists: {session_id}")
+        agent = CryptoAIAgent(interactive=False, openai_client=self.openai_client,
+                              async_openai_client=self.async_openai_client, memory_store=self.store,
+                              session_id=session_id)
+        agent.usage.session_id = session_id
+        self.sessions[session_id] = {
+            "agent": agent,
+            "lock": asyncio.Lock(),
+            "last_used": time.monotonic()
+        }
+        return session_id
+
+    def get(self, session_id: str) -> dict:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise web.HTTPNotFound(text=f"Unknown session: {session_id}")
+        session["last_used"] = time.monotonic()
+        return session
+
+    def delete(self, session_id: str):
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        # Closing the agent's store under a running turn would fail that turn
+        if session["lock"].locked():
+            raise web.HTTPConflict(text=f"Session is busy: {session_id}")
+        del self.sessions[session_id]
+        session["agent"].memory.close()
+
+    def close(self):
+        """Drop every session and close the shared store"""
+        for session in self.sessions.values():
+            session["agent"].memory.close()
+        self.sessions.clear()
+        self.store.close()
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.session_ttl
+        for session_id in [sid for sid, s in self.sessions.items() if s["last_used"] < cutoff and not s["lock"].locked()]:
+            self.delete(session_id)
+
+
+async def run_turn(agent: CryptoAIAgent, message: str, wallet_address: str = None,
+                   executor: ThreadPoolExecutor = None) -> dict:
+    """Run one user turn: an async LLM call followed by tool calls on executor threads"""
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    response = await agent.achat_completion(message)
+
+    tool_calls = []
+    for tool_call in response.tool_calls or []:
+        args = json.loads(tool_call.function.arguments)
+        if tool_call.function.name == "create_transaction" and not args.get("wallet_address"):
+            args["wallet_address"] = wallet_address
+
+        # Crossmint calls are blocking requests calls, keep them off the event loop. Transfers
+        # hold their thread until the transaction is final, so the pool is sized for that
+        call = functools.partial(contextvars.copy_context().run, agent.execute_tool_call, tool_call.function.name, args)
+        result = await loop.run_in_executor(executor, call)
+        agent.remember_tool_result(tool_call, result)
+        tool_calls.append({"name": tool_call.function.name, "arguments": args, "result": result})
+
+    return {
+        "response": response.content,
+        "tool_calls": tool_calls,
+        "duration_s": round(time.perf_counter() - start, 3)
+    }
+
+
+async def create_session(request):
+    # A random id, or the one the router picked to send the session to this worker (409 if it exists)
+    session_id = request.app["sessions"].create(request.headers.get(ROUTER_SESSION_HEADER))
+    return web.json_response({"session_id": session_id}, status=201)
+
+
+async def post_message(request):
+    session = request.app["sessions"].get(request.match_info["session_id"])
+    body = await request.json()
+    if not body.get("message"):
+        raise web.HTTPBadRequest(text="'message' is required")
+
+    async with session["lock"]:
+        try:
+            result = await run_turn(session["agent"], body["message"], body.get("wallet_address"),
+                                    request.app["tool_executor"])
+        except Exception as e:
+            return web.json_response({"status": "error", "error": str(e)}, status=500)
+
+    result["status"] = "success"
+    result["usage"] = session["agent"].usage.snapshot()["session"]
+    return web.json_response(result)
+
+
+async def get_session(request):
+    session_id = request.match_info["session_id"]
+    agent = request.app["sessions"].get(session_id)["agent"]
+    return web.json_response({
+        "session_id": session_id,
+        "wallets": [{"address": w.get("address"), "type": w.get("type")} for w in agent.wallets],
+        "wallet_count": agent.wallets.count(),
+        "history_tokens": agent.chat_history.token_count(),
+        "usage": agent.usage.snapshot()["session"],
+        "memory": agent.memory_report()
+    })
+
+
+async def delete_session(request):
+    request.app["sessions"].delete(request.match_info["session_id"])
+    return web.Response(status=204)
+
+
+async def metrics(request):
+    return web.Response(text=prometheus_metrics() + get_scheduler().prometheus_metrics(), content_type="text/plain")
+
+
+async def crossmint_webhook(request):
+    # Verified and applied by this process' receiver, which the transaction waits resolve from
+    receiver = get_webhook_receiver()
+    if receiver is None:
+        raise web.HTTPNotFound(text="Webhooks are not enabled, set CROSSMINT_WEBHOOK_SECRET")
+    return web.Response(status=receiver.handle(request.headers, await request.read()))
+
+
+async def healthz(request):
+    return web.json_response({"status": "ok", "sessions": len(request.app["sessions"].sessions)})
+
+
+def create_app(session_ttl: float = 3600, max_sessions: int = 1000, tool_threads: int = 64) -> web.Application:
+    app = web.Application()
+    app["sessions"] = SessionManager(session_ttl, max_sessions)
+    app["tool_executor"] = ThreadPoolExecutor(max_workers=tool_threads, thread_name_prefix="tool")
+
+    async def shutdown(app):
+        app["tool_executor"].shutdown(wait=False)
+        app["sessions"].close()
+
+    app.on_cleanup.append(shutdown)
+    app.router.add_post("/sessions", create_session)
+    app.router.add_post("/sessions/{session_id}/messages", post_message)
+    app.router.add_get("/sessions/{session_id}", get_session)
+    app.router.add_delete("/sessions/{session_id}", delete_session)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_post("/webhooks/crossmint", crossmint_webhook)
+    app.router.add_get("/healthz", healthz)
+    return app
+
+
+def merge_worker_metrics(texts: list) -> str:
+    """
+    Metrics of every worker in one exposition, each sample labelled with its worker index
+
+    Samples are regrouped by metric family, since a family must not be split
+    across the exposition.
+    """
+    families = {}
+    for index, text in enumerate(texts):
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# TYPE "):
+                family = families.setdefault(line.split()[2], [line])
+            elif line and not line.startswith("#") and family is not None:
+                name, value = line.rsplit(" ", 1)
+                if "{" in name:
+                    name = name.replace("{", f'{{worker="{index}",', 1)
+                else:
+                    name = f'{name}{{worker="{index}"}}'
+                family.append(f"{name} {value}")
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+
+def worker_for(session_id: str, worker_count: int) -> int:
+    """Stable session to worker mapping so a session always lands on the same process"""
+    return int(hashlib.sha1(session_id.encode()).hexdigest(), 16) % worker_count
+
+
+def create_router_app(worker_urls: list) -> web.Application:
+    """
+    Front router that assigns new sessions an id and proxies every request
+    for that session to the worker it hashes to
+    """
+    app = web.Application()
+
+    async def start_client(app):
+        app["client"] = ClientSession()
+
+    async def close_client(app):
+        await app["client"].close()
+
+    app.on_startup.append(start_client)
+    app.on_cleanup.append(close_client)
+
+    async def forward(request, worker_url, body=None):
+        data = body if body is not None else await request.read()
+        async with request.app["client"].request(
+            request.method,
+            worker_url + request.path_qs,
+            data=data,
+            headers={"Content-Type": request.headers.get("Content-Type", "application/json")}
+        ) as response:
+            return web.Response(
+                body=await response.read(),
+                status=response.status,
+                content_type=response.content_type
+            )
+
+    async def route_create(request):
+        session_id = uuid.uuid4().hex
+        worker_url = worker_urls[worker_for(session_id, len(worker_urls))]
+        async with request.app["client"].post(
+                worker_url + request.path, headers={ROUTER_SESSION_HEADER: session_id}) as response:
+            return web.Response(body=await response.read(), status=response.status, content_type=response.content_type)
+
+    async def route_session(request):
+        worker_url = worker_urls[worker_for(request.match_info["session_id"], len(worker_urls))]
+        return await forward(request, worker_url)
+
+    async def route_webhook(request):
+        # Any worker may be waiting for the transaction; redeliveries are applied once per worker
+        body = await request.read()
+        headers = {name: request.headers[name] for name in ("Content-Type", "svix-id", "svix-timestamp", "svix-signature")
+                   if name in request.headers}
+
+        async def deliver(worker_url):
+            async with request.app["client"].post(worker_url + request.path, data=body, headers=headers) as response:
+                return response.status
+
+        statuses = await asyncio.gather(*(deliver(url) for url in worker_urls), return_exceptions=True)
+        statuses = [status if isinstance(status, int) else 502 for status in statuses]
+        # Anything but a 200 from every worker has Crossmint deliver the webhook again
+        return web.Response(status=max(statuses))
+
+    async def route_metrics(request):
+        async def fetch(worker_url):
+            async with request.app["client"].get(worker_url + "/metrics") as response:
+                return await response.text()
+
+        texts = await asyncio.gather(*(fetch(url) for url in worker_urls), return_exceptions=True)
+        text = merge_worker_metrics([text if isinstance(text, str) else "" for text in texts])
+        return web.Response(text=text, content_type="text/plain")
+
+    async def route_healthz(request):
+        return web.json_response({"status": "ok", "workers": len(worker_urls)})
+
+    app.router.add_post("/sessions", route_create)
+    app.router.add_route("*", "/sessions/{session_id}", route_session)
+    app.router.add_route("*", "/sessions/{session_id}/{tail:.*}", route_session)
+    app.router.add_post("/webhooks/crossmint", route_webhook)
+    app.router.add_get("/metrics", route_metrics)
+    app.router.add_get("/healthz", route_healthz)
+    return app
+
+
+def run_worker(host: str, port: int, session_ttl: float, max_sessions: int, tool_threads: int):
+    # Connect to the Crossmint API before the first session needs it
+    prewarm_in_background()
+    web.run_app(create_app(session_ttl, max_sessions, tool_threads), host=host, port=port, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve CryptoAIAgent sessions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes; more than one starts an affinity router on --port")
+    parser.add_argument("--session-ttl", type=float, default=3600, help="Seconds before an idle session is dropped")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="Maximum sessions per worker")
+    parser.add_argument("--tool-threads", type=int, default=64,
+                        help="Threads per worker for tool calls, i.e. tool calls (e.g. transfer waits) in flight")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        print(f"Agent service listening on http://{args.host}:{args.port}")
+        run_worker(args.host, args.port, args.session_ttl, args.max_sessions, args.tool_threads)
+        return
+
+    # Workers listen on the ports following the router's port
+    worker_ports = [args.port + i + 1 for i in range(args.workers)]
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(args.host, port, args.session_ttl, args.max_sessions, args.tool_threads),
+            daemon=True
+        )
+        for port in worker_ports
+    ]
+    for process in processes:
+        process.start()
+
+    worker_urls = [f"http://{args.host}:{port}" for port in worker_ports]
+    print(f"Agent router listening on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        web.run_app(create_router_app(worker_urls), host=args.host, port=args.port, print=None)
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
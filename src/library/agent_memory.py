@@ -0,0 +1,347 @@
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import OrderedDict, deque
+
+
+def wallet_summary(wallet_data: dict) -> dict:
+    """The fields of a wallet payload the agents use, kept in memory instead of the full payload"""
+    return {
+        "address": wallet_data.get("address"),
+        "type": wallet_data.get("type"),
+        "linkedUser": wallet_data.get("linkedUser"),
+        "createdAt": wallet_data.get("createdAt")
+    }
+
+
+def _remove_file(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def process_rss_bytes() -> int:
+    """Resident set size of this process, or the peak RSS where the current one isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class AgentStore:
+    """
+    sqlite store that agent state spills to once it is evicted from memory
+
+    Several agents can share one file, each under its own namespace, and
+    view() gives them one connection to it. Without a path a temporary file
+    is used and removed on close() (or when the store is garbage collected
+    or the process exits), so spilled state leaves memory without persisting
+    across runs.
+
+    Args:
+        path (str): sqlite file, None for a temporary one
+        namespace (str): Keeps the rows of one agent or session apart from the others
+        max_tool_results (int): Tool results kept on disk per namespace, older ones are deleted
+    """
+
+    def __init__(self, path: str = None, namespace: str = "default", max_tool_results: int = 1000):
+        self.temporary = path is None
+        if self.temporary:
+            fd, path = tempfile.mkstemp(prefix="agent_memory_", suffix=".sqlite3")
+            os.close(fd)
+            self._cleanup = weakref.finalize(self, _remove_file, path)
+        self.path = path
+        self.namespace = namespace
+        self.max_tool_results = max_tool_results
+        self.is_view = False
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS wallets ("
+            "namespace TEXT, address TEXT, summary TEXT, payload TEXT, last_used REAL, "
+            "PRIMARY KEY (namespace, address))"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tool_results ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, namespace TEXT, tool TEXT, result TEXT, created REAL)"
+        )
+        self.db.commit()
+
+    def view(self, namespace: str) -> "AgentStore":
+        """
+        The same file and connection under another namespace, e.g. one per service session
+
+        Closing a view deletes its namespace's rows and leaves the store open,
+        so the store must be kept and closed by whoever created it.
+        """
+        view = copy.copy(self)
+        view.namespace = namespace
+        view.is_view = True
+        return view
+
+    def save_wallet(self, summary: dict, payload: dict) -> bool:
+        """Insert or update a wallet, returns True if it wasn't stored yet"""
+        with self._lock:
+            exists = self.db.execute(
+                "SELECT 1 FROM wallets WHERE namespace = ? AND address = ?",
+                (self.namespace, summary["address"].lower())
+            ).fetchone()
+            self.db.execute(
+                "INSERT INTO wallets (namespace, address, summary, payload, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, address) DO UPDATE SET summary = excluded.summary, "
+                "payload = excluded.payload, last_used = excluded.last_used",
+                (self.namespace, summary["address"].lower(), json.dumps(summary), json.dumps(payload), time.time())
+            )
+            self.db.commit()
+        return exists is None
+
+    def load_wallet(self, address: str, payload: bool = False):
+        """Summary (or full payload) of a stored wallet, marked as recently used"""
+        column = "payload" if payload else "summary"
+        with self._lock:
+            row = self.db.execute(
+                f"SELECT {column} FROM wallets WHERE namespace = ? AND address = ?",
+                (self.namespace, address.lower())
+            ).fetchone()
+            if row:
+                self.db.execute(
+                    "UPDATE wallets SET last_used = ? WHERE namespace = ? AND address = ?",
+                    (time.time(), self.namespace, address.lower())
+                )
+                self.db.commit()
+        return json.loads(row[0]) if row else None
+
+    def recent_wallets(self, limit: int) -> list:
+        """Summaries of the most recently used wallets, oldest first"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT summary FROM wallets WHERE namespace = ? ORDER BY last_used DESC LIMIT ?",
+                (self.namespace, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def wallet_count(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM wallets WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+    def save_tool_result(self, tool: str, result):
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO tool_results (namespace, tool, result, created) VALUES (?, ?, ?, ?)",
+                (self.namespace, tool, json.dumps(result, default=str), time.time())
+            )
+            self.db.execute(
+                "DELETE FROM tool_results WHERE namespace = ? AND id NOT IN "
+                "(SELECT id FROM tool_results WHERE namespace = ? ORDER BY id DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_tool_results)
+            )
+            self.db.commit()
+
+    def recent_tool_results(self, limit: int) -> list:
+        """The last limit tool results, oldest first"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT tool, result FROM tool_results WHERE namespace = ? ORDER BY id DESC LIMIT ?",
+                (self.namespace, limit)
+            ).fetchall()
+        return [{"tool": tool, "result": json.loads(result)} for tool, result in reversed(rows)]
+
+    def tool_result_count(self) -> int:
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM tool_results WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def close(self):
+        with self._lock:
+            if self.is_view:
+                self.db.execute("DELETE FROM wallets WHERE namespace = ?", (self.namespace,))
+                self.db.execute("DELETE FROM tool_results WHERE namespace = ?", (self.namespace,))
+                self.db.commit()
+                return
+            self.db.close()
+        if self.temporary:
+            self._cleanup()
+
+
+class WalletRegistry:
+    """
+    Wallets tracked by an agent, with at most max_resident of them in memory
+
+    Only a short summary of each wallet (address, type) is kept in memory;
+    the full payload goes to the store. The least recently used wallets are
+    evicted once more than max_resident are tracked and are reloaded from the
+    store when looked up by address. Iterating, indexing and len() only see
+    the resident wallets, count() includes the evicted ones.
+
+    Args:
+        store (AgentStore): Where wallets are written through and reloaded from
+        max_resident (int): Wallet summaries kept in memory
+    """
+
+    def __init__(self, store: AgentStore, max_resident: int = 20):
+        self.store = store
+        self.max_resident = max_resident
+        self._resident = OrderedDict()
+        self._count = store.wallet_count()
+        self.reloads = 0
+        for summary in store.recent_wallets(max_resident):
+            self._resident[summary["address"].lower()] = summary
+
+    def add(self, wallet_data: dict) -> dict:
+        """Track a wallet payload (e.g. the wallet_data returned by create_wallet)"""
+        summary = wallet_summary(wallet_data)
+        if self.store.save_wallet(summary, wallet_data):
+            self._count += 1
+        self._remember(summary)
+        return summary
+
+    append = add
+
+    def extend(self, wallets: list):
+        for wallet_data in wallets:
+            self.add(wallet_data)
+
+    def get(self, address: str):
+        """Summary of a tracked wallet, reloaded from the store if it was evicted"""
+        key = address.lower()
+        if key in self._resident:
+            self._resident.move_to_end(key)
+            return self._resident[key]
+        summary = self.store.load_wallet(address)
+        if summary:
+            self.reloads += 1
+            self._remember(summary)
+        return summary
+
+    def payload(self, address: str):
+        """Full payload the wallet was created with"""
+        return self.store.load_wallet(address, payload=True)
+
+    def count(self) -> int:
+        """Tracked wallets, in memory or evicted"""
+        return self._count
+
+    def _remember(self, summary: dict):
+        key = summary["address"].lower()
+        self._resident[key] = summary
+        self._resident.move_to_end(key)
+        while len(self._resident) > self.max_resident:
+            self._resident.popitem(last=False)
+
+    def __iter__(self):
+        return iter(list(self._resident.values()))
+
+    def __len__(self):
+        return len(self._resident)
+
+    def __getitem__(self, index):
+        return list(self._resident.values())[index]
+
+
+class ToolResultLog:
+    """
+    Full tool results of an agent, the last max_resident of them in memory
+
+    Every result is written to the store, so results older than the in
+    memory window can still be listed with recent().
+
+    Args:
+        store (AgentStore): Where results are written through
+        max_resident (int): Results kept in memory
+    """
+
+    def __init__(self, store: AgentStore, max_resident: int = 20):
+        self.store = store
+        self.max_resident = max_resident
+        self._resident = deque(maxlen=max_resident)
+
+    def append(self, entry: dict):
+        """Record a {"tool": name, "result": result} entry"""
+        self.store.save_tool_result(entry["tool"], entry["result"])
+        self._resident.append(entry)
+
+    def recent(self, limit: int = None) -> list:
+        """The last limit results, oldest first, reloaded from the store beyond the in memory window"""
+        limit = limit or self.max_resident
+        if limit <= len(self._resident):
+            return list(self._resident)[-limit:]
+        return self.store.recent_tool_results(limit)
+
+    def count(self) -> int:
+        return self.store.tool_result_count()
+
+    def __iter__(self):
+        return iter(list(self._resident))
+
+    def __len__(self):
+        return len(self._resident)
+
+
+def agent_store_from_env(namespace: str = "default", path: str = None) -> AgentStore:
+    """
+    Store at path, AGENT_MEMORY_STORE_PATH or a temporary file, keeping
+    AGENT_MEMORY_MAX_STORED_TOOL_RESULTS (1000) tool results per namespace
+    """
+    return AgentStore(
+        path or os.getenv("AGENT_MEMORY_STORE_PATH") or None,
+        namespace,
+        max_tool_results=int(os.getenv("AGENT_MEMORY_MAX_STORED_TOOL_RESULTS", "1000"))
+    )
+
+
+class AgentMemory:
+    """
+    Bounded in-memory state of one agent: tracked wallets and tool results
+
+    Limits come from the environment:
+        AGENT_MAX_RESIDENT_WALLETS (20) wallet summaries kept in memory
+        AGENT_MAX_RESIDENT_TOOL_RESULTS (20) full tool results kept in memory
+        AGENT_MEMORY_STORE_PATH sqlite file to spill to, a temporary file by default
+
+    Args:
+        namespace (str): Keeps this agent's rows apart when the store file is shared
+        path (str): Overrides AGENT_MEMORY_STORE_PATH
+        store (AgentStore): Store shared with other agents, used through a view of namespace
+    """
+
+    def __init__(self, namespace: str = "default", path: str = None, store: AgentStore = None):
+        self.store = store.view(namespace) if store is not None else agent_store_from_env(namespace, path)
+        self.wallets = WalletRegistry(self.store, int(os.getenv("AGENT_MAX_RESIDENT_WALLETS", "20")))
+        self.tool_results = ToolResultLog(self.store, int(os.getenv("AGENT_MAX_RESIDENT_TOOL_RESULTS", "20")))
+
+    def report(self, **extra) -> dict:
+        """Sizes of the agent state in memory and on disk, plus the process RSS"""
+        report = {
+            "rss_mb": round(process_rss_bytes() / 2**20, 1),
+            "wallets": {
+                "resident": len(self.wallets),
+                "max_resident": self.wallets.max_resident,
+                "total": self.wallets.count(),
+                "reloaded_from_store": self.wallets.reloads
+            },
+            "tool_results": {
+                "resident": len(self.tool_results),
+                "max_resident": self.tool_results.max_resident,
+                "stored": self.tool_results.count()
+            },
+            "store": {"path": self.store.path, "size_kb": round(self.store.size_bytes() / 1024, 1)}
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["python_heap_mb"] = {"current": round(current / 2**20, 1), "peak": round(peak / 2**20, 1)}
+        report.update(extra)
+        return report
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,140 @@
+import json
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of tokens in a piece of text
+
+    Uses the ~4 characters per token rule of thumb, which is close enough
+    for budgeting prompt size without pulling in a tokenizer.
+    """
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+def _message_tokens(message: dict) -> int:
+    # Every message carries a few tokens of overhead for role and separators
+    return estimate_tokens(json.dumps(message)) + 4
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if text is None or len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f"... [truncated {len(text) - max_chars} chars]"
+
+
+class ConversationMemory:
+    """
+    Conversation history for the chat completions agent, kept under a token budget
+
+    Each turn (a user message, the assistant reply and any tool results) is
+    stored as a group so tool calls and their outputs are never split apart.
+    When the budget is exceeded the oldest turns are folded one at a time into
+    a short running summary that is sent along with the remaining turns.
+
+    Args:
+        max_tokens (int): Token budget for the summary plus the recorded turns
+        max_tool_output_chars (int): Tool results longer than this are truncated
+        max_summary_tokens (int): Token budget for the running summary
+    """
+
+    def __init__(self, max_tokens: int = 3000, max_tool_output_chars: int = 1500, max_summary_tokens: int = 400):
+        self.max_tokens = max_tokens
+        self.max_tool_output_chars = max_tool_output_chars
+        self.max_summary_tokens = max_summary_tokens
+        self.turns = []
+        self.summary_lines = []
+
+    def add_user_message(self, content: str):
+        """Start a new turn with the user's message"""
+        self.turns.append([{"role": "user", "content": content}])
+        self._enforce_budget()
+
+    def add_assistant_message(self, message):
+        """Record the assistant reply (an OpenAI message object or a dict)"""
+        if isinstance(message, dict):
+            entry = dict(message)
+        else:
+            entry = {"role": "assistant", "content": message.content}
+            if message.tool_calls:
+                entry["tool_calls"] = [
+                    {
+                        "id": tool_call.id,
+                        "type": "function",
+                        "function": {
+                            "name": tool_call.function.name,
+                            "arguments": tool_call.function.arguments
+                        }
+                    }
+                    for tool_call in message.tool_calls
+                ]
+        self._current_turn().append(entry)
+        self._enforce_budget()
+
+    def add_tool_result(self, tool_call_id: str, result):
+        """Record the output of a tool call made by the assistant"""
+        output = result if isinstance(result, str) else json.dumps(result)
+        self._current_turn().append({
+            "role": "tool",
+            "tool_call_id": tool_call_id,
+            "content": _truncate(output, self.max_tool_output_chars)
+        })
+        self._enforce_budget()
+
+    def messages(self) -> list:
+        """Messages to send after the system prompt: summary first, then recorded turns"""
+        messages = []
+        if self.summary_lines:
+            messages.append({
+                "role": "system",
+                "content": "Summary of earlier conversation:\n" + "\n".join(self.summary_lines)
+            })
+        for turn in self.turns:
+            messages.extend(turn)
+        return messages
+
+    def token_count(self) -> int:
+        """Estimated token count of the messages returned by messages()"""
+        return sum(_message_tokens(message) for message in self.messages())
+
+    def clear(self):
+        self.turns = []
+        self.summary_lines = []
+
+    def _current_turn(self) -> list:
+        if not self.turns:
+            self.turns.append([])
+        return self.turns[-1]
+
+    def _enforce_budget(self):
+        # Fold the oldest turns into the summary, always keeping the current one
+        while len(self.turns) > 1 and self.token_count() > self.max_tokens:
+            self._summarize_turn(self.turns.pop(0))
+
+        # A single oversized turn can only be shrunk by trimming its tool outputs
+        if self.token_count() > self.max_tokens and self.turns:
+            limit = self.max_tool_output_chars // 4
+            for message in self.turns[-1]:
+                # Leave room for the truncation marker so we don't re-truncate
+                if message["role"] == "tool" and len(message["content"]) > limit + 64:
+                    message["content"] = _truncate(message["content"], limit)
+
+    def _summarize_turn(self, turn: list):
+        parts = []
+        for message in turn:
+            if message["role"] == "user":
+                parts.append(f"user asked: {_truncate(message['content'], 120)}")
+            elif message["role"] == "assistant":
+                for tool_call in message.get("tool_calls", []):
+                    parts.append(f"called {tool_call['function']['name']}({_truncate(tool_call['function']['arguments'], 120)})")
+                if message.get("content"):
+                    parts.append(f"assistant replied: {_truncate(message['content'], 120)}")
+            elif message["role"] == "tool":
+                parts.append(f"tool result: {_truncate(message['content'], 160)}")
+
+        if parts:
+            self.summary_lines.append("- " + "; ".join(parts))
+
+        while len(self.summary_lines) > 1 and estimate_tokens("\n".join(self.summary_lines)) > self.max_summary_tokens:
+            self.summary_lines.pop(0)
@@ -0,0 +1,100 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ENVIRONMENTS = {
+    "staging": "https://staging.crossmint.com",
+    "production": "https://www.crossmint.com",
+}
+
+# Wallets and transactions are served by the dated API, balances and the faucet by v1-alpha2
+WALLETS_API_VERSION = "2022-06-09"
+BALANCES_API_VERSION = "v1-alpha2"
+
+
+class CrossmintEndpoints:
+    """
+    URLs of the Crossmint wallet API endpoints used by wallet_utils
+
+    Args:
+        environment (str): "staging" or "production"
+        base_url (str): Overrides the environment's host, e.g. a local stand-in like flow/crossmint_stub.py
+    """
+
+    def __init__(self, environment: str = "staging", base_url: str = None):
+        if environment not in ENVIRONMENTS and not base_url:
+            raise ValueError(f"Unknown Crossmint environment: {environment}. Must be one of: {list(ENVIRONMENTS)}")
+        self.environment = environment
+        self.base_url = (base_url or ENVIRONMENTS[environment]).rstrip("/")
+
+    def wallets(self) -> str:
+        return f"{self.base_url}/api/{WALLETS_API_VERSION}/wallets"
+
+    def transactions(self, wallet_address: str) -> str:
+        return f"{self.wallets()}/{wallet_address}/transactions"
+
+    def transaction(self, wallet_address: str, transaction_id: str) -> str:
+        return f"{self.transactions(wallet_address)}/{transaction_id}"
+
+    def approvals(self, wallet_address: str, transaction_id: str) -> str:
+        return f"{self.transaction(wallet_address, transaction_id)}/approvals"
+
+    def balances(self, wallet_address: str) -> str:
+        return f"{self.base_url}/api/{BALANCES_API_VERSION}/wallets/{wallet_address}/balances"
+
+    def __repr__(self):
+        return f"CrossmintEndpoints(environment={self.environment!r}, base_url={self.base_url!r})"
+
+
+def endpoints_from_env() -> CrossmintEndpoints:
+    """Endpoints for CROSSMINT_ENV (default "staging"), or for the host in CROSSMINT_BASE_URL when set"""
+    return CrossmintEndpoints(os.getenv("CROSSMINT_ENV", "staging"), os.getenv("CROSSMINT_BASE_URL"))
+
+
+class PooledSession:
+    """
+    One requests session per thread, all sharing a single connection pool
+
+    requests.Session isn't thread-safe (its cookies and adapters are mutated
+    during a request), so each thread gets its own session. They all mount
+    the same HTTPAdapter, whose urllib3 pool is thread-safe, so a connection
+    opened by one thread is reused by the others.
+
+    Args:
+        adapter (HTTPAdapter): Adapter mounted for http:// and https:// on every session
+    """
+
+    def __init__(self, adapter: HTTPAdapter):
+        self.adapter = adapter
+        self._local = threading.local()
+
+    def session(self) -> requests.Session:
+        """The calling thread's session, created on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session().request(method, url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.session().head(url, **kwargs)
+
+
+def create_session(pool_size: int = None) -> PooledSession:
+    """
+    Per-thread requests sessions that keep up to pool_size connections per host open for reuse
+
+    Without a session every call opens a new connection and pays for DNS,
+    TCP and TLS again. The pool size defaults to CROSSMINT_POOL_SIZE (16);
+    extra concurrent requests still go through, on connections that are
+    closed afterwards.
+    """
+    pool_size = pool_size or int(os.getenv("CROSSMINT_POOL_SIZE", "16"))
+    return PooledSession(HTTPAdapter(pool_maxsize=pool_size))
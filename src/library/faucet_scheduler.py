@@ -0,0 +1,301 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from datetime import datetime
+
+from library.request_scheduler import PRIORITIES, current_priority, request_priority
+from library.wallet_utils import get_usdc_from_faucet, get_wallet_balance
+
+
+def _is_rate_limited(response: dict) -> bool:
+    error = str(response.get("error", "")).lower()
+    return response.get("rate_limited", False) or "429" in error or "too many" in error or "rate limit" in error
+
+
+class FaucetScheduler:
+    """
+    Queues faucet requests per wallet and sends them spaced out to stay within the faucet quota
+
+    Requests for a wallet that is still waiting in the queue are merged into
+    a single faucet call for the combined amount. Calls are sent at most
+    every min_interval seconds; on a 429 the interval doubles (up to
+    max_interval) and the request is retried, and it eases back to
+    min_interval after successful calls.
+
+    request() returns a Future that resolves to a result dict once the funds
+    show up in the wallet balance, or to an error dict if the faucet call
+    fails, raises or the funds don't arrive within confirm_timeout seconds.
+    The balance read before the call is retried up to max_attempts times, since
+    the credit can't be confirmed without it.
+    wait() bounds how long a caller blocks on one.
+
+    The faucet call and balance checks of a request are sent with the
+    request priority of the caller (the most urgent one for merged requests).
+
+    Args:
+        api_key (str): Crossmint API key
+        chain (str): Blockchain network
+        min_interval (float): Minimum seconds between faucet calls
+        max_interval (float): Upper bound for the interval after repeated 429s
+        max_attempts (int): Faucet calls per request before giving up on 429s
+        confirm_timeout (float): Seconds to wait for the funds to show up in the balance
+        poll_interval (float): Seconds between balance checks while confirming
+        wait_timeout (float): Seconds wait() blocks on a request before returning an error
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        chain: str = "base-sepolia",
+        min_interval: float = 2.0,
+        max_interval: float = 60.0,
+        max_attempts: int = 6,
+        confirm_timeout: float = 60.0,
+        poll_interval: float = 2.0,
+        wait_timeout: float = 300.0
+    ):
+        self.api_key = api_key
+        self.chain = chain
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_attempts = max_attempts
+        self.confirm_timeout = confirm_timeout
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout
+
+        self._queue = OrderedDict()
+        self._confirming = []
+        self._interval = min_interval
+        self._next_send_at = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._stats = {"requests": 0, "merged": 0, "faucet_calls": 0, "rate_limited": 0, "confirmed": 0, "failed": 0}
+
+    def request(self, wallet_address: str, amount: int) -> Future:
+        """
+        Queue a faucet request, merging it with a queued request for the same wallet
+
+        Args:
+            wallet_address (str): Wallet address to fund
+            amount (int): Amount of USDC to request
+
+        Returns:
+            Future: Resolves to a dict with status, amount, balance and the faucet transaction_data
+        """
+        future = Future()
+        key = wallet_address.lower()
+        priority = current_priority()
+        with self._cond:
+            if self._stopped:
+                future.set_result({"status": "error", "error": "Faucet scheduler was shut down"})
+                return future
+            self._stats["requests"] += 1
+            entry = self._queue.get(key)
+            if entry is not None:
+                entry["amount"] += amount
+                entry["futures"].append(future)
+                entry["priority"] = min(entry["priority"], priority, key=PRIORITIES.index)
+                self._stats["merged"] += 1
+            else:
+                self._queue[key] = {
+                    "wallet_address": wallet_address,
+                    "amount": amount,
+                    "futures": [future],
+                    "attempts": 0,
+                    "priority": priority
+                }
+            # Started on first use, and again if the worker died
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="faucet-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def wait(self, future: Future, timeout: float = None) -> dict:
+        """
+        Result of a request() future, or an error dict if it isn't resolved within timeout seconds
+
+        Args:
+            timeout (float): Seconds to wait (default: wait_timeout)
+        """
+        timeout = self.wait_timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            return {"status": "error", "error": f"Faucet request did not complete within {timeout:.0f}s"}
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(
+                self._stats,
+                queued=len(self._queue),
+                confirming=len(self._confirming),
+                interval_s=round(self._interval, 2)
+            )
+
+    def shutdown(self):
+        """Stop the worker, failing anything still queued or unconfirmed"""
+        with self._cond:
+            self._stopped = True
+            entries = list(self._queue.values()) + [item["entry"] for item in self._confirming]
+            self._queue.clear()
+            self._confirming.clear()
+            self._cond.notify()
+        for entry in entries:
+            self._resolve(entry, {"status": "error", "error": "Faucet scheduler was shut down"})
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._queue and not self._confirming:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+                now = time.monotonic()
+                due = []
+                if self._queue:
+                    due.append(self._next_send_at)
+                if self._confirming:
+                    due.append(min(item["next_check"] for item in self._confirming))
+                if min(due) > now:
+                    self._cond.wait(min(due) - now)
+                    continue
+
+                if self._queue and self._next_send_at <= now:
+                    _, entry = self._queue.popitem(last=False)
+                    item = None
+                else:
+                    item = min(self._confirming, key=lambda i: i["next_check"])
+                    self._confirming.remove(item)
+
+            # Network calls happen outside the lock so callers can keep queueing
+            try:
+                if item is None:
+                    with request_priority(entry["priority"]):
+                        self._send(entry)
+                else:
+                    with request_priority(item["entry"]["priority"]):
+                        self._confirm(item)
+            except Exception as e:
+                # Fail this request instead of the worker, which the rest of the queue depends on
+                self._resolve(entry if item is None else item["entry"],
+                              {"status": "error", "error": f"Faucet request failed: {e}"})
+
+    def _read_balance(self, wallet_address: str):
+        result = get_wallet_balance(self.api_key, self.chain, wallet_address)
+        return result.get("balance") if result.get("status") == "success" else None
+
+    def _send(self, entry: dict):
+        # Without the balance before the call there is no telling when the credit landed
+        baseline = self._read_balance(entry["wallet_address"])
+        if baseline is None:
+            entry["balance_reads"] = entry.get("balance_reads", 0) + 1
+            if entry["balance_reads"] >= self.max_attempts:
+                self._resolve(entry, {
+                    "status": "error",
+                    "error": f"Could not read the balance of {entry['wallet_address']} before the faucet call"
+                })
+                return
+            with self._cond:
+                self._next_send_at = max(self._next_send_at, time.monotonic() + self.poll_interval)
+                self._requeue(entry)
+            return
+
+        response = get_usdc_from_faucet(self.api_key, self.chain, entry["wallet_address"], entry["amount"])
+        entry["attempts"] += 1
+
+        with self._cond:
+            self._stats["faucet_calls"] += 1
+            now = time.monotonic()
+
+            if response.get("status") == "success":
+                self._interval = max(self.min_interval, self._interval / 2)
+                self._next_send_at = now + self._interval
+                self._confirming.append({
+                    "entry": entry,
+                    "response": response,
+                    "target": baseline + entry["amount"],
+                    "deadline": now + self.confirm_timeout,
+                    "next_check": now
+                })
+                return
+
+            if _is_rate_limited(response) and entry["attempts"] < self.max_attempts:
+                self._stats["rate_limited"] += 1
+                self._interval = min(self.max_interval, self._interval * 2)
+                self._next_send_at = now + self._interval
+                self._requeue(entry)
+                return
+
+        self._resolve(entry, response)
+
+    def _requeue(self, entry: dict):
+        # Retry first, folding in anything queued for the wallet in the meantime (called with the lock held)
+        key = entry["wallet_address"].lower()
+        queued = self._queue.pop(key, None)
+        if queued is not None:
+            entry["amount"] += queued["amount"]
+            entry["futures"].extend(queued["futures"])
+            entry["priority"] = min(entry["priority"], queued["priority"], key=PRIORITIES.index)
+        self._queue[key] = entry
+        self._queue.move_to_end(key, last=False)
+
+    def _confirm(self, item: dict):
+        entry = item["entry"]
+        balance = self._read_balance(entry["wallet_address"])
+
+        if balance is not None and balance >= item["target"] - 1e-9:
+            result = dict(item["response"], amount=entry["amount"], balance=balance, merged_requests=len(entry["futures"]))
+            self._resolve(entry, result)
+            return
+
+        now = time.monotonic()
+        if now >= item["deadline"]:
+            self._resolve(entry, dict(
+                item["response"],
+                status="error",
+                error=f"Faucet funds did not show up in the balance within {self.confirm_timeout:.0f}s",
+                balance=balance
+            ))
+            return
+
+        with self._cond:
+            item["next_check"] = now + self.poll_interval
+            self._confirming.append(item)
+
+    def _resolve(self, entry: dict, result: dict):
+        result.setdefault("timestamp", datetime.utcnow().isoformat())
+        with self._cond:
+            self._stats["confirmed" if result.get("status") == "success" else "failed"] += 1
+        for future in entry["futures"]:
+            if not future.done():
+                future.set_result(dict(result))
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_faucet_scheduler(api_key: str, chain: str = "base-sepolia") -> FaucetScheduler:
+    """
+    Process-wide scheduler per API key and chain, so every caller shares one faucet quota
+
+    The spacing between faucet calls can be set with FAUCET_MIN_INTERVAL (seconds), and how long
+    callers wait for a request with FAUCET_WAIT_TIMEOUT.
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get((api_key, chain))
+        if scheduler is None:
+            scheduler = FaucetScheduler(
+                api_key,
+                chain,
+                min_interval=float(os.getenv("FAUCET_MIN_INTERVAL", "2.0")),
+                confirm_timeout=float(os.getenv("FAUCET_CONFIRM_TIMEOUT", "60")),
+                wait_timeout=float(os.getenv("FAUCET_WAIT_TIMEOUT", "300"))
+            )
+            _schedulers[(api_key, chain)] = scheduler
+        return scheduler
@@ -0,0 +1,236 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from library import profiling
+
+
+class FlowStep:
+    """
+    A single step of a flow
+
+    Args:
+        name (str): Unique step name
+        func (callable): Called with a dict of the outputs of completed steps, returns this step's output
+        deps (list): Names of the steps whose outputs this step needs
+        checkpoint (bool): Keep the output for a resumed run, for steps with side effects that must
+            not be repeated; reads such as balance checks or waits are run again instead
+        resets (list): Checkpointed steps to forget if this step fails, so a resumed run does
+            them again, e.g. a transfer whose transaction turned out to fail
+    """
+
+    def __init__(self, name: str, func, deps: list = None, checkpoint: bool = True, resets: list = None):
+        self.name = name
+        self.func = func
+        self.deps = deps or []
+        self.checkpoint = checkpoint
+        self.resets = resets or []
+
+
+class FlowCheckpoint:
+    """
+    Outputs of completed steps saved to a local JSON file
+
+    Step outputs must be JSON serializable. The file is rewritten atomically
+    after every completed step, so a crash never leaves it half written. A
+    state file that can't be read anyway (e.g. edited by hand) is treated
+    as empty.
+
+    Args:
+        path (str): Where to keep the state file
+        flow (str): Name of the flow, a state file written by another flow is ignored
+        fresh (bool): Remove the state file instead of loading it
+    """
+
+    def __init__(self, path: str, flow: str, fresh: bool = False):
+        self.path = path
+        self.flow = flow
+        self._lock = threading.Lock()
+        self.outputs = {}
+        if fresh:
+            self.clear()
+        elif os.path.exists(path):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint {path}: {e}")
+                state = {}
+            if isinstance(state, dict) and state.get("flow") == flow and isinstance(state.get("outputs"), dict):
+                self.outputs = state["outputs"]
+
+    def save(self, name: str, output):
+        with self._lock:
+            self.outputs[name] = output
+            self._write()
+
+    def discard(self, names: list):
+        """Forget the outputs of some steps so a resumed run does them again"""
+        with self._lock:
+            discarded = [name for name in names if self.outputs.pop(name, None) is not None]
+            if discarded:
+                self._write()
+
+    def _write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"flow": self.flow, "outputs": self.outputs}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Forget all outputs, e.g. once the flow completed"""
+        with self._lock:
+            self.outputs = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class FlowExecutor:
+    """
+    Runs flow steps as a dependency graph, starting each step as soon as all of its deps finished
+
+    Steps run on a thread pool since they are dominated by HTTP calls and
+    sleeps. If a step raises, the steps depending on it are skipped and the
+    first error is reported once the running steps finish. With a checkpoint,
+    checkpointed steps that completed in an earlier run are not run again.
+    """
+
+    def __init__(self, steps: list, max_workers: int = 4, checkpoint: FlowCheckpoint = None):
+        self.steps = {step.name: step for step in steps}
+        self.max_workers = max_workers
+        self.checkpoint = checkpoint
+        self._validate()
+        self.outputs = {}
+        self.timings = {}
+        self.errors = {}
+        self.skipped = []
+        self.resumed = []
+
+    def _validate(self):
+        for step in self.steps.values():
+            for dep in step.deps:
+                if dep not in self.steps:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+
+        # Kahn's algorithm, any step left over is part of a cycle
+        remaining = {name: set(step.deps) for name, step in self.steps.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def run(self) -> dict:
+        """
+        Run every step of the flow
+
+        Returns:
+            dict: Outputs of the completed steps by step name
+
+        Raises:
+            Exception: The first exception raised by a step, after running steps finish
+        """
+        self.start = time.perf_counter()
+        pending = dict(self.steps)
+        lock = threading.Lock()
+
+        if self.checkpoint is not None:
+            for name, output in self.checkpoint.outputs.items():
+                if name in pending and pending[name].checkpoint:
+                    self.outputs[name] = output
+                    self.resumed.append(name)
+                    del pending[name]
+
+        # Steps run on pool threads, keep their spans under the caller's span
+        parent_span = profiling.current_span_id()
+
+        def execute(step):
+            started = time.perf_counter()
+            try:
+                with lock:
+                    inputs = dict(self.outputs)
+                with profiling.attach(parent_span), profiling.span(f"step {step.name}", "step"):
+                    return step.func(inputs)
+            finally:
+                self.timings[step.name] = (started - self.start, time.perf_counter() - self.start)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+
+            while pending or running:
+                # Start every step whose deps are all done, and skip the dependents of a
+                # failed step until no more are found, as steps aren't in dependency order
+                changed = True
+                while changed:
+                    changed = False
+                    for name, step in list(pending.items()):
+                        if any(dep in self.errors or dep in self.skipped for dep in step.deps):
+                            self.skipped.append(name)
+                            del pending[name]
+                            changed = True
+                        elif all(dep in self.outputs for dep in step.deps):
+                            # Steps keep the caller's context, e.g. its request priority
+                            running[executor.submit(contextvars.copy_context().run, execute, step)] = name
+                            del pending[name]
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        output = future.result()
+                        with lock:
+                            self.outputs[name] = output
+                        if self.checkpoint is not None and self.steps[name].checkpoint:
+                            self.checkpoint.save(name, output)
+                    except Exception as e:
+                        self.errors[name] = e
+                        if self.checkpoint is not None and self.steps[name].resets:
+                            self.checkpoint.discard(self.steps[name].resets)
+
+        self.total = time.perf_counter() - self.start
+        if self.errors:
+            raise next(iter(self.errors.values()))
+        return self.outputs
+
+    def critical_path(self) -> list:
+        """Steps on the longest chain, found by walking back from the last step to finish"""
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while True:
+            deps = [dep for dep in self.steps[name].deps if dep in self.timings]
+            if not deps:
+                break
+            name = max(deps, key=lambda n: self.timings[n][1])
+            path.append(name)
+        return list(reversed(path))
+
+    def print_waterfall(self, width: int = 50):
+        """Print when each step started and how long it took, critical path marked with *"""
+        total = max((end for _, end in self.timings.values()), default=0) or 1
+        critical = set(self.critical_path())
+        name_width = max((len(name) for name in self.steps), default=4) + 2
+
+        print(f"\n{'step':<{name_width}} {'start':>7} {'dur':>7}")
+        for name in self.resumed:
+            print(f" {name:<{name_width - 1}} resumed from checkpoint")
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            offset = int(start / total * width)
+            length = max(1, int((end - start) / total * width))
+            marker = "*" if name in critical else " "
+            status = " (failed)" if name in self.errors else ""
+            print(f"{marker}{name:<{name_width - 1}} {start:>6.2f}s {end - start:>6.2f}s |"
+                  f"{' ' * offset}{'#' * length}{' ' * (width - offset - length)}|{status}")
+        for name in self.skipped:
+            print(f" {name:<{name_width - 1}} skipped")
+        print(f"Total: {total:.2f}s (* = critical path)")
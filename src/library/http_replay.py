@@ -0,0 +1,214 @@
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+
+FORMAT = "crossmint-http-v1"
+
+
+def _relative_url(url: str) -> str:
+    """Path and query only, so a recording replays against any base URL"""
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class RecordingTransport:
+    """
+    Transport that forwards requests and writes each request/response pair to a file
+
+    The file is JSON lines, gzip compressed when the path ends in .gz. The
+    first line is a header, then one line per request with its offset from
+    the start of the recording, method, relative URL, request body, status,
+    response body and the time the call took. Request headers are not
+    written, so the API key never ends up in a recording.
+
+    Args:
+        path (str): File to write, e.g. "session.jsonl.gz"
+        inner (callable): Transport that actually sends the requests, requests.request by default
+    """
+
+    def __init__(self, path: str, inner=None):
+        self.path = path
+        self.inner = inner or requests.request
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._file = _open(path, "w")
+        self._write({"format": FORMAT, "recorded_at": time.time()})
+        atexit.register(self.close)
+
+    def _write(self, record: dict):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._file.flush()
+
+    def __call__(self, method, url, headers=None, json=None, **kwargs):
+        started = time.perf_counter()
+        record = {
+            "at": round(started - self._start, 4),
+            "method": method,
+            "url": _relative_url(url),
+            "request": json
+        }
+        try:
+            response = self.inner(method, url, headers=headers, json=json, **kwargs)
+        except requests.exceptions.RequestException as e:
+            record.update(elapsed=round(time.perf_counter() - started, 4), error=str(e))
+            self._write(record)
+            raise
+
+        record.update(
+            elapsed=round(time.perf_counter() - started, 4),
+            status=response.status_code,
+            body=response.text
+        )
+        self._write(record)
+        return response
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _time_scale(speed: str) -> float:
+    """Factor applied to recorded times: 1 for "original", 0 for "fast", 1 / rate for a playback rate"""
+    if speed == "original":
+        return 1.0
+    if speed == "fast":
+        return 0.0
+    try:
+        rate = float(speed)
+    except (TypeError, ValueError):
+        rate = 0
+    if rate <= 0:
+        raise ValueError(f"Unknown replay speed: {speed}. Must be 'original', 'fast' or a positive playback rate")
+    return 1 / rate
+
+
+class ReplayResponse:
+    """The parts of requests.Response that wallet_utils uses"""
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+        self.ok = status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ReplayTransport:
+    """
+    Transport that answers requests from a recording instead of the network
+
+    Requests are matched on method and relative URL, in recorded order for
+    repeated requests (e.g. polling the same transaction). Once the recorded
+    responses for a request run out, the last one is served again, so extra
+    polls during replay see the final state.
+
+    With speed="original" the recorded timeline is kept: the replay clock
+    starts at the first request, a request sent earlier than its recorded
+    offset is held until that offset, and each response is delayed by the
+    time the recorded call took. Scheduler throttling, faucet backoff and
+    waiter polling then see the same timing as when the traffic was recorded.
+    A number plays the timeline that many times faster ("2" takes half the
+    time), and speed="fast" serves responses immediately, which leaves only
+    the client's own CPU time. Unmatched requests raise a ConnectionError,
+    which wallet_utils reports like a network failure.
+
+    Args:
+        path (str): Recording written by RecordingTransport
+        speed (str): "original", "fast" or a playback rate such as "2"
+    """
+
+    def __init__(self, path: str, speed: str = "original"):
+        self.path = path
+        self.speed = speed
+        self.time_scale = _time_scale(speed)
+        self._started = None
+        self._first_at = None
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+        self._last = {}
+        self.served = 0
+        self.repeated = 0
+        self.unmatched = 0
+
+        with _open(path, "r") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != FORMAT:
+                raise ValueError(f"{path} is not a {FORMAT} recording")
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._queues[(record["method"], record["url"])].append(record)
+                    if self._first_at is None or record["at"] < self._first_at:
+                        self._first_at = record["at"]
+
+    def __call__(self, method, url, headers=None, json=None, **kwargs):
+        key = (method, _relative_url(url))
+        with self._lock:
+            if self._started is None:
+                self._started = time.perf_counter()
+            queue = self._queues.get(key)
+            if queue:
+                record = self._last[key] = queue.popleft()
+                self.served += 1
+            else:
+                record = self._last.get(key)
+                if record is None:
+                    self.unmatched += 1
+                else:
+                    self.repeated += 1
+
+        if record is None:
+            raise requests.exceptions.ConnectionError(f"No recorded response for {method} {key[1]}")
+        if self.time_scale:
+            # Hold the request until its place on the recorded timeline, then for as long as the call took
+            due = self._started + (record["at"] - self._first_at) * self.time_scale
+            time.sleep(max(0.0, due - time.perf_counter()) + record["elapsed"] * self.time_scale)
+        if "error" in record:
+            raise requests.exceptions.ConnectionError(record["error"])
+        return ReplayResponse(record["status"], record["body"])
+
+    def remaining(self) -> int:
+        """Recorded requests that have not been replayed yet"""
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+
+def transport_from_env(inner=None):
+    """
+    Transport selected by environment variables
+
+    CROSSMINT_HTTP_REPLAY: path of a recording (.jsonl or .jsonl.gz) to serve
+        instead of the network; takes precedence over CROSSMINT_HTTP_RECORD
+    CROSSMINT_HTTP_REPLAY_SPEED: "original" (default) keeps the recorded timing,
+        "fast" answers immediately, a positive number such as "2" or "0.5" is
+        the playback rate; anything else raises ValueError
+    CROSSMINT_HTTP_RECORD: path to record the traffic sent through inner to,
+        gzip compressed when it ends in .gz
+
+    With neither path set, requests are sent with inner (requests.request by default).
+    """
+    inner = inner or requests.request
+    if os.getenv("CROSSMINT_HTTP_REPLAY"):
+        return ReplayTransport(os.getenv("CROSSMINT_HTTP_REPLAY"), os.getenv("CROSSMINT_HTTP_REPLAY_SPEED", "original"))
+    if os.getenv("CROSSMINT_HTTP_RECORD"):
+        return RecordingTransport(os.getenv("CROSSMINT_HTTP_RECORD"), inner)
+    return inner
@@ -0,0 +1,114 @@
+import re
+import threading
+
+
+EVM_ADDRESS = r"0x[0-9a-fA-F]{40}"
+SOLANA_ADDRESS = r"[1-9A-HJ-NP-Za-km-z]{32,44}"
+ADDRESS = rf"(?:{EVM_ADDRESS}|{SOLANA_ADDRESS})"
+
+_POLITE = r"(?:please\s+|can you\s+|could you\s+)?"
+_END = r"\s*[.!?]?\s*(?:please)?\s*[.!]?"
+
+
+def _wallet_type(match):
+    return {"wallet_type": "evm-smart-wallet" if match["chain"].lower() == "evm" else "solana-custodial-wallet"}
+
+
+# Each rule fully matches the input, so anything with extra words falls back to the LLM
+INTENT_RULES = [
+    (
+        "create_new_wallet",
+        re.compile(
+            rf"^{_POLITE}(?:create|make|set up)\s+(?:me\s+)?(?:a\s+|an\s+)?(?:new\s+)?"
+            rf"(?P<chain>evm|solana)(?:\s+(?:smart|custodial))?\s+wallet{_END}$",
+            re.IGNORECASE
+        ),
+        _wallet_type
+    ),
+    (
+        "get_wallet_balance",
+        re.compile(
+            rf"^{_POLITE}(?:check\s+|get\s+|show\s+|what(?:'s| is)\s+)?(?:the\s+)?balance\s+(?:of|for)\s+"
+            rf"(?:wallet\s+)?(?P<address>{ADDRESS}){_END}$",
+            re.IGNORECASE
+        ),
+        lambda m: {"wallet_address": m["address"]}
+    ),
+    (
+        "get_usdc_from_faucet",
+        re.compile(
+            rf"^{_POLITE}(?:fund|get|request|add)\s+(?P<amount>\d+)\s+usdc\s+(?:to|for|into)\s+"
+            rf"(?:wallet\s+)?(?P<address>{ADDRESS})(?:\s+from\s+(?:the\s+)?faucet)?{_END}$",
+            re.IGNORECASE
+        ),
+        lambda m: {"wallet_address": m["address"], "amount": int(m["amount"])}
+    ),
+    (
+        "transfer_usdc",
+        re.compile(
+            rf"^{_POLITE}(?:send|transfer)\s+(?P<amount>\d+)\s+usdc\s+from\s+(?:wallet\s+)?(?P<from_address>{ADDRESS})"
+            rf"\s+to\s+(?:wallet\s+)?(?P<to_address>{ADDRESS}){_END}$",
+            re.IGNORECASE
+        ),
+        lambda m: {
+            "from_wallet_address": m["from_address"],
+            "to_wallet_address": m["to_address"],
+            "amount": int(m["amount"])
+        }
+    ),
+]
+
+
+class IntentParser:
+    """
+    Rule based parser that maps unambiguous commands straight to a tool call
+
+    Only inputs that fully match exactly one rule are handled locally,
+    everything else returns None so the caller falls back to the LLM.
+    Hit and miss counts are kept to report the fast path hit rate.
+    """
+
+    def __init__(self, rules: list = None):
+        self.rules = rules if rules is not None else INTENT_RULES
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_tool = {}
+        self._lock = threading.Lock()
+
+    def parse(self, text: str):
+        """
+        Args:
+            text (str): The raw user input
+
+        Returns:
+            tuple: (tool_name, arguments) for an unambiguous command, otherwise None
+        """
+        text = " ".join(text.split())
+        matches = []
+        for tool_name, pattern, build_args in self.rules:
+            match = pattern.match(text)
+            if match:
+                matches.append((tool_name, build_args(match)))
+
+        with self._lock:
+            if len(matches) != 1:
+                self.misses += 1
+                return None
+            self.hits += 1
+            tool_name = matches[0][0]
+            self.hits_by_tool[tool_name] = self.hits_by_tool.get(tool_name, 0) + 1
+        return matches[0]
+
+    def stats(self, avg_llm_latency: float = None) -> dict:
+        """Fast path hit rate, plus the estimated LLM time saved when the average latency is known"""
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "hits_by_tool": dict(self.hits_by_tool)
+            }
+        if avg_llm_latency:
+            stats["estimated_latency_saved_s"] = round(self.hits * avg_llm_latency, 3)
+        return stats
@@ -0,0 +1,367 @@
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Operations recorded by wallet_utils, stored as their index
+OPERATIONS = (
+    "create_wallet",
+    "faucet",
+    "transfer",
+    "create_transaction",
+    "submit_approval",
+    "get_transaction",
+    "get_balance",
+)
+# Values of the "status" key of a wallet_utils result, stored as their index
+STATUSES = ("success", "error", "awaiting_signature", "other")
+
+# Fixed size records: end time (microseconds since the epoch), operation,
+# status, duration (microseconds), amount (USDC base units), chain, wallet,
+# counterparty wallet, transaction id and transaction status. Strings are
+# NUL padded, so a field is found at the same offset in every record.
+RECORD = struct.Struct("<qBBIq16s44s44s36s16s")
+HEADER = struct.Struct("<4sHH8x")
+MAGIC = b"CMJ1"
+VERSION = 1
+SEGMENT_SUFFIX = ".seg"
+
+# (offset, size) of the string fields that lookups search for
+_FIELDS = {
+    "wallet": (struct.calcsize("<qBBIq16s"), 44),
+    "counterparty": (struct.calcsize("<qBBIq16s44s"), 44),
+    "transaction_id": (struct.calcsize("<qBBIq16s44s44s"), 36),
+}
+
+
+def normalize_address(address: str) -> str:
+    """EVM addresses are case insensitive and stored lowercase, other addresses as given"""
+    return address.lower() if address and address.startswith("0x") else (address or "")
+
+
+def _pad(value: str, size: int) -> bytes:
+    return (value or "").encode()[:size].ljust(size, b"\0")
+
+
+def _text(value: bytes) -> str:
+    return value.rstrip(b"\0").decode(errors="replace")
+
+
+class OperationJournal:
+    """
+    Append-only journal of wallet_utils operations in fixed size binary records
+
+    Records go to segment files in directory, named after the time the
+    segment was started, the writing process and a sequence number. A
+    segment is only ever created by the journal that writes it, so several
+    journals or processes can share a directory. A new segment is started
+    every segment_records records. Each record is written with a single append,
+    so a reader never sees records interleaved; a record cut short by a
+    crash is ignored when reading.
+
+    Args:
+        directory (str): Directory the segments are written to, created if missing
+        segment_records (int): Records per segment before a new one is started
+        fsync (bool): fsync after every record instead of leaving it to the OS
+    """
+
+    def __init__(self, directory: str, segment_records: int = 100000, fsync: bool = False):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._fd = None
+        self._segment_count = 0
+        self.segment_path = None
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        started = f"{int(time.time() * 1000):013d}-{os.getpid()}"
+        # O_EXCL: a segment started in the same millisecond gets the next sequence number
+        # instead of a second header in the middle of an existing segment
+        sequence = 0
+        while True:
+            self.segment_path = os.path.join(self.directory, f"{started}-{sequence:04d}{SEGMENT_SUFFIX}")
+            try:
+                self._fd = os.open(self.segment_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+                break
+            except FileExistsError:
+                sequence += 1
+        os.write(self._fd, HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._segment_count = 0
+
+    def append(self, operation: str, status: str, duration: float, wallet: str = None, counterparty: str = None,
+               transaction_id: str = None, amount: int = 0, chain: str = None, transaction_status: str = None):
+        """
+        Record one finished operation
+
+        Args:
+            operation (str): One of OPERATIONS
+            status (str): Result status, one of STATUSES ("other" for anything else)
+            duration (float): Seconds the operation took
+            amount (int): Amount in USDC base units (1000000 = 1 USDC)
+        """
+        status_code = STATUSES.index(status) if status in STATUSES else STATUSES.index("other")
+        with self._lock:
+            record = RECORD.pack(
+                int(time.time() * 1e6),
+                OPERATIONS.index(operation),
+                status_code,
+                min(int(duration * 1e6), 2**32 - 1),
+                int(amount or 0),
+                _pad(chain, 16),
+                _pad(normalize_address(wallet), 44),
+                _pad(normalize_address(counterparty), 44),
+                _pad(transaction_id, 36),
+                _pad(transaction_status, 16)
+            )
+            if self._fd is None or self._segment_count >= self.segment_records:
+                self._open_segment()
+            os.write(self._fd, record)
+            if self.fsync:
+                os.fsync(self._fd)
+            self._segment_count += 1
+            self.written += 1
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def journal_from_env():
+    """Journal to CROSSMINT_JOURNAL_DIR when it is set, otherwise None"""
+    directory = os.getenv("CROSSMINT_JOURNAL_DIR")
+    if not directory:
+        return None
+    return OperationJournal(
+        directory,
+        int(os.getenv("CROSSMINT_JOURNAL_SEGMENT_RECORDS", "100000")),
+        os.getenv("CROSSMINT_JOURNAL_FSYNC", "0") == "1"
+    )
+
+
+def decode(values: tuple) -> dict:
+    """Record dict from the unpacked fields of one record"""
+    end_us, operation, status, duration_us, amount, chain, wallet, counterparty, transaction_id, tx_status = values
+    return {
+        "time": datetime.fromtimestamp(end_us / 1e6, timezone.utc).isoformat(),
+        "operation": OPERATIONS[operation] if operation < len(OPERATIONS) else str(operation),
+        "status": STATUSES[status] if status < len(STATUSES) else str(status),
+        "duration_s": duration_us / 1e6,
+        "amount": amount,
+        "chain": _text(chain),
+        "wallet": _text(wallet),
+        "counterparty": _text(counterparty),
+        "transaction_id": _text(transaction_id),
+        "transaction_status": _text(tx_status)
+    }
+
+
+class Segment:
+    """One memory mapped segment file, read without copying it into memory"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size < HEADER.size:
+            self.count = 0
+            return
+        magic, version, record_size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a version {VERSION} journal segment")
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def offset(self, index: int) -> int:
+        return HEADER.size + index * RECORD.size
+
+    def end_us(self, index: int) -> int:
+        return struct.unpack_from("<q", self.map, self.offset(index))[0]
+
+    def bisect(self, end_us: int) -> int:
+        """Index of the first record written at or after end_us (records are appended in time order)"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.end_us(middle) < end_us:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start: int = 0, stop: int = None):
+        """Unpacked field tuples of records start to stop"""
+        stop = self.count if stop is None else stop
+        if start >= stop:
+            return iter(())
+        return RECORD.iter_unpack(memoryview(self.map)[self.offset(start):self.offset(stop)])
+
+    def find(self, field: str, value: str, start: int = 0, stop: int = None):
+        """Indexes of the records whose field equals value, located with a substring search of the mapped file"""
+        stop = self.count if stop is None else stop
+        field_offset, size = _FIELDS[field]
+        needle = _pad(value, size)
+        position = self.offset(start)
+        end = self.offset(stop)
+        while True:
+            position = self.map.find(needle, position, end)
+            if position < 0:
+                return
+            index, within = divmod(position - HEADER.size, RECORD.size)
+            if within == field_offset:
+                yield index
+                position = self.offset(index + 1)
+            else:
+                position += 1
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self._file.close()
+
+
+class JournalReader:
+    """
+    Queries over the segments of a journal directory
+
+    Segments are memory mapped, and a query only touches the records it
+    needs: segments outside the time range are skipped by their first and
+    last record, the range within a segment is found by binary search, and
+    wallet or transaction lookups search the mapped bytes for the padded
+    value instead of unpacking every record.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def segment_paths(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+
+    def rows(self, since: float = None, until: float = None, operation: str = None, wallet: str = None,
+             transaction_id: str = None):
+        """
+        Unpacked field tuples of the matching records, in segment order
+
+        Args:
+            since (float): Only records that ended at or after this Unix time
+            until (float): Only records that ended before this Unix time
+            operation (str): Only this operation
+            wallet (str): Only records where this wallet is the wallet or the counterparty
+            transaction_id (str): Only records of this transaction
+        """
+        since_us = int(since * 1e6) if since is not None else None
+        until_us = int(until * 1e6) if until is not None else None
+        operation_code = OPERATIONS.index(operation) if operation else None
+        wallet_value = normalize_address(wallet)
+
+        for path in self.segment_paths():
+            segment = Segment(path)
+            rows = None
+            try:
+                if not segment.count:
+                    continue
+                if since_us is not None and segment.end_us(segment.count - 1) < since_us:
+                    continue
+                if until_us is not None and segment.end_us(0) >= until_us:
+                    continue
+                start = segment.bisect(since_us) if since_us is not None else 0
+                stop = segment.bisect(until_us) if until_us is not None else segment.count
+
+                if transaction_id:
+                    indexes = segment.find("transaction_id", transaction_id, start, stop)
+                elif wallet:
+                    indexes = sorted(set(segment.find("wallet", wallet_value, start, stop))
+                                     | set(segment.find("counterparty", wallet_value, start, stop)))
+                if transaction_id or wallet:
+                    rows = (RECORD.unpack_from(segment.map, segment.offset(index)) for index in indexes)
+                else:
+                    rows = segment.records(start, stop)
+
+                for row in rows:
+                    if operation_code is not None and row[1] != operation_code:
+                        continue
+                    if wallet and transaction_id and wallet_value not in (_text(row[6]), _text(row[7])):
+                        continue
+                    yield row
+            finally:
+                # The row iterator holds a view of the map, which can't be closed while it exists
+                rows = None
+                segment.close()
+
+    def scan(self, **filters):
+        """Matching records, as dicts, in segment order (filters as for rows())"""
+        for row in self.rows(**filters):
+            yield decode(row)
+
+    def latency(self, group_by: str = None, percentiles: tuple = (50, 95, 99), **filters) -> dict:
+        """
+        Count, error count and duration percentiles of the matching records
+
+        Args:
+            group_by (str): None, "operation", "hour" or "day"
+            percentiles (tuple): Percentiles of the duration to report
+            **filters: Passed to rows()
+
+        Returns:
+            dict: Group key to {"count", "errors", "p50_s", ...}, "all" when not grouped
+        """
+        # Grouped on the raw fields, only the group keys are turned into names or times
+        bucket_us = {"hour": 3600 * 10**6, "day": 86400 * 10**6}.get(group_by)
+        error_code = STATUSES.index("error")
+        groups = defaultdict(lambda: {"durations": [], "errors": 0})
+        for row in self.rows(**filters):
+            if group_by == "operation":
+                key = row[1]
+            elif bucket_us:
+                key = row[0] // bucket_us * bucket_us
+            else:
+                key = "all"
+            group = groups[key]
+            group["durations"].append(row[3] / 1e6)
+            if row[2] == error_code:
+                group["errors"] += 1
+
+        def label(key):
+            if group_by == "operation":
+                return OPERATIONS[key] if key < len(OPERATIONS) else str(key)
+            if bucket_us:
+                moment = datetime.fromtimestamp(key / 1e6, timezone.utc)
+                return moment.strftime("%Y-%m-%dT%H:00" if group_by == "hour" else "%Y-%m-%d")
+            return key
+
+        report = {}
+        for key in sorted(groups, key=label):
+            durations = sorted(groups[key]["durations"])
+            entry = {"count": len(durations), "errors": groups[key]["errors"]}
+            for pct in percentiles:
+                rank = math.ceil(pct / 100 * len(durations))
+                entry[f"p{pct:g}_s"] = round(durations[min(max(rank, 1), len(durations)) - 1], 6)
+            report[label(key)] = entry
+        return report
+
+    def stats(self) -> dict:
+        """Segment and record counts and the size on disk"""
+        paths = self.segment_paths()
+        records = 0
+        for path in paths:
+            segment = Segment(path)
+            records += segment.count
+            segment.close()
+        return {
+            "segments": len(paths),
+            "records": records,
+            "size_kb": round(sum(os.path.getsize(path) for path in paths) / 1024, 1)
+        }
@@ -0,0 +1,165 @@
+import contextvars
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from library import wallet_utils
+
+USDC_BASE_UNITS = 10**6
+
+
+class WalletLedger:
+    """
+    Local record of USDC faucet credits and transfers with expected balances per wallet
+
+    Attached to wallet_utils as an operation listener, every successful
+    faucet credit and transfer issued through it is recorded as ledger
+    entries and applied to the expected balance of each wallet involved.
+    Wallets whose expected balance changed are marked dirty, so
+    reconcile() only fetches balances for those instead of every wallet.
+
+    Amounts are kept in USDC base units (1000000 = 1 USDC). New wallets are
+    expected to start at 0; use set_expected() for wallets that already held
+    funds before the ledger saw them.
+
+    Args:
+        path (str): sqlite file to keep the ledger in, ":memory:" for a throwaway ledger
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, wallet TEXT, chain TEXT, amount INTEGER, "
+            "kind TEXT, reference TEXT, created REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS balances ("
+            "wallet TEXT, chain TEXT, expected INTEGER, observed INTEGER, dirty INTEGER, checked REAL, "
+            "PRIMARY KEY (wallet, chain))"
+        )
+        self.db.commit()
+
+    def attach(self):
+        """Start recording operations issued through wallet_utils"""
+        wallet_utils.add_operation_listener(self.record_event)
+        return self
+
+    def detach(self):
+        wallet_utils.remove_operation_listener(self.record_event)
+
+    def close(self):
+        """Stop recording and close the sqlite file"""
+        self.detach()
+        with self._lock:
+            self.db.close()
+
+    def record_event(self, event: dict):
+        """Apply a wallet_utils operation event to the ledger"""
+        if event["type"] == "faucet_credit":
+            self.record(event["wallet_address"], event["chain"], event["amount"], "faucet_credit", event.get("reference"))
+        elif event["type"] == "transfer":
+            self.record(event["from_wallet_address"], event["chain"], -event["amount"], "transfer_debit", event.get("reference"))
+            self.record(event["to_wallet_address"], event["chain"], event["amount"], "transfer_credit", event.get("reference"))
+
+    def record(self, wallet_address: str, chain: str, amount: int, kind: str, reference: str = None):
+        """Add a signed entry for a wallet and update its expected balance"""
+        wallet = wallet_address.lower()
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO entries (wallet, chain, amount, kind, reference, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (wallet, chain, amount, kind, reference, time.time())
+            )
+            self.db.execute(
+                "INSERT INTO balances (wallet, chain, expected, observed, dirty, checked) VALUES (?, ?, ?, NULL, 1, NULL) "
+                "ON CONFLICT (wallet, chain) DO UPDATE SET expected = expected + excluded.expected, dirty = 1",
+                (wallet, chain, amount)
+            )
+            self.db.commit()
+
+    def set_expected(self, wallet_address: str, chain: str, amount: int):
+        """Set the expected balance of a wallet outright, e.g. to adopt a balance it had before"""
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO balances (wallet, chain, expected, observed, dirty, checked) VALUES (?, ?, ?, NULL, 1, NULL) "
+                "ON CONFLICT (wallet, chain) DO UPDATE SET expected = excluded.expected, dirty = 1",
+                (wallet_address.lower(), chain, amount)
+            )
+            self.db.commit()
+
+    def expected_balance(self, wallet_address: str, chain: str = "base-sepolia") -> int:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT expected FROM balances WHERE wallet = ? AND chain = ?", (wallet_address.lower(), chain)).fetchone()
+        return row[0] if row else 0
+
+    def dirty_wallets(self, chain: str = None) -> list:
+        """(wallet, chain) pairs whose expected balance changed since they were last reconciled"""
+        query = "SELECT wallet, chain FROM balances WHERE dirty = 1"
+        params = ()
+        if chain:
+            query += " AND chain = ?"
+            params = (chain,)
+        with self._lock:
+            rows = self.db.execute(query, params).fetchall()
+        return [tuple(row) for row in rows]
+
+    def reconcile(self, api_key: str, chain: str = None, wallets: list = None, max_workers: int = 8) -> dict:
+        """
+        Fetch balances for the dirty wallets only and compare them with the expected balances
+
+        The API has no bulk balance endpoint, so the dirty wallets are fetched
+        concurrently. Pass wallets to limit the pass to some wallets.
+
+        Matching wallets are marked clean. Mismatching wallets are reported
+        and stay dirty, so they are checked again on the next pass, e.g. once
+        a pending transfer landed.
+
+        Returns:
+            dict: checked/skipped counts, observed balances and any mismatches or fetch errors
+        """
+        dirty = self.dirty_wallets(chain)
+        if wallets is not None:
+            wanted = {wallet.lower() for wallet in wallets}
+            dirty = [item for item in dirty if item[0] in wanted]
+        with self._lock:
+            total = self.db.execute("SELECT COUNT(*) FROM balances").fetchone()[0]
+
+        def fetch(item):
+            wallet, wallet_chain = item
+            return item, wallet_utils.get_wallet_balance(api_key, wallet_chain, wallet)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Fetched with the caller's request priority
+            futures = [executor.submit(contextvars.copy_context().run, fetch, item) for item in dirty]
+            results = [future.result() for future in futures]
+
+        report = {"checked": len(dirty), "skipped_clean": total - len(dirty), "balances": {}, "mismatches": [], "errors": []}
+        with self._lock:
+            for (wallet, wallet_chain), result in results:
+                if result.get("status") != "success":
+                    report["errors"].append({"wallet_address": wallet, "chain": wallet_chain, "error": result.get("error")})
+                    continue
+
+                observed = round(result["balance"] * USDC_BASE_UNITS)
+                expected = self.db.execute(
+                    "SELECT expected FROM balances WHERE wallet = ? AND chain = ?", (wallet, wallet_chain)).fetchone()[0]
+                matches = observed == expected
+                self.db.execute(
+                    "UPDATE balances SET observed = ?, dirty = ?, checked = ? WHERE wallet = ? AND chain = ?",
+                    (observed, 0 if matches else 1, time.time(), wallet, wallet_chain)
+                )
+                report["balances"][wallet] = result["balance"]
+                if not matches:
+                    report["mismatches"].append({
+                        "wallet_address": wallet,
+                        "chain": wallet_chain,
+                        "expected": expected / USDC_BASE_UNITS,
+                        "observed": result["balance"],
+                        "difference": (observed - expected) / USDC_BASE_UNITS
+                    })
+            self.db.commit()
+        return report
@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from library import wallet_utils
+from library.request_scheduler import request_priority
+from library.transaction_waiter import TERMINAL_STATUSES
+
+
+class WalletPrefetcher:
+    """
+    Speculative refresh of wallet balances and pending transaction statuses
+
+    Agents call prefetch() with the wallets a turn is likely to touch just
+    before waiting on the LLM. The balances of those wallets, and the status
+    of transactions still pending for them, are fetched in the background
+    and kept for ttl seconds, so a tool call that follows can answer from
+    warm data with balance() and transaction_status().
+
+    Prefetching is optional work and is capped so it never competes with
+    real actions for the API quota:
+        - requests go out as bulk requests, below everything a user waits on
+        - nothing is started while the request scheduler has requests waiting
+          or no spare capacity for a bulk request
+        - at most max_per_minute prefetch requests are sent
+        - values fetched less than ttl / 2 seconds ago aren't fetched again
+
+    Balances of wallets changed by a faucet credit or transfer through
+    wallet_utils are dropped, and a prefetch that was in flight when they
+    changed is discarded.
+
+    Args:
+        api_key (str): Crossmint API key
+        ttl (float): Seconds a prefetched value is served
+        max_wallets (int): Wallets refreshed per prefetch() call
+        max_per_minute (int): Prefetch requests per minute
+        max_entries (int): Cached values kept, least recently stored are dropped first
+        workers (int): Prefetch requests in flight at once
+    """
+
+    def __init__(self, api_key: str, ttl: float = 15.0, max_wallets: int = 3, max_per_minute: int = 30,
+                 max_entries: int = 256, workers: int = 2):
+        self.api_key = api_key
+        self.ttl = ttl
+        self.max_wallets = max_wallets
+        self.max_per_minute = max_per_minute
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._in_flight = set()
+        self._generations = {}
+        self._pending = OrderedDict()
+        self._sent = deque()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._stats = {"prefetched": 0, "hits": 0, "misses": 0, "skipped_busy": 0, "skipped_cap": 0,
+                       "discarded": 0, "errors": 0}
+        wallet_utils.add_operation_listener(self._on_operation)
+
+    def prefetch(self, wallets: list) -> int:
+        """
+        Refresh (address, chain) wallets and their pending transactions in the background
+
+        Returns:
+            int: Requests started
+        """
+        jobs = []
+        for address, chain in wallets[:self.max_wallets]:
+            jobs.append((("balance", address.lower(), chain), address))
+            with self._lock:
+                pending = [tx_id for tx_id, owner in self._pending.items() if owner.lower() == address.lower()]
+            jobs.extend((("transaction", tx_id), address) for tx_id in pending)
+
+        scheduler = wallet_utils.get_scheduler()
+        started = 0
+        for key, address in jobs:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._cache.get(key)
+                if key in self._in_flight or (entry and now - entry["fetched_at"] < self.ttl / 2):
+                    continue
+                while self._sent and now - self._sent[0] > 60:
+                    self._sent.popleft()
+                if len(self._sent) >= self.max_per_minute:
+                    self._stats["skipped_cap"] += 1
+                    continue
+                if not scheduler.has_spare_capacity("bulk"):
+                    self._stats["skipped_busy"] += 1
+                    continue
+                self._sent.append(now)
+                self._in_flight.add(key)
+                generation = self._generations.get(address.lower(), 0)
+            self._executor.submit(self._fetch, key, address, generation)
+            started += 1
+        return started
+
+    def _fetch(self, key: tuple, address: str, generation: int):
+        try:
+            with request_priority("bulk"):
+                if key[0] == "balance":
+                    result = wallet_utils.get_wallet_balance(self.api_key, key[2], address)
+                else:
+                    result = wallet_utils.get_transaction(self.api_key, address, key[1])
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+
+        with self._lock:
+            self._in_flight.discard(key)
+            if result.get("status") != "success":
+                self._stats["errors"] += 1
+                return
+            # The wallet changed while the request was in flight, the value may predate the change
+            if key[0] == "balance" and self._generations.get(address.lower(), 0) != generation:
+                self._stats["discarded"] += 1
+                return
+            if key[0] == "transaction" and result["transaction_data"].get("status") in TERMINAL_STATUSES:
+                self._pending.pop(key[1], None)
+            self._store(key, result)
+            self._stats["prefetched"] += 1
+
+    def _store(self, key: tuple, result: dict):
+        self._cache[key] = {"result": result, "fetched_at": time.monotonic()}
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, key: tuple):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.monotonic() - entry["fetched_at"] < self.ttl:
+                self._stats["hits"] += 1
+                return dict(entry["result"], cached=True,
+                            age_s=round(time.monotonic() - entry["fetched_at"], 3))
+            self._stats["misses"] += 1
+            return None
+
+    def balance(self, address: str, chain: str) -> dict:
+        """get_wallet_balance result, from the prefetched value if it is fresh"""
+        cached = self._lookup(("balance", address.lower(), chain))
+        if cached:
+            return cached
+        with self._lock:
+            generation = self._generations.get(address.lower(), 0)
+        result = wallet_utils.get_wallet_balance(self.api_key, chain, address)
+        with self._lock:
+            if result.get("status") == "success" and self._generations.get(address.lower(), 0) == generation:
+                self._store(("balance", address.lower(), chain), result)
+        return result
+
+    def transaction_status(self, transaction_id: str):
+        """get_transaction result of a tracked transaction if a fresh one was prefetched, otherwise None"""
+        return self._lookup(("transaction", transaction_id))
+
+    def track_transaction(self, wallet_address: str, transaction_id: str):
+        """Keep refreshing the status of a transaction that wasn't final when its wait ended"""
+        with self._lock:
+            self._pending[transaction_id] = wallet_address
+            while len(self._pending) > self.max_entries:
+                self._pending.popitem(last=False)
+
+    def pending_transactions(self, wallet_address: str) -> list:
+        """Ids of the tracked transactions of a wallet that were not final yet"""
+        with self._lock:
+            return [tx_id for tx_id, owner in self._pending.items() if owner.lower() == wallet_address.lower()]
+
+    def invalidate(self, wallet_address: str):
+        """Drop the cached balances of a wallet and discard prefetches of it still in flight"""
+        address = wallet_address.lower()
+        with self._lock:
+            self._generations[address] = self._generations.get(address, 0) + 1
+            for key in [key for key in self._cache if key[0] == "balance" and key[1] == address]:
+                del self._cache[key]
+
+    def _on_operation(self, event: dict):
+        for field in ("wallet_address", "from_wallet_address", "to_wallet_address"):
+            if event.get(field):
+                self.invalidate(event[field])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                hit_rate=round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                cached=len(self._cache),
+                pending_transactions=len(self._pending)
+            )
+
+
+_prefetchers = {}
+_prefetchers_lock = threading.Lock()
+
+
+def get_prefetcher(api_key: str):
+    """
+    Process-wide prefetcher per API key, None when AGENT_PREFETCH=0
+
+    Sessions of the same process share its cache and its request cap. Tuned
+    with AGENT_PREFETCH_TTL (seconds, default 15), AGENT_PREFETCH_MAX_WALLETS
+    (default 3) and AGENT_PREFETCH_MAX_PER_MINUTE (default 30).
+    """
+    if os.getenv("AGENT_PREFETCH", "1") == "0":
+        return None
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.get(api_key)
+        if prefetcher is None:
+            prefetcher = WalletPrefetcher(
+                api_key,
+                ttl=float(os.getenv("AGENT_PREFETCH_TTL", "15")),
+                max_wallets=int(os.getenv("AGENT_PREFETCH_MAX_WALLETS", "3")),
+                max_per_minute=int(os.getenv("AGENT_PREFETCH_MAX_PER_MINUTE", "30"))
+            )
+            _prefetchers[api_key] = prefetcher
+        return prefetcher
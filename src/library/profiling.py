@@ -0,0 +1,207 @@
+import atexit
+import contextlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+_NULL_SPAN = contextlib.nullcontext()
+_ID_PATTERN = re.compile(r"0x[0-9a-fA-F]{8,}|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+
+class Profiler:
+    """
+    Records a tree of timed spans across threads
+
+    Each thread keeps its own stack of open spans, so a new span becomes a
+    child of the innermost open span on the same thread. Work handed to
+    another thread can keep its place in the tree with attach(parent_id).
+    """
+
+    def __init__(self, trace_path: str = None):
+        self.trace_path = trace_path
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = time.perf_counter()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_span_id(self):
+        stack = self._stack()
+        return stack[-1]["id"] if stack else getattr(self._local, "parent", None)
+
+    @contextlib.contextmanager
+    def attach(self, parent_id):
+        """Make spans opened on this thread children of parent_id"""
+        previous = getattr(self._local, "parent", None)
+        self._local.parent = parent_id
+        try:
+            yield
+        finally:
+            self._local.parent = previous
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "other", **attrs):
+        record = {
+            "id": next(self._ids),
+            "parent": self.current_span_id(),
+            "name": name,
+            "category": category,
+            "thread": threading.get_ident(),
+            "start": time.perf_counter() - self._start,
+            "attrs": attrs
+        }
+        stack = self._stack()
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            stack.pop()
+            record["end"] = time.perf_counter() - self._start
+            with self._lock:
+                self.spans.append(record)
+
+    def _self_times(self):
+        """Span duration minus the time covered by its children"""
+        spans = list(self.spans)
+        child_time = defaultdict(float)
+        for span in spans:
+            if span["parent"] is not None:
+                child_time[span["parent"]] += span["end"] - span["start"]
+        # Children on other threads can overlap the parent, never go below zero
+        return {span["id"]: max(0.0, span["end"] - span["start"] - child_time[span["id"]]) for span in spans}
+
+    def breakdown(self) -> dict:
+        """Self time per category and total time per span name, in seconds"""
+        self_times = self._self_times()
+        by_category = defaultdict(float)
+        by_name = defaultdict(lambda: {"count": 0, "total_s": 0.0})
+        for span in self.spans:
+            by_category[span["category"]] += self_times[span["id"]]
+            entry = by_name[span["name"]]
+            entry["count"] += 1
+            entry["total_s"] += span["end"] - span["start"]
+        roots = [span for span in self.spans if span["parent"] is None]
+        return {
+            "wall_s": max((span["end"] for span in roots), default=0) - min((span["start"] for span in roots), default=0),
+            "categories": dict(by_category),
+            "spans": dict(by_name)
+        }
+
+    def print_breakdown(self, top: int = 10):
+        report = self.breakdown()
+        total = sum(report["categories"].values()) or 1
+        print(f"\nProfile ({len(self.spans)} spans, {report['wall_s']:.2f}s wall)")
+        print(f"{'phase':<10} {'self s':>8} {'share':>7}")
+        for category, seconds in sorted(report["categories"].items(), key=lambda item: -item[1]):
+            print(f"{category:<10} {seconds:>8.3f} {seconds / total:>6.1%}")
+        print(f"\n{'span':<50} {'count':>6} {'total s':>9}")
+        for name, entry in sorted(report["spans"].items(), key=lambda item: -item[1]["total_s"])[:top]:
+            print(f"{name[:50]:<50} {entry['count']:>6} {entry['total_s']:>9.3f}")
+
+    def write_trace(self, path: str):
+        """
+        Write the spans as a Chrome trace (JSON, opens in Perfetto or speedscope) or,
+        for paths ending in .folded, as folded stacks for flamegraph.pl
+        """
+        spans = sorted(self.spans, key=lambda span: span["start"])
+        if path.endswith(".folded"):
+            by_id = {span["id"]: span for span in spans}
+            self_times = self._self_times()
+            stacks = defaultdict(float)
+            for span in spans:
+                names = []
+                node = span
+                while node is not None:
+                    names.append(node["name"].replace(";", ","))
+                    node = by_id.get(node["parent"])
+                stacks[";".join(reversed(names))] += self_times[span["id"]]
+            with open(path, "w") as f:
+                for stack, seconds in stacks.items():
+                    f.write(f"{stack} {int(seconds * 1e6)}\n")
+            return
+
+        events = [{
+            "name": span["name"],
+            "cat": span["category"],
+            "ph": "X",
+            "ts": round(span["start"] * 1e6),
+            "dur": round((span["end"] - span["start"]) * 1e6),
+            "pid": os.getpid(),
+            "tid": span["thread"],
+            "args": {key: str(value) for key, value in span["attrs"].items()}
+        } for span in spans]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def finish(self):
+        """Write the trace file and print the breakdown"""
+        if not self.spans:
+            return
+        if self.trace_path:
+            self.write_trace(self.trace_path)
+            print(f"\nProfile trace written to {self.trace_path}")
+        self.print_breakdown()
+
+
+_profiler = None
+
+
+def enable(trace_path: str = "profile_trace.json") -> Profiler:
+    """Start profiling; the trace is written and the breakdown printed at exit"""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(trace_path)
+        atexit.register(_profiler.finish)
+    return _profiler
+
+
+def enable_from_env():
+    """Enable profiling when AGENT_PROFILE is set, to "1" or to the trace file path"""
+    value = os.getenv("AGENT_PROFILE")
+    if value and value != "0":
+        return enable("profile_trace.json" if value == "1" else value)
+    return None
+
+
+def get_profiler():
+    return _profiler
+
+
+def span(name: str, category: str = "other", **attrs):
+    """Time a block as a span, a no-op unless profiling is enabled"""
+    if _profiler is None:
+        return _NULL_SPAN
+    return _profiler.span(name, category, **attrs)
+
+
+def current_span_id():
+    return _profiler.current_span_id() if _profiler is not None else None
+
+
+def attach(parent_id):
+    """Continue the span tree of another thread, a no-op unless profiling is enabled"""
+    if _profiler is None:
+        return _NULL_SPAN
+    return _profiler.attach(parent_id)
+
+
+def sleep(seconds: float, reason: str = "sleep"):
+    """time.sleep recorded as a sleep span"""
+    with span(reason, "sleep", seconds=seconds):
+        time.sleep(seconds)
+
+
+def http_span_name(method: str, url: str) -> str:
+    """Span name for a request with addresses and ids replaced, so calls group by endpoint"""
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else path
+    return f"{method} {_ID_PATTERN.sub('{id}', path.split('?')[0])}"
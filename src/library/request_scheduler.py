@@ -0,0 +1,224 @@
+import contextlib
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from library import profiling
+
+# Request classes, most urgent first
+PRIORITIES = ("interactive", "normal", "bulk")
+
+_priority = contextvars.ContextVar("crossmint_request_priority", default="normal")
+
+
+@contextlib.contextmanager
+def request_priority(priority: str):
+    """
+    Send the Crossmint requests made in this block (and in threads started with a copy of its context) as priority
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid priority. Must be one of: {PRIORITIES}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+class RequestScheduler:
+    """
+    Admits Crossmint requests by priority class within a shared rate and concurrency budget
+
+    Every request takes a slot (at most max_concurrency in flight) and, with
+    a rate set, a token from a bucket refilled at rate per second. A share
+    of both, interactive_reserve, is only handed to interactive requests,
+    so a backlog of normal or bulk requests can't use up the capacity a
+    user's request needs. When requests have to wait, they are admitted in
+    priority order (interactive, then normal, then bulk) and first come,
+    first served within a class. The time each request waited is reported
+    per class by stats().
+
+    throttle() pauses all requests, e.g. after the API answered 429 with a
+    Retry-After, and empties the bucket so traffic resumes at the configured
+    rate rather than in a burst.
+
+    Args:
+        rate (float): Requests per second, 0 for no rate limit
+        burst (int): Bucket size, the requests that can go out at once after an idle period (default: rate)
+        max_concurrency (int): Requests in flight at once
+        interactive_reserve (float): Share of the slots and of the bucket only interactive requests can use
+        max_samples (int): Recent queueing delays kept per class for the percentiles
+    """
+
+    def __init__(self, rate: float = 0.0, burst: int = None, max_concurrency: int = 32,
+                 interactive_reserve: float = 0.25, max_samples: int = 1000):
+        self.rate = rate
+        self.burst = (burst or max(1, math.ceil(rate))) if rate else 0
+        self.max_concurrency = max_concurrency
+        self.interactive_reserve = interactive_reserve
+        # Leave other classes at least one slot and one token
+        self.reserved_slots = min(max_concurrency - 1, math.ceil(max_concurrency * interactive_reserve))
+        self.reserved_tokens = min(self.burst - 1, self.burst * interactive_reserve) if rate else 0
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self._delays = {priority: deque(maxlen=max_samples) for priority in PRIORITIES}
+        self._counts = {priority: {"requests": 0, "queued": 0, "delay_total": 0.0, "delay_max": 0.0}
+                        for priority in PRIORITIES}
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _blocked_for(self, priority: str, now: float):
+        """0 if a request of priority can start now, else roughly how long until it might (None: until a release)"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        interactive = priority == "interactive"
+        if self._in_flight >= self.max_concurrency - (0 if interactive else self.reserved_slots):
+            return None
+        if self.rate:
+            self._refill(now)
+            needed = 1 + (0 if interactive else self.reserved_tokens)
+            if self._tokens < needed:
+                return (needed - self._tokens) / self.rate
+        return 0
+
+    def _first_in_line(self, priority: str, ticket) -> bool:
+        for other in PRIORITIES:
+            if other == priority:
+                return self._waiting[other][0] is ticket
+            if self._waiting[other]:
+                return False
+
+    def acquire(self, priority: str = None):
+        """Block until a request of priority (default: the current one) may be sent and take its slot"""
+        priority = priority or current_priority()
+        arrived = time.monotonic()
+        ticket = object()
+        with self._cond:
+            counts = self._counts[priority]
+            counts["requests"] += 1
+            queue = self._waiting[priority]
+            queue.append(ticket)
+            if not (self._first_in_line(priority, ticket) and self._blocked_for(priority, arrived) == 0):
+                counts["queued"] += 1
+                with profiling.span("wait for request slot", "sleep", priority=priority):
+                    while True:
+                        now = time.monotonic()
+                        blocked_for = self._blocked_for(priority, now)
+                        if blocked_for == 0 and self._first_in_line(priority, ticket):
+                            break
+                        self._cond.wait(min(blocked_for, 1.0) if blocked_for else 1.0)
+            queue.popleft()
+            self._in_flight += 1
+            if self.rate:
+                self._tokens -= 1
+            delay = time.monotonic() - arrived
+            counts["delay_total"] += delay
+            counts["delay_max"] = max(counts["delay_max"], delay)
+            self._delays[priority].append(delay)
+            # The next request in line may be able to start too
+            self._cond.notify_all()
+        return priority
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, priority: str = None):
+        """Hold a slot for the duration of one request"""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def has_spare_capacity(self, priority: str = "bulk") -> bool:
+        """True if nothing is waiting and a request of priority could start right away, for optional work"""
+        with self._cond:
+            if any(self._waiting.values()):
+                return False
+            return self._blocked_for(priority, time.monotonic()) == 0
+
+    def throttle(self, seconds: float):
+        """Hold back every request for seconds, e.g. the Retry-After of a 429"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self.throttled += 1
+
+    def stats(self) -> dict:
+        """In flight requests, and requests, queued requests and queueing delays per class"""
+        with self._cond:
+            classes = {}
+            for priority in PRIORITIES:
+                counts = self._counts[priority]
+                admitted = counts["requests"] - len(self._waiting[priority])
+                delays = sorted(self._delays[priority])
+                classes[priority] = {
+                    "requests": counts["requests"],
+                    "queued": counts["queued"],
+                    "waiting": len(self._waiting[priority]),
+                    "mean_delay_s": round(counts["delay_total"] / admitted, 4) if admitted else 0.0,
+                    "p95_delay_s": round(delays[min(len(delays) - 1, math.ceil(0.95 * len(delays)) - 1)], 4)
+                    if delays else 0.0,
+                    "max_delay_s": round(counts["delay_max"], 4)
+                }
+            return {
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "reserved_slots": self.reserved_slots,
+                "rate": self.rate,
+                "throttled": self.throttled,
+                "classes": classes
+            }
+
+    def prometheus_metrics(self) -> str:
+        """Request counts and queueing delay per class in the Prometheus text exposition format"""
+        with self._cond:
+            lines = [
+                "# TYPE crossmint_requests_in_flight gauge",
+                f"crossmint_requests_in_flight {self._in_flight}",
+                "# TYPE crossmint_requests_throttled_total counter",
+                f"crossmint_requests_throttled_total {self.throttled}",
+            ]
+            for name, kind, value in [
+                ("crossmint_requests_total", "counter", lambda p: self._counts[p]["requests"]),
+                ("crossmint_requests_queued_total", "counter", lambda p: self._counts[p]["queued"]),
+                ("crossmint_requests_waiting", "gauge", lambda p: len(self._waiting[p])),
+                ("crossmint_request_queue_delay_seconds_sum", "counter", lambda p: f"{self._counts[p]['delay_total']:.3f}"),
+                ("crossmint_request_queue_delay_seconds_max", "gauge", lambda p: f"{self._counts[p]['delay_max']:.3f}"),
+            ]:
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f'{name}{{priority="{priority}"}} {value(priority)}' for priority in PRIORITIES)
+        return "\n".join(lines) + "\n"
+
+
+def scheduler_from_env() -> RequestScheduler:
+    """
+    Scheduler configured by CROSSMINT_RATE_LIMIT (requests per second, default 0: no limit),
+    CROSSMINT_RATE_BURST, CROSSMINT_MAX_IN_FLIGHT (default 32) and CROSSMINT_INTERACTIVE_RESERVE (default 0.25)
+    """
+    burst = os.getenv("CROSSMINT_RATE_BURST")
+    return RequestScheduler(
+        rate=float(os.getenv("CROSSMINT_RATE_LIMIT", "0")),
+        burst=int(burst) if burst else None,
+        max_concurrency=int(os.getenv("CROSSMINT_MAX_IN_FLIGHT", "32")),
+        interactive_reserve=float(os.getenv("CROSSMINT_INTERACTIVE_RESERVE", "0.25"))
+    )
@@ -0,0 +1,221 @@
+import copy
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+# Tools that only read state and can be safely repeated from a cached turn
+READ_ONLY_TOOLS = {"get_wallet_balance"}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(value):
+    # Collapse runs of whitespace in every string so cosmetic differences hash the same
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _strip_ids(message: dict) -> dict:
+    # Tool call ids are random per response, so they must not be part of the key
+    message = {k: v for k, v in message.items() if k != "tool_call_id"}
+    if message.get("tool_calls"):
+        message["tool_calls"] = [{k: v for k, v in call.items() if k != "id"} for call in message["tool_calls"]]
+    return message
+
+
+def make_cache_key(model: str, messages: list, tools: list = None) -> str:
+    """
+    Hash a chat completion request into a cache key
+
+    The whole conversation is hashed, since a reply like "yes" or "do it"
+    depends on what came before. Tool call ids are left out: they are
+    random per response and would otherwise make every later turn miss.
+
+    Args:
+        model (str): Model name
+        messages (list): Messages including the system prompt
+        tools (list): Tool schema sent with the request
+
+    Returns:
+        str: Hex sha256 of the normalized request
+    """
+    payload = json.dumps(
+        {"model": model, "messages": _normalize([_strip_ids(m) for m in messages]), "tools": tools or []},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_cacheable(message: dict) -> bool:
+    """A turn is cacheable if it has no tool calls, or only calls read-only tools"""
+    tool_calls = message.get("tool_calls") or []
+    return all(call["function"]["name"] in READ_ONLY_TOOLS for call in tool_calls)
+
+
+def _with_new_tool_call_ids(message: dict) -> dict:
+    # A replayed message must not reuse the ids of tool calls already in the history
+    message = copy.deepcopy(message)
+    for call in message.get("tool_calls") or []:
+        call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+    return message
+
+
+class _MemoryBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class _DiskBackend:
+    def __init__(self, max_entries, path):
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT, latency REAL, created REAL, accessed REAL)"
+        )
+        self.db.commit()
+
+    def get(self, key):
+        row = self.db.execute(
+            "SELECT value, latency, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return {"value": json.loads(row[0]), "latency": row[1], "created": row[2]}
+
+    def put(self, key, entry):
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (key, json.dumps(entry["value"]), entry["latency"], entry["created"], time.time())
+        )
+        # Evict the least recently used entries beyond the size bound
+        self.db.execute(
+            "DELETE FROM entries WHERE key NOT IN "
+            "(SELECT key FROM entries ORDER BY accessed DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        self.db.commit()
+
+    def delete(self, key):
+        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    TTL and size bounded cache of chat completion responses
+
+    Only side-effect free turns are stored (see is_cacheable), so a hit can be
+    served without calling the model. Entries live in memory or, with
+    backend="disk", in a local SQLite file shared across runs.
+
+    Args:
+        backend (str): "memory" or "disk"
+        ttl (float): Seconds an entry stays valid
+        max_entries (int): Least recently used entries are evicted beyond this
+        path (str): SQLite file used by the disk backend
+    """
+
+    def __init__(self, backend: str = "memory", ttl: float = 600, max_entries: int = 256, path: str = ".agent_response_cache.sqlite3"):
+        valid_backends = ["memory", "disk"]
+        if backend not in valid_backends:
+            raise ValueError(f"Invalid cache backend. Must be one of: {valid_backends}")
+
+        if backend == "memory":
+            self._store = _MemoryBackend(max_entries)
+        else:
+            self._store = _DiskBackend(max_entries, path)
+
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return a copy of the cached message dict for key with fresh tool call ids, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is not None and time.time() - entry["created"] > self.ttl:
+                self._store.delete(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.latency_saved += entry["latency"]
+            return _with_new_tool_call_ids(entry["value"])
+
+    def put(self, key: str, message: dict, latency: float) -> bool:
+        """
+        Store a response message if it is safe to repeat
+
+        Args:
+            key (str): Key from make_cache_key
+            message (dict): The assistant message as a dict
+            latency (float): How long the model took, reported as saved on hits
+
+        Returns:
+            bool: Whether the message was cached
+        """
+        with self._lock:
+            if not is_cacheable(message):
+                self.skipped += 1
+                return False
+            self._store.put(key, {"value": message, "latency": latency, "created": time.time()})
+            self.stores += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "entries": len(self._store),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stored": self.stores,
+                "skipped_side_effects": self.skipped,
+                "latency_saved_s": round(self.latency_saved, 3)
+            }
@@ -0,0 +1,134 @@
+import json
+
+
+# Per-tool projection of the fields the model needs: output key -> path in the tool result
+TOOL_OUTPUT_FIELDS = {
+    "create_new_wallet": {
+        "status": ("status",),
+        "error": ("error",),
+        "address": ("wallet_data", "address"),
+        "type": ("wallet_data", "type"),
+    },
+    "get_wallet_balance": {
+        "status": ("status",),
+        "message": ("message",),
+        "balance": ("balance",),
+        "explorer_url": ("explorer_url",),
+    },
+    "create_transaction": {
+        "status": ("status",),
+        "message": ("message",),
+        "transaction_id": ("data", "transaction_id"),
+        "transaction_status": ("data", "final_status", "transaction_data", "status"),
+        "tx_hash": ("data", "final_status", "transaction_data", "onChain", "txId"),
+        "explorer_url": ("data", "final_status", "transaction_data", "onChain", "explorerLink"),
+    },
+    "get_usdc_from_faucet": {
+        "status": ("status",),
+        "error": ("error",),
+        "tx_hash": ("transaction_data", "txId"),
+        "explorer_url": ("transaction_data", "explorerLink"),
+        "balance": ("balance",),
+    },
+    "transfer_usdc": {
+        "status": ("status",),
+        "message": ("message",),
+        "error": ("error",),
+        "transaction_id": ("data", "transaction_data", "id"),
+        "transaction_status": ("data", "transaction_data", "status"),
+        "amount": ("data", "amount"),
+        "explorer_url": ("data", "transaction_data", "onChain", "explorerLink"),
+        "from_wallet_explorer": ("data", "from_wallet_explorer"),
+        "to_wallet_explorer": ("data", "to_wallet_explorer"),
+    },
+}
+
+DEFAULT_MAX_CHARS = 800
+
+
+def _lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def project_tool_output(tool_name: str, result) -> dict:
+    """
+    Keep only the fields of a tool result that the model needs
+
+    Args:
+        tool_name (str): Name of the tool that produced the result
+        result: The full tool result (usually a dict)
+
+    Returns:
+        dict: The projected result, without empty fields
+    """
+    if not isinstance(result, dict):
+        return {"result": result}
+
+    fields = TOOL_OUTPUT_FIELDS.get(tool_name)
+    if fields is None:
+        # Unknown tools keep their top level scalars only
+        return {k: v for k, v in result.items() if isinstance(v, (str, int, float, bool)) and k != "timestamp"}
+
+    projected = {}
+    for name, path in fields.items():
+        value = _lookup(result, path)
+        if value is not None:
+            projected[name] = value
+    return projected
+
+
+# (longest string, list items) kept at each step of shrinking an oversized output
+_SHRINK_STEPS = [(200, 10), (100, 5), (40, 2), (16, 1)]
+
+
+def _shrink(value, max_string: int, max_items: int):
+    if isinstance(value, str) and len(value) > max_string:
+        return value[:max_string] + "..."
+    if isinstance(value, dict):
+        return {k: _shrink(v, max_string, max_items) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shrink(v, max_string, max_items) for v in value[:max_items]]
+    return value
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def compact_tool_output(tool_name: str, result, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """
+    Serialize a tool result for the model: projected fields, compact JSON, capped size
+
+    An oversized output is cut down structurally, shortening long strings and
+    lists and then dropping the last fields, and marked with "truncated": true,
+    so the model always gets valid JSON.
+
+    Args:
+        tool_name (str): Name of the tool that produced the result
+        result: The full tool result
+        max_chars (int): Maximum length of the returned string
+
+    Returns:
+        str: Compact JSON string to send back to the model
+    """
+    projected = project_tool_output(tool_name, result)
+    output = _dumps(projected)
+    if len(output) <= max_chars:
+        return output
+
+    for max_string, max_items in _SHRINK_STEPS:
+        shrunk = dict(_shrink(projected, max_string, max_items), truncated=True)
+        output = _dumps(shrunk)
+        if len(output) <= max_chars:
+            return output
+
+    # Still too long, drop fields from the end but keep the status
+    droppable = [k for k in shrunk if k not in ("status", "truncated")]
+    while len(output) > max_chars and droppable:
+        del shrunk[droppable.pop()]
+        output = _dumps(shrunk)
+    return output
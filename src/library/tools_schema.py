@@ -42,7 +42,12 @@ def tools_schema():
                 "description": "Create and submit a new transaction for a selected wallet",
                 "parameters": {
                     "type": "object",
-                    "properties": {},  # No parameters needed as wallet selection is handled internally
+                    "properties": {
+                        "wallet_address": {
+                            "type": "string",
+                            "description": "The address of the wallet to use, if the user named one. Otherwise the user is asked to select a wallet"
+                        }
+                    },
                     "required": []
                 }
             }
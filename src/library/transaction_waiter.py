@@ -0,0 +1,394 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from library import profiling
+from library.wallet_utils import get_transaction
+
+# Transaction statuses after which a transaction no longer changes
+TERMINAL_STATUSES = {"success", "failed"}
+
+
+class WebhookVerificationError(Exception):
+    pass
+
+
+def sign_webhook(secret: str, message_id: str, timestamp: int, body: bytes) -> str:
+    """
+    svix style signature header value for a webhook body
+
+    The signed content is "<message id>.<timestamp>.<body>", signed with
+    HMAC-SHA256 using the base64 decoded part of the "whsec_..." secret.
+    """
+    key = base64.b64decode(secret.removeprefix("whsec_"))
+    content = f"{message_id}.{timestamp}.".encode() + body
+    return "v1," + base64.b64encode(hmac.new(key, content, hashlib.sha256).digest()).decode()
+
+
+def verify_webhook(secret: str, headers, body: bytes, tolerance: float = 300) -> dict:
+    """
+    Check the svix-id, svix-timestamp and svix-signature headers of a webhook request
+
+    Returns:
+        dict: The parsed JSON payload
+
+    Raises:
+        WebhookVerificationError: If a header is missing, the timestamp is outside the tolerance or no signature matches
+    """
+    message_id = headers.get("svix-id")
+    timestamp = headers.get("svix-timestamp")
+    signatures = headers.get("svix-signature")
+    if not (message_id and timestamp and signatures):
+        raise WebhookVerificationError("Missing svix headers")
+
+    try:
+        timestamp = int(timestamp)
+    except ValueError:
+        raise WebhookVerificationError("Invalid svix-timestamp")
+    # Old or future timestamps point at a replayed or forged request
+    if abs(time.time() - timestamp) > tolerance:
+        raise WebhookVerificationError("Timestamp outside the tolerance")
+
+    expected = sign_webhook(secret, message_id, timestamp, body)
+    # The header can carry several space separated signatures, e.g. during secret rotation
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures.split()):
+        raise WebhookVerificationError("No matching signature")
+
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError:
+        raise WebhookVerificationError("Body is not JSON")
+
+
+class PollingWaiter:
+    """
+    Waits for a transaction to reach a final status by polling get_transaction
+
+    Args:
+        api_key (str): Crossmint API key
+        poll_interval (float): Seconds between status checks
+    """
+
+    def __init__(self, api_key: str, poll_interval: float = 2.0):
+        self.api_key = api_key
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.resolved_by_poll = 0
+        self.timeouts = 0
+
+    def check(self, wallet_address: str, transaction_id: str):
+        """One status check, returns the get_transaction result if the transaction is final"""
+        with self._lock:
+            self.polls += 1
+        response = get_transaction(self.api_key, wallet_address, transaction_id)
+        if response.get("status") == "success" and response["transaction_data"].get("status") in TERMINAL_STATUSES:
+            with self._lock:
+                self.resolved_by_poll += 1
+            return dict(response, source="poll")
+        return None
+
+    def wait(self, wallet_address: str, transaction_id: str, timeout: float = 60.0) -> dict:
+        """
+        Wait until the transaction succeeded or failed
+
+        Returns:
+            dict: The get_transaction response of the final status (with "source": "poll"),
+            or an error dict if it is still not final after timeout seconds
+        """
+        deadline = time.monotonic() + timeout
+        with profiling.span("wait for transaction", "sleep", transaction_id=transaction_id):
+            while True:
+                time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+                result = self.check(wallet_address, transaction_id)
+                if result:
+                    return result
+                if time.monotonic() >= deadline:
+                    return self.timed_out(transaction_id, timeout)
+
+    def timed_out(self, transaction_id: str, timeout: float) -> dict:
+        """Count a wait that gave up and build its error result"""
+        with self._lock:
+            self.timeouts += 1
+        return {
+            "status": "error",
+            "error": f"Transaction {transaction_id} not final after {timeout}s",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "polls": self.polls,
+                "resolved_by_poll": self.resolved_by_poll,
+                "timeouts": self.timeouts
+            }
+
+
+class WebhookReceiver:
+    """
+    Local HTTP endpoint for Crossmint transaction status webhooks
+
+    Accepts POSTs on path, checks their svix signature against secret and
+    records the status of the transaction in the payload (the transaction
+    object under "data"). Waiters blocked in wait_for() are woken as soon
+    as a final status arrives. Redelivered messages (same svix-id) are
+    acknowledged but applied only once. Statuses of the last max_recent
+    transactions are kept so a callback that arrives before anyone waits
+    isn't lost.
+
+    start() listens on host:port. A process that already serves HTTP, such
+    as service.py, can pass the requests to handle() instead.
+
+    Args:
+        secret (str): Webhook signing secret ("whsec_...")
+        host (str): Interface to listen on
+        port (int): Port to listen on, 0 picks a free one
+        path (str): URL path the webhooks are sent to
+        tolerance (float): Maximum age in seconds of a webhook timestamp
+    """
+
+    def __init__(self, secret: str, host: str = "127.0.0.1", port: int = 0, path: str = "/webhooks/crossmint",
+                 tolerance: float = 300, max_recent: int = 1000):
+        self.secret = secret
+        self.path = path
+        self.tolerance = tolerance
+        self.max_recent = max_recent
+        self._condition = threading.Condition()
+        self._transactions = OrderedDict()
+        self._message_ids = OrderedDict()
+        self.received = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.last_received = None
+        self.created_at = time.monotonic()
+        self.host = host
+        self.port = port
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self):
+        """Listen on host:port, once"""
+        if self.server is None:
+            self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="webhook-receiver", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def silent_for(self) -> float:
+        """Seconds since the last accepted callback, or since the receiver was created if there was none"""
+        with self._condition:
+            return time.monotonic() - (self.last_received or self.created_at)
+
+    def handle(self, headers, body: bytes) -> int:
+        """Verify and apply one webhook request, returns the HTTP status to answer with"""
+        try:
+            payload = verify_webhook(self.secret, headers, body, self.tolerance)
+        except WebhookVerificationError:
+            with self._condition:
+                self.rejected += 1
+            return 401
+
+        transaction = payload.get("data", payload) if isinstance(payload, dict) else None
+        if not isinstance(transaction, dict) or not transaction.get("id") or not transaction.get("status"):
+            with self._condition:
+                self.rejected += 1
+            return 400
+
+        with self._condition:
+            message_id = headers.get("svix-id")
+            if message_id in self._message_ids:
+                self.duplicates += 1
+                return 200
+            self._message_ids[message_id] = True
+            self._transactions[transaction["id"]] = transaction
+            self._transactions.move_to_end(transaction["id"])
+            for recent in [self._message_ids, self._transactions]:
+                while len(recent) > self.max_recent:
+                    recent.popitem(last=False)
+            self.received += 1
+            self.last_received = time.monotonic()
+            self._condition.notify_all()
+        return 200
+
+    def wait_for(self, transaction_id: str, timeout: float):
+        """The transaction once a callback reported a final status, or None after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                transaction = self._transactions.get(transaction_id)
+                if transaction and transaction.get("status") in TERMINAL_STATUSES:
+                    return transaction
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "received": self.received,
+                "rejected": self.rejected,
+                "duplicates": self.duplicates,
+                "seconds_since_last": round(time.monotonic() - self.last_received, 3) if self.last_received else None
+            }
+
+    def _make_handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status = receiver.handle(self.headers, body) if self.path == receiver.path else 404
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class WebhookWaiter:
+    """
+    Waits for transaction status callbacks, falling back to polling when they don't arrive
+
+    Same interface as PollingWaiter. A wait returns as soon as the receiver
+    gets a final status for the transaction. If no callback for it arrives
+    within fallback_after seconds, the wait also polls get_transaction every
+    poll interval of the fallback waiter until either one reports a final
+    status. Once the receiver hasn't accepted any callback for fallback_after
+    seconds, e.g. because webhooks stopped being delivered, waits poll right
+    away instead of waiting for callbacks first.
+
+    Args:
+        receiver (WebhookReceiver): Receiver the webhooks are delivered to
+        fallback (PollingWaiter): Used to poll once callbacks are overdue
+        fallback_after (float): Seconds to rely on callbacks alone
+    """
+
+    def __init__(self, receiver: WebhookReceiver, fallback: PollingWaiter, fallback_after: float = 20.0):
+        self.receiver = receiver
+        self.fallback = fallback
+        self.fallback_after = fallback_after
+        self._lock = threading.Lock()
+        self.resolved_by_webhook = 0
+        self.polled_right_away = 0
+
+    def wait(self, wallet_address: str, transaction_id: str, timeout: float = 60.0) -> dict:
+        start = time.monotonic()
+        deadline = start + timeout
+        rely_on_callbacks = self.fallback_after
+        if self.receiver.silent_for() > self.fallback_after:
+            rely_on_callbacks = 0
+            with self._lock:
+                self.polled_right_away += 1
+        with profiling.span("wait for transaction", "sleep", transaction_id=transaction_id):
+            transaction = self.receiver.wait_for(transaction_id, min(rely_on_callbacks, timeout))
+            while transaction is None:
+                result = self.fallback.check(wallet_address, transaction_id)
+                if result:
+                    return result
+                if time.monotonic() >= deadline:
+                    return self.fallback.timed_out(transaction_id, timeout)
+                transaction = self.receiver.wait_for(
+                    transaction_id, min(self.fallback.poll_interval, max(0.0, deadline - time.monotonic())))
+
+        with self._lock:
+            self.resolved_by_webhook += 1
+        return {
+            "status": "success",
+            "timestamp": datetime.utcnow().isoformat(),
+            "transaction_data": transaction,
+            "source": "webhook"
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            resolved_by_webhook = self.resolved_by_webhook
+            polled_right_away = self.polled_right_away
+        return {"resolved_by_webhook": resolved_by_webhook, "polled_right_away": polled_right_away,
+                **self.fallback.stats(), "webhooks": self.receiver.stats()}
+
+
+_waiters = {}
+_waiters_lock = threading.Lock()
+_receiver = None
+
+
+def get_webhook_receiver():
+    """
+    Process-wide webhook receiver when CROSSMINT_WEBHOOK_SECRET is set, otherwise None
+
+    The receiver isn't listening yet: call start_webhook_receiver() at
+    startup, or pass the callbacks to its handle() from an existing server.
+    """
+    global _receiver
+    secret = os.getenv("CROSSMINT_WEBHOOK_SECRET")
+    if not secret:
+        return None
+    with _waiters_lock:
+        if _receiver is None:
+            _receiver = WebhookReceiver(
+                secret,
+                os.getenv("CROSSMINT_WEBHOOK_HOST", "127.0.0.1"),
+                int(os.getenv("CROSSMINT_WEBHOOK_PORT", "8787"))
+            )
+        return _receiver
+
+
+def start_webhook_receiver():
+    """
+    Listen for webhooks on CROSSMINT_WEBHOOK_HOST:CROSSMINT_WEBHOOK_PORT (default 127.0.0.1:8787)
+
+    Meant to be called once at startup by the process that owns the port,
+    so a bind error shows up there rather than in the middle of a wait.
+
+    Returns:
+        WebhookReceiver: The started receiver, None when CROSSMINT_WEBHOOK_SECRET isn't set
+    """
+    receiver = get_webhook_receiver()
+    return receiver.start() if receiver else None
+
+
+def get_transaction_waiter(api_key: str):
+    """
+    Process-wide transaction waiter per API key
+
+    With CROSSMINT_WEBHOOK_SECRET set, waits resolve from the callbacks of
+    the process-wide webhook receiver, polling after
+    CROSSMINT_WEBHOOK_FALLBACK_AFTER seconds (default 20) without one.
+    Otherwise waits poll every TRANSACTION_POLL_INTERVAL seconds (default 2).
+    The receiver is never bound here, see start_webhook_receiver().
+    """
+    receiver = get_webhook_receiver()
+    with _waiters_lock:
+        waiter = _waiters.get(api_key)
+        if waiter is None:
+            polling = PollingWaiter(api_key, float(os.getenv("TRANSACTION_POLL_INTERVAL", "2.0")))
+            if receiver:
+                waiter = WebhookWaiter(receiver, polling, float(os.getenv("CROSSMINT_WEBHOOK_FALLBACK_AFTER", "20")))
+            else:
+                waiter = polling
+            _waiters[api_key] = waiter
+        return waiter
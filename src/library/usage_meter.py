@@ -0,0 +1,297 @@
+import os
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# USD per 1M tokens as (prompt, completion)
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-turbo-preview": (10.00, 30.00),
+}
+
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 4, 8, 16, 32, 64]
+
+
+class BudgetExceededError(Exception):
+    """Raised when a session or the process has used up its hard budget"""
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimate the USD cost of a call from its token usage
+
+    Unknown models are matched on the longest known prefix (so dated
+    snapshots like "gpt-4o-mini-2024-07-18" use the base model price).
+    """
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        matches = [name for name in MODEL_PRICING if model and model.startswith(name)]
+        if not matches:
+            return 0.0
+        pricing = MODEL_PRICING[max(matches, key=len)]
+    return (prompt_tokens * pricing[0] + completion_tokens * pricing[1]) / 1_000_000
+
+
+class _Totals:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.by_kind = {}
+
+    def add(self, kind, prompt_tokens, completion_tokens, cost, latency, error):
+        self.calls += 1
+        self.errors += 1 if error else 0
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost_usd += cost
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_buckets[i] += 1
+        self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "avg_latency_s": round(self.latency_sum / self.calls, 3) if self.calls else 0.0,
+            "max_latency_s": round(self.latency_max, 3),
+            "calls_by_kind": dict(self.by_kind),
+        }
+
+
+_process_lock = threading.Lock()
+_process_totals = _Totals()
+
+
+class UsageMeter:
+    """
+    Meters token usage, latency and estimated cost of OpenAI calls for one session
+
+    Every recorded call is also added to the process-wide totals. Crossing a
+    soft limit produces a one-time warning from check_budget(), crossing a hard
+    limit makes it raise BudgetExceededError. Limits left as None are not enforced.
+    """
+
+    def __init__(
+        self,
+        session_id: str = None,
+        soft_limit_usd: float = None,
+        hard_limit_usd: float = None,
+        soft_limit_tokens: int = None,
+        hard_limit_tokens: int = None,
+        process_hard_limit_usd: float = None
+    ):
+        self.session_id = session_id or uuid.uuid4().hex[:8]
+        self.soft_limit_usd = soft_limit_usd
+        self.hard_limit_usd = hard_limit_usd
+        self.soft_limit_tokens = soft_limit_tokens
+        self.hard_limit_tokens = hard_limit_tokens
+        self.process_hard_limit_usd = process_hard_limit_usd
+        self.totals = _Totals()
+        self._soft_warned = False
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, model: str, prompt_tokens: int, completion_tokens: int, latency: float, error: bool = False) -> dict:
+        """
+        Record a single OpenAI call
+
+        Args:
+            kind (str): Kind of call, e.g. "chat_completion" or "assistant_run"
+            model (str): Model name used for pricing
+            prompt_tokens (int): Prompt tokens reported by the API
+            completion_tokens (int): Completion tokens reported by the API
+            latency (float): Wall clock duration of the call in seconds
+            error (bool): Whether the call failed
+
+        Returns:
+            dict: The recorded call including its estimated cost
+        """
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+
+        with self._lock:
+            self.totals.add(kind, prompt_tokens, completion_tokens, cost, latency, error)
+        with _process_lock:
+            _process_totals.add(kind, prompt_tokens, completion_tokens, cost, latency, error)
+
+        return {
+            "kind": kind,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": cost,
+            "latency_s": latency
+        }
+
+    def record_chat_completion(self, response, latency: float) -> dict:
+        """Record a chat completions response using its usage block"""
+        usage = getattr(response, "usage", None)
+        return self.record(
+            "chat_completion",
+            getattr(response, "model", None),
+            getattr(usage, "prompt_tokens", 0),
+            getattr(usage, "completion_tokens", 0),
+            latency
+        )
+
+    def record_run(self, run, latency: float) -> dict:
+        """Record a finished assistants run (usage is only set once the run is terminal)"""
+        usage = getattr(run, "usage", None)
+        return self.record(
+            "assistant_run",
+            getattr(run, "model", None),
+            getattr(usage, "prompt_tokens", 0),
+            getattr(usage, "completion_tokens", 0),
+            latency,
+            error=getattr(run, "status", None) in ["failed", "expired", "cancelled"]
+        )
+
+    def check_budget(self):
+        """
+        Check the session and process budgets before making another call
+
+        Returns:
+            str: A warning message the first time a soft limit is crossed, otherwise None
+
+        Raises:
+            BudgetExceededError: If a hard limit has been reached
+        """
+        if self.hard_limit_usd is not None and self.totals.cost_usd >= self.hard_limit_usd:
+            raise BudgetExceededError(
+                f"Session budget of ${self.hard_limit_usd:.4f} reached (spent ${self.totals.cost_usd:.4f})")
+        if self.hard_limit_tokens is not None and self.totals.total_tokens >= self.hard_limit_tokens:
+            raise BudgetExceededError(
+                f"Session token budget of {int(self.hard_limit_tokens)} reached (used {self.totals.total_tokens})")
+        if self.process_hard_limit_usd is not None and _process_totals.cost_usd >= self.process_hard_limit_usd:
+            raise BudgetExceededError(
+                f"Process budget of ${self.process_hard_limit_usd:.4f} reached (spent ${_process_totals.cost_usd:.4f})")
+
+        if self._soft_warned:
+            return None
+        over_cost = self.soft_limit_usd is not None and self.totals.cost_usd >= self.soft_limit_usd
+        over_tokens = self.soft_limit_tokens is not None and self.totals.total_tokens >= self.soft_limit_tokens
+        if over_cost or over_tokens:
+            self._soft_warned = True
+            return (f"Warning: soft usage budget reached "
+                    f"(${self.totals.cost_usd:.4f}, {self.totals.total_tokens} tokens used)")
+        return None
+
+    def describe_budget(self) -> str:
+        """Human readable description of the configured limits"""
+        limits = []
+        if self.hard_limit_usd is not None:
+            limits.append(f"${self.hard_limit_usd:.2f}")
+        if self.hard_limit_tokens is not None:
+            limits.append(f"{int(self.hard_limit_tokens)} tokens")
+        return " / ".join(limits) if limits else "unlimited"
+
+    def snapshot(self) -> dict:
+        """Session usage plus the process-wide totals"""
+        with self._lock:
+            session = self.totals.as_dict()
+        return {
+            "session_id": self.session_id,
+            "session": session,
+            "process": process_snapshot()
+        }
+
+
+def usage_meter_from_env(default_soft_usd: float = None, default_hard_usd: float = None, session_id: str = None) -> UsageMeter:
+    """
+    Build a UsageMeter from AGENT_SOFT_BUDGET_USD, AGENT_HARD_BUDGET_USD,
+    AGENT_SOFT_BUDGET_TOKENS, AGENT_HARD_BUDGET_TOKENS and AGENT_PROCESS_HARD_BUDGET_USD
+    """
+    def env_number(name, default=None):
+        value = os.getenv(name)
+        return float(value) if value else default
+
+    return UsageMeter(
+        session_id=session_id,
+        soft_limit_usd=env_number('AGENT_SOFT_BUDGET_USD', default_soft_usd),
+        hard_limit_usd=env_number('AGENT_HARD_BUDGET_USD', default_hard_usd),
+        soft_limit_tokens=env_number('AGENT_SOFT_BUDGET_TOKENS'),
+        hard_limit_tokens=env_number('AGENT_HARD_BUDGET_TOKENS'),
+        process_hard_limit_usd=env_number('AGENT_PROCESS_HARD_BUDGET_USD')
+    )
+
+
+def process_snapshot() -> dict:
+    """Usage totals for every meter in this process"""
+    with _process_lock:
+        return _process_totals.as_dict()
+
+
+def prometheus_metrics() -> str:
+    """
+    Render the process-wide totals in the Prometheus text exposition format
+    """
+    with _process_lock:
+        totals = _process_totals
+        lines = [
+            "# TYPE agent_openai_calls_total counter",
+            f"agent_openai_calls_total {totals.calls}",
+            "# TYPE agent_openai_errors_total counter",
+            f"agent_openai_errors_total {totals.errors}",
+            "# TYPE agent_openai_tokens_total counter",
+            f'agent_openai_tokens_total{{type="prompt"}} {totals.prompt_tokens}',
+            f'agent_openai_tokens_total{{type="completion"}} {totals.completion_tokens}',
+            "# TYPE agent_openai_cost_usd_total counter",
+            f"agent_openai_cost_usd_total {totals.cost_usd:.6f}",
+            "# TYPE agent_openai_latency_seconds histogram",
+        ]
+        for bound, count in zip(LATENCY_BUCKETS, totals.latency_buckets):
+            lines.append(f'agent_openai_latency_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f'agent_openai_latency_seconds_bucket{{le="+Inf"}} {totals.calls}')
+        lines.append(f"agent_openai_latency_seconds_sum {totals.latency_sum:.3f}")
+        lines.append(f"agent_openai_latency_seconds_count {totals.calls}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = prometheus_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """
+    Serve /metrics for dashboards from a background thread
+
+    Returns:
+        ThreadingHTTPServer: The running server (call shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
@@ -1,12 +1,233 @@
 import requests
+import functools
+import inspect
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from web3 import Web3
 from eth_abi import encode
 from eth_utils import function_signature_to_4byte_selector
+from eth_account import Account
 from eth_account.messages import encode_defunct
+from library.endpoints import create_session, endpoints_from_env
+from library.http_replay import transport_from_env
+from library.journal import journal_from_env
+from library.request_scheduler import scheduler_from_env
+from library import profiling
 
+# CROSSMINT_ENV selects staging or production, CROSSMINT_BASE_URL points at
+# another host such as a local stand-in (flow/crossmint_stub.py)
+_endpoints = endpoints_from_env()
 
+# Every request goes through _send, so a different transport (e.g. the
+# record/replay transports in library/http_replay.py) can be plugged in.
+# By default each thread sends through its own session on one shared
+# connection pool, so connections are reused.
+_session = create_session()
+_transport = transport_from_env(_session.request)
+_operation_listeners = []
+
+# Requests are admitted by priority class (library/request_scheduler.py), so
+# bulk traffic can't take the capacity interactive calls need
+_scheduler = scheduler_from_env()
+
+# CROSSMINT_JOURNAL_DIR appends every operation below to a binary journal
+# (library/journal.py), None leaves journaling off
+_journal = journal_from_env()
+
+USDC_CONTRACT_ADDRESS = "0x14196F08a4Fa0B66B7331bC40dd6bCd8A1dEeA9F"
+TRANSFER_SELECTOR = function_signature_to_4byte_selector('transfer(address,uint256)')
+
+
+def set_transport(transport):
+    """
+    Replace the HTTP transport used for every Crossmint API call
+
+    transport(method, url, headers=..., json=...) must return an object with
+    the requests.Response attributes used here (ok, status_code, text, json())
+    and raise requests.exceptions.RequestException on connection errors.
+    Pass None to go back to the pooled requests sessions.
+    """
+    global _transport
+    _transport = transport or _session.request
+
+
+def get_transport():
+    return _transport
+
+
+def set_endpoints(endpoints):
+    """Send every Crossmint API call to another environment or host (a library.endpoints.CrossmintEndpoints)"""
+    global _endpoints
+    _endpoints = endpoints
+
+
+def get_endpoints():
+    return _endpoints
+
+
+def prewarm(connections: int = None, timeout: float = 5.0) -> dict:
+    """
+    Open pooled connections to the API host ahead of the first request
+
+    Resolves the host and completes the TCP and TLS handshakes for up to
+    connections (default CROSSMINT_PREWARM_CONNECTIONS, 2) connections in
+    parallel, which are then kept in the session's pool for the first wallet
+    and transfer calls. Skipped when another transport, e.g. a replay, is
+    in use.
+
+    Returns:
+        dict: Status, the number of connections and how long it took, or the error
+    """
+    if _transport != _session.request and getattr(_transport, "inner", None) != _session.request:
+        return {"status": "skipped", "reason": "requests do not use the pooled session"}
+
+    connections = connections or int(os.getenv("CROSSMINT_PREWARM_CONNECTIONS", "2"))
+    start = time.perf_counter()
+    try:
+        with profiling.span("prewarm connections", "http", connections=connections):
+            # Concurrent requests check out separate connections, which return to the pool when done
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(lambda _: _session.head(_endpoints.base_url, timeout=timeout), range(connections)))
+    except requests.exceptions.RequestException as e:
+        return {
+            "status": "error",
+            "error": str(e),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    return {
+        "status": "success",
+        "host": _endpoints.base_url,
+        "connections": connections,
+        "elapsed_s": round(time.perf_counter() - start, 3)
+    }
+
+
+def prewarm_in_background(connections: int = None):
+    """Run prewarm() on a daemon thread unless CROSSMINT_PREWARM=0, so startup doesn't wait for it"""
+    if os.getenv("CROSSMINT_PREWARM", "1") == "0":
+        return None
+    thread = threading.Thread(target=prewarm, args=(connections,), name="crossmint-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def set_scheduler(scheduler):
+    """Admit requests with another library.request_scheduler.RequestScheduler"""
+    global _scheduler
+    _scheduler = scheduler
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def set_journal(journal):
+    """
+    Record every operation of this module in journal (a library.journal.OperationJournal), None to stop
+    """
+    global _journal
+    _journal = journal
+
+
+def get_journal():
+    return _journal
+
+
+def _journaled(operation: str, amount_scale: int = 1):
+    """
+    Record each call of the decorated operation in the journal, if one is set
+
+    The wallets, transaction id, chain and amount are taken from the call
+    arguments and the result. amount_scale converts the amount argument to
+    USDC base units.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            journal = _journal
+            if journal is None:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                try:
+                    arguments = signature.bind(*args, **kwargs).arguments
+                    data = result.get("transaction_data") or result.get("wallet_data") if isinstance(result, dict) else None
+                    data = data if isinstance(data, dict) else {}
+                    journal.append(
+                        operation,
+                        result.get("status") if isinstance(result, dict) else "error",
+                        time.perf_counter() - start,
+                        wallet=(arguments.get("wallet_address") or arguments.get("from_wallet_address")
+                                or arguments.get("user_op_sender") or data.get("address")),
+                        counterparty=arguments.get("to_wallet_address"),
+                        transaction_id=arguments.get("transaction_id") or data.get("id"),
+                        amount=(arguments.get("amount") or 0) * amount_scale,
+                        chain=arguments.get("chain"),
+                        transaction_status=data.get("status")
+                    )
+                except Exception as e:
+                    print(f"Journal write failed: {e}")
+
+        return wrapper
+
+    return decorator
+
+
+def _send(method: str, url: str, headers: dict, json: dict = None):
+    with _scheduler.slot():
+        with profiling.span(profiling.http_span_name(method, url), "http"):
+            response = _transport(method, url, headers=headers, json=json)
+
+    # A 429 with Retry-After is the API's rate limit, which applies to every
+    # request. Quota errors without it (e.g. the faucet's) are left to the caller.
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response.status_code == 429 else None
+    if retry_after:
+        try:
+            _scheduler.throttle(float(retry_after))
+        except ValueError:
+            _scheduler.throttle(1.0)
+    return response
+
+
+def add_operation_listener(listener):
+    """
+    Register a callback for balance changing operations issued through this module
+
+    listener(event) is called after every successful faucet credit and USDC
+    transfer, with event being a dict like:
+        {"type": "faucet_credit", "chain": str, "wallet_address": str, "amount": int, "reference": str}
+        {"type": "transfer", "chain": str, "from_wallet_address": str, "to_wallet_address": str,
+         "amount": int, "reference": str}
+    Amounts are in USDC base units (1000000 = 1 USDC).
+    """
+    _operation_listeners.append(listener)
+
+
+def remove_operation_listener(listener):
+    if listener in _operation_listeners:
+        _operation_listeners.remove(listener)
+
+
+def _notify_listeners(event: dict):
+    for listener in list(_operation_listeners):
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"Operation listener failed: {e}")
+
+
+@_journaled("create_wallet")
 def create_wallet(api_key: str, wallet_type: str, signer_address: str):
     """
     Create a new wallet using Crossmint API
@@ -19,8 +240,7 @@ def create_wallet(api_key: str, wallet_type: str, signer_address: str):
             "timestamp": datetime.utcnow().isoformat()
         }
 
-    # Hit the Crossmint Staging API
-    endpoint = f"https://staging.crossmint.com/api/2022-06-09/wallets"
+    endpoint = _endpoints.wallets()
 
     payload = {
         "type": wallet_type,
@@ -38,7 +258,8 @@ def create_wallet(api_key: str, wallet_type: str, signer_address: str):
     }
 
     try:
-        response = requests.post(
+        response = _send(
+            "POST",
             endpoint,
             json=payload,
             headers=headers
@@ -72,6 +293,7 @@ def create_wallet(api_key: str, wallet_type: str, signer_address: str):
         }
 
 
+@_journaled("faucet", amount_scale=10**6)
 def get_usdc_from_faucet(api_key: str, chain: str, wallet_address: str, amount: int):
     """
     Get USDC from the Crossmint faucet
@@ -85,8 +307,7 @@ def get_usdc_from_faucet(api_key: str, chain: str, wallet_address: str, amount:
     Returns:
         dict: Response containing status and transaction data or error message
     """
-    endpoint = f"https://staging.crossmint.com/api/v1-alpha2/wallets/{
-        wallet_address}/balances"
+    endpoint = _endpoints.balances(wallet_address)
 
     headers = {
         "x-api-key": api_key,
@@ -100,7 +321,7 @@ def get_usdc_from_faucet(api_key: str, chain: str, wallet_address: str, amount:
     }
 
     try:
-        response = requests.post(endpoint, json=payload, headers=headers)
+        response = _send("POST", endpoint, json=payload, headers=headers)
 
         if not response.ok:
             error_message = "Unknown error"
@@ -110,6 +331,7 @@ def get_usdc_from_faucet(api_key: str, chain: str, wallet_address: str, amount:
                     return {
                         "status": "error",
                         "error": error_data["message"],
+                        "rate_limited": True,
                         "timestamp": datetime.utcnow().isoformat()
                     }
                 error_message = error_data.get('message', str(response.text))
@@ -122,10 +344,19 @@ def get_usdc_from_faucet(api_key: str, chain: str, wallet_address: str, amount:
                 "timestamp": datetime.utcnow().isoformat()
             }
 
+        transaction_data = response.json()
+        _notify_listeners({
+            "type": "faucet_credit",
+            "chain": chain,
+            "wallet_address": wallet_address,
+            "amount": amount * 10**6,
+            "reference": transaction_data.get("txId") if isinstance(transaction_data, dict) else None
+        })
+
         return {
             "status": "success",
             "timestamp": datetime.utcnow().isoformat(),
-            "transaction_data": response.json()
+            "transaction_data": transaction_data
         }
 
     except requests.exceptions.RequestException as e:
@@ -136,6 +367,23 @@ def get_usdc_from_faucet(api_key: str, chain: str, wallet_address: str, amount:
         }
 
 
+def encode_usdc_transfer(to_wallet_address: str, amount: int) -> str:
+    """
+    Calldata for an ERC-20 transfer(address,uint256) call
+
+    Args:
+        to_wallet_address (str): Checksummed destination address
+        amount (int): Amount in USDC base units (1000000 = 1 USDC)
+
+    Returns:
+        str: The encoded call with '0x' prefix
+    """
+    encoded_params = encode(['address', 'uint256'], [
+                            to_wallet_address, amount])
+    return f"0x{(TRANSFER_SELECTOR + encoded_params).hex()}"
+
+
+@_journaled("transfer")
 def transfer_usdc(api_key: str, from_wallet_address: str, to_wallet_address: str, amount: int, chain: str = "base-sepolia", private_key: str = None):
     """
     Transfer USDC from one wallet to another
@@ -148,23 +396,14 @@ def transfer_usdc(api_key: str, from_wallet_address: str, to_wallet_address: str
         chain (str): Blockchain network (default: "base-sepolia")
         private_key (str): Private key for signing the transaction
     """
-    usdc_contract_address = "0x14196F08a4Fa0B66B7331bC40dd6bCd8A1dEeA9F"
-
     # Make sure to_wallet_address is checksummed
     to_wallet_address = Web3.to_checksum_address(to_wallet_address)
 
-    # Encode the transfer function call
-    transfer_selector = function_signature_to_4byte_selector(
-        'transfer(address,uint256)')
-    encoded_params = encode(['address', 'uint256'], [
-                            to_wallet_address, amount])
-    encoded_transfer = transfer_selector + encoded_params
-
     params = {
         "calls": [{
-            "to": usdc_contract_address,
+            "to": USDC_CONTRACT_ADDRESS,
             "value": "0",
-            "data": f"0x{encoded_transfer.hex()}"
+            "data": encode_usdc_transfer(to_wallet_address, amount)
         }],
         "chain": chain
     }
@@ -211,12 +450,24 @@ def transfer_usdc(api_key: str, from_wallet_address: str, to_wallet_address: str
         user_op_sender=from_wallet_address,
         transaction_id=tx_data["id"],
         signer_id=signer_id,
-        signature=signature
+        signature=signature,
+        user_op_hash=user_op_hash
     )
 
+    if signature_response.get("status") == "success":
+        _notify_listeners({
+            "type": "transfer",
+            "chain": chain,
+            "from_wallet_address": from_wallet_address,
+            "to_wallet_address": to_wallet_address,
+            "amount": amount,
+            "reference": tx_data["id"]
+        })
+
     return signature_response
 
 
+@_journaled("create_transaction")
 def create_transaction(api_key: str, wallet_address: str, chain: str, params: dict = None):
     """
     Create a transaction with specific parameters
@@ -246,8 +497,7 @@ def create_transaction(api_key: str, wallet_address: str, chain: str, params: di
         }
     """
 
-    endpoint = f"https://staging.crossmint.com/api/2022-06-09/wallets/{
-        wallet_address}/transactions"
+    endpoint = _endpoints.transactions(wallet_address)
 
     # Use provided params or default to a basic transaction
     default_params = {
@@ -271,7 +521,8 @@ def create_transaction(api_key: str, wallet_address: str, chain: str, params: di
     }
 
     try:
-        response = requests.post(
+        response = _send(
+            "POST",
             endpoint,
             json=payload,
             headers=headers
@@ -342,30 +593,81 @@ def generate_signature(private_key: str, user_op_hash: str) -> str:
         raise ValueError("Invalid private key format")
 
     # Convert the hash to bytes and sign it as an Ethereum message
-    message_bytes = bytes.fromhex(user_op_hash.replace('0x', ''))
-    eth_message = encode_defunct(primitive=message_bytes)
-    signed_message = account.sign_message(eth_message)
+    with profiling.span("sign user operation", "signing"):
+        message_bytes = bytes.fromhex(user_op_hash.replace('0x', ''))
+        eth_message = encode_defunct(primitive=message_bytes)
+        signed_message = account.sign_message(eth_message)
 
     # Add '0x' prefix to the signature
     return '0x' + signed_message.signature.hex()
 
 
+def signer_address(signer_id: str) -> str:
+    """Address part of a signer id ("evm-keypair:0x123..." or "0x123...")"""
+    return signer_id.rsplit(":", 1)[-1]
+
+
+@functools.lru_cache(maxsize=4096)
+def recover_signer(user_op_hash: str, signature: str) -> str:
+    """
+    Address that signed user_op_hash (as an Ethereum message, like generate_signature) with signature
+
+    Raises:
+        ValueError: If the hash or the signature is malformed
+    """
+    try:
+        message = encode_defunct(primitive=bytes.fromhex(user_op_hash.replace('0x', '')))
+        with profiling.span("recover signer", "signing"):
+            return Account.recover_message(message, signature=signature)
+    except Exception as e:
+        raise ValueError(f"Cannot recover signer: {e}")
+
+
+def verify_signature(user_op_hash: str, signature: str, signer_id: str) -> bool:
+    """
+    Check locally that signature is signer_id's signature of user_op_hash
+
+    Returns:
+        bool: True if the recovered address is the signer's, False on a mismatch or a malformed signature
+    """
+    try:
+        return recover_signer(user_op_hash, signature).lower() == signer_address(signer_id).lower()
+    except ValueError:
+        return False
+
+
+def _signature_mismatch(transaction_id: str, signer_id: str) -> dict:
+    return {
+        "status": "error",
+        "error": f"Signature for transaction {transaction_id} was not made by signer {signer_id}",
+        "signature_mismatch": True,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@_journaled("submit_approval")
 def submit_transaction_approval(
     api_key: str,
     user_op_sender: str,
     transaction_id: str,
     signer_id: str,
-    signature: str
+    signature: str,
+    user_op_hash: str = None
 ) -> dict:
     """
     Submit an approval for a transaction
 
+    With user_op_hash, the signer is first recovered from the signature
+    locally, and a signature that wasn't made by signer_id is rejected
+    without calling the API.
+
     Args:
         api_key (str): Crossmint API key
         user_op_sender (str): The wallet address that created the transaction
         transaction_id (str): The transaction ID to approve
         signer_id (str): The ID of the signer (e.g. "0x123...")
         signature (str): The signature for the transaction
+        user_op_hash (str): The signed user operation hash, to verify the signature before submitting
 
     Returns:
         dict: Response containing status and transaction data or error in the format:
@@ -385,7 +687,10 @@ def submit_transaction_approval(
             }
         }
     """
-    endpoint = f"https://staging.crossmint.com/api/2022-06-09/wallets/{user_op_sender}/transactions/{transaction_id}/approvals"
+    if user_op_hash and not verify_signature(user_op_hash, signature, signer_id):
+        return _signature_mismatch(transaction_id, signer_id)
+
+    endpoint = _endpoints.approvals(user_op_sender, transaction_id)
 
     payload = {
         "approvals": [
@@ -402,7 +707,8 @@ def submit_transaction_approval(
     }
 
     try:
-        response = requests.post(
+        response = _send(
+            "POST",
             endpoint,
             json=payload,
             headers=headers
@@ -436,6 +742,7 @@ def submit_transaction_approval(
         }
 
 
+@_journaled("get_transaction")
 def get_transaction(api_key: str, user_op_sender: str, transaction_id: str) -> dict:
     """
     Get a transaction response
@@ -448,8 +755,7 @@ def get_transaction(api_key: str, user_op_sender: str, transaction_id: str) -> d
     Returns:
         dict: Transaction response or error message
     """
-    endpoint = f"https://staging.crossmint.com/api/2022-06-09/wallets/{
-        user_op_sender}/transactions/{transaction_id}"
+    endpoint = _endpoints.transaction(user_op_sender, transaction_id)
 
     headers = {
         "x-api-key": api_key,
@@ -457,7 +763,7 @@ def get_transaction(api_key: str, user_op_sender: str, transaction_id: str) -> d
     }
 
     try:
-        response = requests.get(endpoint, headers=headers)
+        response = _send("GET", endpoint, headers=headers)
 
         if response.ok:
             return {
@@ -487,14 +793,13 @@ def get_transaction(api_key: str, user_op_sender: str, transaction_id: str) -> d
         }
 
 
+@_journaled("get_balance")
 def get_wallet_balance(api_key: str, chain: str, wallet_address: str):
     """
     Get the balance of a wallet using Crossmint API
     """
 
-    # Hit the Crossmint Staging API
-    endpoint = f"https://staging.crossmint.com/api/v1-alpha2/wallets/{
-        wallet_address}/balances?chains={chain}&tokens=usdxm"
+    endpoint = f"{_endpoints.balances(wallet_address)}?chains={chain}&tokens=usdxm"
 
     headers = {
         "x-api-key": api_key,
@@ -502,7 +807,7 @@ def get_wallet_balance(api_key: str, chain: str, wallet_address: str):
     }
 
     try:
-        response = requests.get(endpoint, headers=headers)
+        response = _send("GET", endpoint, headers=headers)
 
         if not response.ok:
             return {
@@ -511,20 +816,10 @@ def get_wallet_balance(api_key: str, chain: str, wallet_address: str):
                 "timestamp": datetime.utcnow().isoformat()
             }
 
-        response_json = response.json()
-        # Find USDC token balance from response array
-        usdc_token = next((token for token in response_json if token.get(
-            "token", None) == "usdxm"), None)
-        balance = "0"
-        if usdc_token:
-            balances = usdc_token.get("balances", {})
-            balance = balances.get(chain, "0")
-        human_readable_balance = int(balance) / 10**6
-
         return {
             "status": "success",
             "timestamp": datetime.utcnow().isoformat(),
-            "balance": human_readable_balance,
+            "balance": parse_usdc_balance(response.json(), chain),
         }
 
     except requests.exceptions.RequestException as e:
@@ -533,3 +828,17 @@ def get_wallet_balance(api_key: str, chain: str, wallet_address: str):
             "error": str(e),
             "timestamp": datetime.utcnow().isoformat()
         }
+
+
+def parse_usdc_balance(response_json: list, chain: str) -> float:
+    """
+    USDC balance on chain from a balances response, in USDC (not base units)
+    """
+    # Find USDC token balance from response array
+    usdc_token = next((token for token in response_json if token.get(
+        "token", None) == "usdxm"), None)
+    balance = "0"
+    if usdc_token:
+        balances = usdc_token.get("balances", {})
+        balance = balances.get(chain, "0")
+    return int(balance) / 10**6
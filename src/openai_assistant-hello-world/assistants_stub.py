@@ -0,0 +1,313 @@
+"""
+Local stand-in for the OpenAI Assistants endpoints used by run.py
+
+Serves assistants, threads, messages and runs (polling and streaming) with
+a scripted assistant, so the run loop can be exercised and benchmarked
+offline by pointing the OpenAI client at it:
+
+    client = OpenAI(base_url="http://127.0.0.1:8765/v1", api_key="stub")
+
+Scripted behavior: a run thinks for --think-time seconds, then either asks
+for a get_wallet_balance tool call (when the last user message mentions a
+"balance") or completes with a reply echoing the user message.
+
+Usage:
+    python3 assistants_stub.py --port 8765 --think-time 0.8
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class AssistantsStub:
+    """In-memory state of the stand-in: assistants, threads, messages and runs"""
+
+    def __init__(self, think_time: float = 0.8, queue_time: float = 0.05):
+        self.think_time = think_time
+        self.queue_time = queue_time
+        self.assistants = {}
+        self.threads = {}
+        self.messages = {}
+        self.runs = {}
+        self.request_counts = Counter()
+        self.lock = threading.RLock()
+
+    def create_assistant(self, body):
+        assistant = {
+            "id": f"asst_{uuid.uuid4().hex[:24]}",
+            "object": "assistant",
+            "created_at": int(time.time()),
+            "name": body.get("name"),
+            "model": body.get("model"),
+            "instructions": body.get("instructions"),
+            "tools": body.get("tools", []),
+            "metadata": body.get("metadata", {})
+        }
+        self.assistants[assistant["id"]] = assistant
+        return assistant
+
+    def create_thread(self, body):
+        thread = {
+            "id": f"thread_{uuid.uuid4().hex[:24]}",
+            "object": "thread",
+            "created_at": int(time.time()),
+            "metadata": body.get("metadata", {})
+        }
+        self.threads[thread["id"]] = thread
+        self.messages[thread["id"]] = []
+        return thread
+
+    def add_message(self, thread_id, role, text, run_id=None, assistant_id=None):
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "status": "completed",
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "attachments": [],
+            "metadata": {},
+            "run_id": run_id,
+            "assistant_id": assistant_id
+        }
+        with self.lock:
+            self.messages[thread_id].append(message)
+        return message
+
+    def list_messages(self, thread_id, query):
+        messages = list(self.messages[thread_id])
+        if query.get("order", ["desc"])[0] == "desc":
+            messages.reverse()
+        ids = [m["id"] for m in messages]
+        after = query.get("after", [None])[0]
+        if after in ids:
+            messages = messages[ids.index(after) + 1:]
+        limit = int(query.get("limit", ["20"])[0])
+        page = messages[:limit]
+        return {
+            "object": "list",
+            "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(messages) > limit
+        }
+
+    def create_run(self, thread_id, body):
+        user_messages = [m for m in self.messages[thread_id] if m["role"] == "user"]
+        prompt = user_messages[-1]["content"][0]["text"]["value"] if user_messages else ""
+        run = {
+            "id": f"run_{uuid.uuid4().hex[:24]}",
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": body.get("assistant_id"),
+            "status": "queued",
+            "model": self.assistants.get(body.get("assistant_id"), {}).get("model", "gpt-4-turbo-preview"),
+            "instructions": "",
+            "tools": [],
+            "required_action": None,
+            "usage": None,
+            "metadata": {}
+        }
+        self.runs[run["id"]] = {
+            "run": run,
+            "prompt": prompt,
+            "ready_at": time.monotonic() + self.queue_time + self.think_time,
+            "tool_outputs": None
+        }
+        return run
+
+    def list_runs(self, thread_id, query):
+        runs = sorted((entry["run"] for entry in self.runs.values() if entry["run"]["thread_id"] == thread_id),
+                      key=lambda run: run["created_at"], reverse=query.get("order", ["desc"])[0] == "desc")
+        page = runs[:int(query.get("limit", ["20"])[0])]
+        return {
+            "object": "list",
+            "data": [self.advance(run["id"]) for run in page],
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(runs) > len(page)
+        }
+
+    def advance(self, run_id):
+        """Move a run to its next state once its think time has passed"""
+        with self.lock:
+            entry = self.runs[run_id]
+            run = entry["run"]
+            now = time.monotonic()
+            if run["status"] in ["completed", "requires_action", "failed"]:
+                return run
+            if now < entry["ready_at"]:
+                run["status"] = "in_progress" if now >= entry["ready_at"] - self.think_time else "queued"
+                return run
+
+            if entry["tool_outputs"] is None and "balance" in entry["prompt"].lower():
+                address = re.search(r"0x[0-9a-fA-F]{40}", entry["prompt"])
+                run["status"] = "requires_action"
+                run["required_action"] = {
+                    "type": "submit_tool_outputs",
+                    "submit_tool_outputs": {"tool_calls": [{
+                        "id": f"call_{uuid.uuid4().hex[:24]}",
+                        "type": "function",
+                        "function": {
+                            "name": "get_wallet_balance",
+                            "arguments": json.dumps({"wallet_address": address.group(0) if address else "0x" + "0" * 40})
+                        }
+                    }]}
+                }
+                return run
+
+            if entry["tool_outputs"] is not None:
+                reply = f"Here is what I found: {entry['tool_outputs'][0]['output']}"
+            else:
+                reply = f"You said: {entry['prompt']}"
+            entry["message"] = self.add_message(run["thread_id"], "assistant", reply, run["id"], run["assistant_id"])
+            run["status"] = "completed"
+            run["usage"] = {"prompt_tokens": 400, "completion_tokens": 40, "total_tokens": 440}
+            return run
+
+    def submit_tool_outputs(self, run_id, body):
+        with self.lock:
+            entry = self.runs[run_id]
+            entry["tool_outputs"] = body.get("tool_outputs", [])
+            entry["ready_at"] = time.monotonic() + self.think_time
+            entry["run"]["status"] = "in_progress"
+            entry["run"]["required_action"] = None
+            return entry["run"]
+
+    def stream_events(self, run_id):
+        """Events for a streamed run, blocking until the run needs action or finishes"""
+        run = self.runs[run_id]["run"]
+        yield "thread.run.created", dict(run)
+        yield "thread.run.in_progress", dict(run, status="in_progress")
+
+        wait = self.runs[run_id]["ready_at"] - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        run = self.advance(run_id)
+
+        if run["status"] == "requires_action":
+            yield "thread.run.requires_action", dict(run)
+            return
+        message = self.runs[run_id]["message"]
+        yield "thread.message.created", message
+        yield "thread.message.completed", message
+        yield "thread.run.completed", dict(run)
+
+
+def make_handler(stub: AssistantsStub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self, run_id):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for event, data in stub.stream_events(run_id):
+                self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"event: done\ndata: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def _route(self, method):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p][1:]  # drop "v1"
+            query = parse_qs(url.query)
+            body = self._body() if method == "POST" else {}
+            stub.request_counts[f"{method} /{'/'.join('{id}' if i % 2 else p for i, p in enumerate(parts))}"] += 1
+
+            if parts == ["assistants"] and method == "POST":
+                return self._send_json(stub.create_assistant(body))
+            if len(parts) == 2 and parts[0] == "assistants" and method == "GET":
+                assistant = stub.assistants.get(parts[1])
+                if assistant is None:
+                    return self._send_json({"error": {"message": "No assistant found"}}, 404)
+                return self._send_json(assistant)
+            if parts == ["threads"] and method == "POST":
+                return self._send_json(stub.create_thread(body))
+            if len(parts) == 2 and parts[0] == "threads" and method == "GET":
+                thread = stub.threads.get(parts[1])
+                if thread is None:
+                    return self._send_json({"error": {"message": "No thread found"}}, 404)
+                return self._send_json(thread)
+            if len(parts) == 3 and parts[2] == "messages":
+                if method == "POST":
+                    content = body.get("content")
+                    text = content if isinstance(content, str) else content[0]["text"]
+                    return self._send_json(stub.add_message(parts[1], body.get("role", "user"), text))
+                return self._send_json(stub.list_messages(parts[1], query))
+            if len(parts) == 3 and parts[2] == "runs" and method == "POST":
+                run = stub.create_run(parts[1], body)
+                if body.get("stream"):
+                    return self._send_stream(run["id"])
+                return self._send_json(run)
+            if len(parts) == 3 and parts[2] == "runs" and method == "GET":
+                return self._send_json(stub.list_runs(parts[1], query))
+            if len(parts) == 4 and parts[2] == "runs" and method == "GET":
+                return self._send_json(stub.advance(parts[3]))
+            if len(parts) == 5 and parts[4] == "submit_tool_outputs":
+                run = stub.submit_tool_outputs(parts[3], body)
+                if body.get("stream"):
+                    return self._send_stream(parts[3])
+                return self._send_json(run)
+
+            self._send_json({"error": {"message": f"Not implemented: {method} {url.path}"}}, 404)
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(port: int = 0, think_time: float = 0.8):
+    """
+    Start the stand-in on a background thread
+
+    Returns:
+        tuple: (server, stub, base_url) where base_url ends in /v1
+    """
+    stub = AssistantsStub(think_time=think_time)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Assistants API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--think-time", type=float, default=0.8, help="Seconds a run spends in progress")
+    args = parser.parse_args()
+
+    server, stub, base_url = start_stub(args.port, args.think_time)
+    print(f"Assistants stand-in listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
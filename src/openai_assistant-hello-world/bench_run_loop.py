@@ -0,0 +1,95 @@
+"""
+Offline benchmark of the assistant run loop against the local Assistants stand-in
+
+Compares streaming, adaptive polling and the old fixed 1 second polling on
+the same scripted turns, reporting latency per turn and API requests per turn.
+
+Usage:
+    python3 bench_run_loop.py --turns 10 --think-time 0.8
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+# The agent checks for these at startup; the stand-in doesn't need real values
+for name in ["CROSSMINT_SERVER_API_KEY", "SIGNER_PRIVATE_KEY", "SIGNER_ADDRESS", "OPENAI_API_KEY"]:
+    os.environ.setdefault(name, "stub")
+# Keep the benchmark's thread cursor out of the real session state
+state_dir = tempfile.mkdtemp()
+os.environ["AGENT_STATE_PATH"] = os.path.join(state_dir, "assistant_state.json")
+os.environ["AGENT_MEMORY_STORE_PATH"] = os.path.join(state_dir, "assistant_memory.sqlite3")
+
+from openai import OpenAI
+
+from assistants_stub import start_stub
+from run import CryptoAssistantAgent, poll_run, print_assistant_reply, process_run
+
+PROMPTS = [
+    "What can you do?",
+    "What is the balance of 0x5B20a88375A7ae6D3D1efAe9a86CC7225006518d?",
+]
+
+
+def run_turn(agent, thread_id, assistant_id, mode):
+    if mode == "fixed":
+        # The previous loop: poll every second, then fetch the reply
+        run = agent.client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id)
+        run = poll_run(agent, thread_id, run, min_interval=1.0, max_interval=1.0, backoff=1.0)
+        print_assistant_reply(agent, thread_id)
+        return run
+    return process_run(agent, thread_id, assistant_id, mode=mode)
+
+
+def bench_mode(base_url, stub, mode, turns):
+    agent = CryptoAssistantAgent()
+    agent.client = OpenAI(base_url=base_url, api_key="stub")
+    assistant = agent.client.beta.assistants.create(name="bench", model="gpt-4-turbo-preview", instructions="", tools=[])
+    thread = agent.client.beta.threads.create()
+
+    stub.request_counts.clear()
+    latencies = []
+    for i in range(turns):
+        message = agent.client.beta.threads.messages.create(thread_id=thread.id, role="user", content=PROMPTS[i % len(PROMPTS)])
+        agent.state["last_message_id"] = message.id
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run = run_turn(agent, thread.id, assistant.id, mode)
+        latencies.append(time.perf_counter() - start)
+        if run.status != "completed":
+            raise RuntimeError(f"Run ended with status {run.status}")
+
+    # Setup and message creation requests aren't part of the run loop
+    loop_requests = sum(count for key, count in stub.request_counts.items() if "/runs" in key or (key.startswith("GET") and "messages" in key))
+    return {
+        "mode": mode,
+        "turns": turns,
+        "mean_s": statistics.mean(latencies),
+        "p50_s": statistics.median(latencies),
+        "max_s": max(latencies),
+        "requests_per_turn": loop_requests / turns
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the assistant run loop offline")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--think-time", type=float, default=0.8)
+    args = parser.parse_args()
+
+    server, stub, base_url = start_stub(think_time=args.think_time)
+    try:
+        print(f"{'mode':<8} {'mean s':>8} {'p50 s':>8} {'max s':>8} {'req/turn':>9}")
+        for mode in ["stream", "poll", "fixed"]:
+            result = bench_mode(base_url, stub, mode, args.turns)
+            print(f"{result['mode']:<8} {result['mean_s']:>8.3f} {result['p50_s']:>8.3f} "
+                  f"{result['max_s']:>8.3f} {result['requests_per_turn']:>9.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
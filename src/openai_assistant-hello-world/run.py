@@ -1,10 +1,13 @@
 import os
 import sys
+import hashlib
 from pathlib import Path
 import json
+import re
 import time
 import random
-from openai import OpenAI
+import httpx
+from openai import APIError, NotFoundError, OpenAI
 from dotenv import load_dotenv
 
 # Add the project root to Python path
@@ -13,14 +16,63 @@ sys.path.append(project_root)
 
 from library.wallet_utils import (
     create_wallet, create_transaction, generate_signature, 
-    submit_transaction_approval, get_transaction, 
-    transfer_usdc, get_usdc_from_faucet, get_wallet_balance
+    submit_transaction_approval,
+    transfer_usdc, get_wallet_balance, prewarm_in_background
 )
 from library.tools_schema import tools_schema
+from library.tool_output import compact_tool_output
+from library.faucet_scheduler import get_faucet_scheduler
+from library.transaction_waiter import get_transaction_waiter, start_webhook_receiver
+from library.request_scheduler import request_priority
+from library.prefetch import get_prefetcher
+from library.intent_parser import ADDRESS
+from library.agent_memory import AgentMemory
+from library import profiling
+from library.usage_meter import usage_meter_from_env, start_metrics_server
 
 # Load environment variables
 load_dotenv()
 
+ASSISTANT_NAME = "Web3 Assistant"
+ASSISTANT_MODEL = "gpt-4-turbo-preview"
+ASSISTANT_INSTRUCTIONS = """You are a super helpful AI web3 assistant that can perform actions on the blockchain using Crossmint's API.
+            You can create new wallets, check balances, deposit tokens, transfer tokens between wallets, and more."""
+
+# Run statuses in which a run still occupies its thread
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "requires_action", "cancelling")
+
+
+def thread_truncation_strategy():
+    """Only the last AGENT_THREAD_LAST_MESSAGES thread messages go into each run, 0 sends the whole thread"""
+    last_messages = int(os.getenv('AGENT_THREAD_LAST_MESSAGES', '20'))
+    if last_messages <= 0:
+        return {"type": "auto"}
+    return {"type": "last_messages", "last_messages": last_messages}
+
+
+def assistant_fingerprint(model: str, instructions: str, tools: list) -> str:
+    """Hash of everything that defines the assistant, used to reuse it across restarts"""
+    payload = json.dumps({"model": model, "instructions": instructions, "tools": tools}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def load_state(path: str) -> dict:
+    """Load persisted assistant ids, thread id and wallets, or start empty"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(path: str, state: dict):
+    # Write to a temp file first so a crash never leaves a half written state file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
 class CryptoAssistantAgent:
     def __init__(self):
         # Initialize OpenAI client and API keys
@@ -32,7 +84,25 @@ class CryptoAssistantAgent:
         if not all([self.api_key, self.private_key, self.signer_address]):
             raise ValueError("Missing required environment variables")
             
-        self.wallets = []
+        # Assistant and thread ids survive restarts in the state file, tracked
+        # wallets and tool results in a sqlite store of which only the most
+        # recent entries are kept in memory (AGENT_MAX_RESIDENT_*)
+        self.state_path = os.getenv('AGENT_STATE_PATH', '.assistant_state.json')
+        self.state = load_state(self.state_path)
+        self.memory = AgentMemory(
+            namespace="assistant",
+            path=os.getenv('AGENT_MEMORY_STORE_PATH', '.assistant_memory.sqlite3'))
+        self.wallets = self.memory.wallets
+        # Wallets saved in the state file by earlier versions move to the store
+        if self.state.get("wallets"):
+            self.wallets.extend(self.state.pop("wallets"))
+            self.save_state()
+        # Full tool payloads stay local, the model only gets a compact projection
+        self.tool_results = self.memory.tool_results
+        # Token and cost metering, budgets come from AGENT_*_BUDGET_* in .env
+        self.usage = usage_meter_from_env(default_soft_usd=0.50, default_hard_usd=1.00)
+        # Balances and pending transactions refreshed while a run is in progress, AGENT_PREFETCH=0 disables this
+        self.prefetcher = get_prefetcher(self.api_key)
         self.chain_explorers = {
             "base-sepolia": "https://sepolia.basescan.org",
             "ethereum-sepolia": "https://sepolia.etherscan.io",
@@ -44,15 +114,61 @@ class CryptoAssistantAgent:
         result = create_wallet(self.api_key, wallet_type, self.signer_address)
         
         if result.get("status") == "success":
-            self.wallets.append(result["wallet_data"])
+            self.wallets.add(result["wallet_data"])
             
         return result
 
-    def select_wallet(self):
+    def save_state(self):
+        save_state(self.state_path, self.state)
+
+    def memory_report(self):
+        """How much agent state is held in memory and how much was spilled to the store"""
+        return self.memory.report(thread_truncation=thread_truncation_strategy())
+
+    def get_or_create_assistant(self):
+        """Reuse the assistant created for the same model, instructions and tools, or create it"""
+        tools = tools_schema()
+        fingerprint = assistant_fingerprint(ASSISTANT_MODEL, ASSISTANT_INSTRUCTIONS, tools)
+        assistants = self.state.setdefault("assistants", {})
+
+        assistant_id = assistants.get(fingerprint)
+        if assistant_id:
+            try:
+                return self.client.beta.assistants.retrieve(assistant_id).id
+            except NotFoundError:
+                print("Saved assistant no longer exists, creating a new one")
+
+        assistant = self.client.beta.assistants.create(
+            name=ASSISTANT_NAME,
+            instructions=ASSISTANT_INSTRUCTIONS,
+            tools=tools,
+            model=ASSISTANT_MODEL,
+            metadata={"fingerprint": fingerprint}
+        )
+        assistants[fingerprint] = assistant.id
+        self.save_state()
+        return assistant.id
+
+    def get_or_create_thread(self, new: bool = False):
+        """Resume the saved thread (without a lookup) unless a new one is requested"""
+        if new or not self.state.get("thread_id"):
+            self.state["thread_id"] = self.client.beta.threads.create().id
+            self.state["last_message_id"] = None
+            self.save_state()
+        return self.state["thread_id"]
+
+    def select_wallet(self, wallet_address: str = None):
         """Prompt user to select a wallet from their available wallets"""
         if not self.wallets:
             print("No wallets available. Please create a wallet first.")
             return None
+
+        # A wallet named in the tool call arguments skips the prompt
+        if wallet_address:
+            if self.wallets.get(wallet_address):
+                return wallet_address
+            print(f"Wallet {wallet_address} is not in tracked wallets.")
+            return None
         
         print("\nAvailable wallets:")
         for i, wallet in enumerate(self.wallets):
@@ -80,19 +196,59 @@ class CryptoAssistantAgent:
 
     def get_wallet_balance(self, wallet_address):
         """Agent method to get the balance of a wallet"""
-        wallet = next((w for w in self.wallets if w['address'] == wallet_address), None)
+        wallet = self.wallets.get(wallet_address)
         if not wallet:
             return {"status": "error", "message": "Wallet not found in tracked wallets"}
             
         chain = "base-sepolia" if wallet['type'] == "evm-smart-wallet" else "solana-devnet"
         explorer_url = self.get_explorer_url(wallet_address, chain)
         
-        return {
+        result = {
             "status": "success",
             "message": f"View wallet balance and transactions at: {explorer_url}",
             "explorer_url": explorer_url
         }
 
+        # Answered from the balance prefetched during the run when it is still fresh
+        if self.prefetcher:
+            balance = self.prefetcher.balance(wallet_address, chain)
+            if balance.get("status") == "success":
+                result["balance"] = balance["balance"]
+                result["message"] = f"Balance: {balance['balance']} USDC. {result['message']}"
+            pending = [self.prefetcher.transaction_status(tx_id) or {"transaction_data": {"id": tx_id}}
+                       for tx_id in self.prefetcher.pending_transactions(wallet_address)]
+            if pending:
+                result["pending_transactions"] = [
+                    {"id": tx["transaction_data"].get("id"), "status": tx["transaction_data"].get("status", "unknown")}
+                    for tx in pending
+                ]
+
+        return result
+
+    def after_transaction(self, wallets: list, sender: str, transaction_id: str, wait_result: dict):
+        """Drop prefetched balances the transaction changed, and keep refreshing it if it isn't final yet"""
+        if not self.prefetcher:
+            return
+        for wallet_address in wallets:
+            self.prefetcher.invalidate(wallet_address)
+        if wait_result.get("status") != "success" and transaction_id:
+            self.prefetcher.track_transaction(sender, transaction_id)
+
+    def prefetch(self, user_input: str):
+        """Start refreshing the wallets mentioned in the input, then the most recently used ones"""
+        if not self.prefetcher:
+            return
+        candidates = []
+        for address in re.findall(ADDRESS, user_input) + [w["address"] for w in reversed(list(self.wallets))]:
+            wallet = self.wallets.get(address)
+            if wallet and wallet["address"] not in [c[0] for c in candidates]:
+                chain = "base-sepolia" if wallet['type'] == "evm-smart-wallet" else "solana-devnet"
+                candidates.append((wallet["address"], chain))
+            if len(candidates) >= self.prefetcher.max_wallets:
+                break
+        with profiling.span("prefetch wallet state", "other", wallets=len(candidates)):
+            self.prefetcher.prefetch(candidates)
+
     def create_transaction(self, wallet_address):
         """Create and process a transaction for the specified wallet"""
         try:
@@ -119,17 +275,19 @@ class CryptoAssistantAgent:
                 wallet_address, 
                 transaction_id, 
                 signer_id, 
-                signature
+                signature,
+                user_op_hash=user_op_hash
             )
             
             if submit_response.get("status") != "success":
-                return {"status": "error", "message": "Signature submission failed"}
+                return {"status": "error", "message": "Signature submission failed", "error": submit_response.get("error")}
                 
             # Step 4: Verify transaction
             print("Verifying transaction...")
-            time.sleep(10)  # Allow transaction to process
-            
-            transaction_status = get_transaction(self.api_key, wallet_address, transaction_id)
+            # Returns once the transaction succeeded or failed, from a status webhook or by polling
+            transaction_status = get_transaction_waiter(self.api_key).wait(
+                wallet_address, transaction_id)
+            self.after_transaction([wallet_address], wallet_address, transaction_id, transaction_status)
             
             return {
                 "status": "success",
@@ -145,11 +303,12 @@ class CryptoAssistantAgent:
 
     def get_usdc_tokens(self, wallet_address: str, amount: int):
         """Get USDC tokens from faucet for a wallet"""
-        result = get_usdc_from_faucet(self.api_key, "base-sepolia", wallet_address, amount)
+        # The shared scheduler spaces out faucet calls and waits until the funds show up
+        print(f"Waiting for faucet transaction to process...")
+        scheduler = get_faucet_scheduler(self.api_key, "base-sepolia")
+        result = scheduler.wait(scheduler.request(wallet_address, amount))
         
         if result.get("status") == "success":
-            print(f"Waiting for faucet transaction to process...")
-            time.sleep(5)
             
             # Provide explorer link instead of balance
             explorer_url = self.get_explorer_url(wallet_address)
@@ -178,9 +337,18 @@ class CryptoAssistantAgent:
 
             transaction_data = transaction_response.get("transaction_data", {})
             
-            # Wait for transaction to process
+            # Wait for the transaction to succeed or fail instead of a fixed sleep
             print("Waiting for transaction to process...")
-            time.sleep(15)  # Increased wait time
+            final_status = get_transaction_waiter(self.api_key).wait(from_wallet, transaction_data.get("id"))
+            self.after_transaction([from_wallet, to_wallet], from_wallet, transaction_data.get("id"), final_status)
+            if final_status.get("status") == "success":
+                transaction_data = final_status["transaction_data"]
+                if transaction_data.get("status") == "failed":
+                    return {
+                        "status": "error",
+                        "message": "USDC transfer failed on chain",
+                        "data": {"transaction_data": transaction_data}
+                    }
             
             # Get the explorer URLs
             from_explorer = self.get_explorer_url(from_wallet)
@@ -191,6 +359,7 @@ class CryptoAssistantAgent:
                 "message": "USDC transfer completed",
                 "data": {
                     "transaction_data": transaction_data,
+                    "amount": amount,
                     "from_wallet_explorer": from_explorer,
                     "to_wallet_explorer": to_explorer
                 }
@@ -202,125 +371,355 @@ class CryptoAssistantAgent:
                 "message": f"Transfer failed: {str(e)}"
             }
 
+    def handle_tool_calls(self, tool_calls):
+        """Run the tool calls of a run that requires action and build its tool outputs"""
+        tool_outputs = []
+
+        for tool_call in tool_calls:
+            # A user is waiting on these calls, send them ahead of bulk traffic
+            with profiling.span(f"tool {tool_call.function.name}", "tool"), request_priority("interactive"):
+                with profiling.span("parse tool arguments", "json"):
+                    args = json.loads(tool_call.function.arguments)
+                result = None
+
+                # Handle different tool calls
+                if tool_call.function.name == "create_new_wallet":
+                    result = self.create_new_wallet(args["wallet_type"])
+                    if result.get("status") == "success":
+                        print(f"\nWallet Created Successfully!")
+
+                elif tool_call.function.name == "get_wallet_balance":
+                    result = self.get_wallet_balance(args["wallet_address"])
+                    if result.get("status") == "success":
+                        print(f"\n{result.get('message')}")
+
+                elif tool_call.function.name == "create_transaction":
+                    wallet_address = self.select_wallet(args.get("wallet_address"))
+                    if wallet_address:
+                        result = self.create_transaction(wallet_address)
+                        if result.get("status") == "success":
+                            print("\nTransaction Completed Successfully!")
+                        else:
+                            print(f"\nTransaction Failed: {result.get('message', 'Unknown error')}")
+
+                elif tool_call.function.name == "get_usdc_from_faucet":
+                    result = self.get_usdc_tokens(args["wallet_address"], args["amount"])
+                    if result.get("status") == "success":
+                        print("\nUSDC tokens requested successfully!")
+                    else:
+                        print(f"\nFailed to get USDC tokens: {result.get('message', 'Unknown error')}")
+
+                elif tool_call.function.name == "transfer_usdc":
+                    result = self.transfer_usdc_tokens(
+                        args["from_wallet_address"],
+                        args["to_wallet_address"],
+                        args["amount"]
+                    )
+                    if result.get("status") == "success":
+                        print("\nUSDC transfer completed successfully!")
+                        print(f"\nView source wallet at: {result['data']['from_wallet_explorer']}")
+                        print(f"View destination wallet at: {result['data']['to_wallet_explorer']}")
+                    else:
+                        print(f"\nUSDC transfer failed: {result.get('message', 'Unknown error')}")
+
+            self.tool_results.append({"tool": tool_call.function.name, "result": result})
+            with profiling.span("compact tool output", "json"):
+                tool_outputs.append({
+                    "tool_call_id": tool_call.id,
+                    "output": compact_tool_output(tool_call.function.name, result)
+                })
+
+        return tool_outputs
+
+
+def message_text(message) -> str:
+    """Join every content part of a message (text, images, refusals) into one string"""
+    parts = []
+    for part in message.content:
+        if part.type == "text":
+            parts.append(part.text.value)
+        elif part.type == "image_file":
+            parts.append(f"[image file: {part.image_file.file_id}]")
+        elif part.type == "image_url":
+            parts.append(f"[image: {part.image_url.url}]")
+        elif part.type == "refusal":
+            parts.append(part.refusal)
+    return "\n".join(parts)
+
+
+def fetch_new_messages(agent, thread_id, page_size=10):
+    """
+    Fetch only the messages added after the last one we've seen, oldest first
+
+    Pages forward from the saved cursor with a small page size, so the cost
+    doesn't grow with the length of the thread.
+    """
+    cursor = agent.state.get("last_message_id")
+    new_messages = []
+
+    while True:
+        params = {"thread_id": thread_id, "order": "asc", "limit": page_size}
+        if cursor:
+            params["after"] = cursor
+        page = agent.client.beta.threads.messages.list(**params)
+        new_messages.extend(page.data)
+        if page.data:
+            cursor = page.data[-1].id
+        if not page.has_more:
+            break
+
+    if cursor != agent.state.get("last_message_id"):
+        agent.state["last_message_id"] = cursor
+        agent.save_state()
+    return new_messages
+
+
+def print_assistant_reply(agent, thread_id):
+    """Display the assistant messages added since the last user message"""
+    for message in fetch_new_messages(agent, thread_id):
+        if message.role == "assistant":
+            print(f"\nAI Assistant: {message_text(message)}")
+
+
+def stream_run(agent, thread_id, assistant_id, state=None):
+    """
+    Drive a run with the streaming runs API
+
+    Events arrive as soon as the run changes state, so tool calls are handled
+    the moment the run requires action instead of on the next poll.
+
+    Args:
+        state (dict): Updated with the latest "run" and the "tool_outputs" being
+            submitted (run id, tool call ids, outputs) until the submit goes
+            through, so a caller can resume the same run by polling if the
+            stream breaks without executing tools twice
+
+    Returns:
+        Run: The run in its terminal state
+    """
+    state = state if state is not None else {}
+
+    def consume(stream):
+        for event in stream:
+            if event.event.startswith("thread.run."):
+                state["run"] = event.data
+        return stream.current_run
+
+    with agent.client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        truncation_strategy=thread_truncation_strategy()
+    ) as stream:
+        run = consume(stream)
+
+    while run.status == 'requires_action':
+        tool_outputs = agent.handle_tool_calls(
+            run.required_action.submit_tool_outputs.tool_calls)
+        tool_call_ids = {call.id for call in run.required_action.submit_tool_outputs.tool_calls}
+        state["tool_outputs"] = (run.id, tool_call_ids, tool_outputs)
+        with agent.client.beta.threads.runs.submit_tool_outputs_stream(
+            thread_id=thread_id,
+            run_id=run.id,
+            tool_outputs=tool_outputs
+        ) as stream:
+            # The run accepted the outputs, a later required action asks for other tool calls
+            state.pop("tool_outputs", None)
+            run = consume(stream)
+
+    return run
+
+
+def active_run(agent, thread_id):
+    """The thread's run that hasn't finished yet, or None (a thread has at most one)"""
+    runs = agent.client.beta.threads.runs.list(thread_id=thread_id, limit=1, order="desc")
+    for run in runs.data:
+        if run.status in ACTIVE_RUN_STATUSES:
+            return run
+    return None
+
+
+def poll_run(agent, thread_id, run, min_interval=0.1, max_interval=2.0, backoff=1.5):
+    """
+    Drive a run by polling runs.retrieve with adaptive backoff
+
+    The interval starts at min_interval and grows by backoff while the run
+    stays in the same state, resetting whenever the status changes.
+
+    Returns:
+        Run: The run in its terminal state
+    """
+    interval = min_interval
+    last_status = run.status
+
+    while True:
+        if run.status == 'requires_action':
+            tool_outputs = agent.handle_tool_calls(
+                run.required_action.submit_tool_outputs.tool_calls)
+            run = agent.client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs
+            )
+            interval = min_interval
+
+        elif run.status in ['completed', 'failed', 'expired', 'cancelled', 'incomplete']:
+            return run
+
+        else:
+            time.sleep(interval)
+            run = agent.client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id
+            )
+            if run.status == last_status:
+                interval = min(interval * backoff, max_interval)
+            else:
+                interval = min_interval
+
+        last_status = run.status
+
+
+def process_run(agent, thread_id, assistant_id, mode=None):
+    """
+    Run the assistant on the thread and display its reply
+
+    Streams by default and falls back to adaptive polling when streaming is
+    unavailable or the stream breaks (AGENT_RUN_MODE=poll forces polling).
+
+    Returns:
+        Run: The run in its terminal state
+    """
+    mode = mode or os.getenv('AGENT_RUN_MODE', 'stream')
+    # Time spent in the run outside of tool calls is the model working
+    with profiling.span("assistant run", "llm", mode=mode):
+        run = _drive_run(agent, thread_id, assistant_id, mode)
+
+    if run.status == 'completed':
+        print_assistant_reply(agent, thread_id)
+    else:
+        print(f"Run failed with status: {run.status}")
+    return run
+
+
+def _drive_run(agent, thread_id, assistant_id, mode):
+    run_started = time.perf_counter()
+    run = None
+
+    if mode == 'stream':
+        state = {}
+        try:
+            run = stream_run(agent, thread_id, assistant_id, state)
+        # Only failures of the stream itself, errors raised by tool calls are not retried by polling
+        except (APIError, httpx.HTTPError) as e:
+            print(f"Streaming unavailable ({e}), falling back to polling")
+            run = state.get("run")
+            if run is not None:
+                run = agent.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+                # Submit outputs of tools that already ran instead of running them again,
+                # if the run still asks for exactly those tool calls (poll_run runs any others)
+                run_id, tool_call_ids, tool_outputs = state.get("tool_outputs", (None, None, None))
+                if (run.status == 'requires_action' and run_id == run.id and tool_call_ids ==
+                        {call.id for call in run.required_action.submit_tool_outputs.tool_calls}):
+                    run = agent.client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=thread_id,
+                        run_id=run.id,
+                        tool_outputs=tool_outputs
+                    )
+
+    if run is None:
+        # The stream may have started a run before it broke without a single event, and a thread
+        # can't have two active runs: resume that one instead of creating another
+        run = active_run(agent, thread_id) or agent.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            truncation_strategy=thread_truncation_strategy()
+        )
+    run = poll_run(agent, thread_id, run)
+
+    agent.usage.record_run(run, time.perf_counter() - run_started)
+    return run
+
+
 def main():
+    # AGENT_PROFILE=1 (or a trace file path) records a span profile of each turn
+    profiling.enable_from_env()
     try:
         agent = CryptoAssistantAgent()
+        # Connect to the Crossmint API while the assistant and thread are set up
+        prewarm_in_background()
+        # Transaction status callbacks, when CROSSMINT_WEBHOOK_SECRET is set
+        start_webhook_receiver()
         print("Welcome to the AI Assistant! (Type 'exit' or 'q' to quit)")
 
-        # Create an assistant
-        assistant = agent.client.beta.assistants.create(
-            name="Web3 Assistant",
-            instructions="""You are a super helpful AI web3 assistant that can perform actions on the blockchain using Crossmint's API.
-            You can create new wallets, check balances, deposit tokens, transfer tokens between wallets, and more.""",
-            tools=tools_schema(),
-            model="gpt-4-turbo-preview"
-        )
+        # Reuse the assistant and resume the last thread from a previous run
+        assistant_id = agent.get_or_create_assistant()
+        thread_id = agent.get_or_create_thread()
+        if agent.wallets:
+            print(f"Resumed session with {agent.wallets.count()} tracked wallet(s). Type 'new' to start a new thread.")
 
-        # Create a thread for the conversation
-        thread = agent.client.beta.threads.create()
+        metrics_port = os.getenv('AGENT_METRICS_PORT')
+        if metrics_port:
+            start_metrics_server(int(metrics_port))
+            print(f"Metrics available at http://127.0.0.1:{metrics_port}/metrics")
 
         while True:
             user_input = input("\nAsk anything -> ").strip()
                 
             if user_input.lower() in ['exit', 'q']:
                 farewell = random.choice(["Goodbye!", "See ya!", "Take care!"])
+                print(f"Usage: {json.dumps(agent.usage.snapshot()['session'])}")
+                if agent.prefetcher:
+                    print(f"Prefetch: {json.dumps(agent.prefetcher.stats())}")
                 print(farewell)
                 break
 
-            # Create message in thread
-            message = agent.client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=user_input
-            )
+            if user_input.lower() == 'new':
+                thread_id = agent.get_or_create_thread(new=True)
+                print("Started a new conversation thread.")
+                continue
 
-            # Create and process run
-            run = agent.client.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=assistant.id,
-            )
+            if user_input.lower() == 'results':
+                for entry in agent.tool_results.recent():
+                    print(f"\n{entry['tool']}: {json.dumps(entry['result'], indent=2)}")
+                continue
+
+            if user_input.lower() == 'memory':
+                print(json.dumps(agent.memory_report(), indent=2))
+                continue
 
-            while True:
-                run = agent.client.beta.threads.runs.retrieve(
-                    thread_id=thread.id,
-                    run_id=run.id
+            if user_input.lower() == 'usage':
+                print(json.dumps(agent.usage.snapshot(), indent=2))
+                if agent.prefetcher:
+                    print(f"Prefetch: {json.dumps(agent.prefetcher.stats())}")
+                continue
+
+            # Raises BudgetExceededError once a hard limit is reached
+            warning = agent.usage.check_budget()
+            if warning:
+                print(f"\n{warning}")
+
+            # Create message in thread, starting a new one if the saved thread is gone
+            try:
+                message = agent.client.beta.threads.messages.create(
+                    thread_id=thread_id,
+                    role="user",
+                    content=user_input
                 )
-                
-                if run.status == 'completed':
-                    messages = agent.client.beta.threads.messages.list(
-                        thread_id=thread.id
-                    )
-                    # Display latest assistant message
-                    latest_message = next(msg for msg in messages.data 
-                                       if msg.role == "assistant")
-                    print(f"\nAI Assistant: {latest_message.content[0].text.value}")
-                    break
-                    
-                elif run.status == 'requires_action':
-                    tool_calls = run.required_action.submit_tool_outputs.tool_calls
-                    tool_outputs = []
-                    
-                    for tool_call in tool_calls:
-                        args = json.loads(tool_call.function.arguments)
-                        result = None
-                        
-                        # Handle different tool calls
-                        if tool_call.function.name == "create_new_wallet":
-                            result = agent.create_new_wallet(args["wallet_type"])
-                            if result.get("status") == "success":
-                                print(f"\nWallet Created Successfully!")
-                            
-                        elif tool_call.function.name == "get_wallet_balance":
-                            result = agent.get_wallet_balance(args["wallet_address"])
-                            if result.get("status") == "success":
-                                print(f"\n{result.get('message')}")
-                                
-                        elif tool_call.function.name == "create_transaction":
-                            wallet_address = agent.select_wallet()
-                            if wallet_address:
-                                result = agent.create_transaction(wallet_address)
-                                if result.get("status") == "success":
-                                    print("\nTransaction Completed Successfully!")
-                                else:
-                                    print(f"\nTransaction Failed: {result.get('message', 'Unknown error')}")
-
-                        elif tool_call.function.name == "get_usdc_from_faucet":
-                            result = agent.get_usdc_tokens(args["wallet_address"], args["amount"])
-                            if result.get("status") == "success":
-                                print("\nUSDC tokens requested successfully!")
-                            else:
-                                print(f"\nFailed to get USDC tokens: {result.get('message', 'Unknown error')}")
-
-                        elif tool_call.function.name == "transfer_usdc":
-                            result = agent.transfer_usdc_tokens(
-                                args["from_wallet_address"],
-                                args["to_wallet_address"],
-                                args["amount"]
-                            )
-                            if result.get("status") == "success":
-                                print("\nUSDC transfer completed successfully!")
-                                print(f"\nView source wallet at: {result['data']['from_wallet_explorer']}")
-                                print(f"View destination wallet at: {result['data']['to_wallet_explorer']}")
-                            else:
-                                print(f"\nUSDC transfer failed: {result.get('message', 'Unknown error')}")
-
-                        tool_outputs.append({
-                            "tool_call_id": tool_call.id,
-                            "output": json.dumps(result)
-                        })
-                    
-                    # Submit tool outputs
-                    agent.client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=thread.id,
-                        run_id=run.id,
-                        tool_outputs=tool_outputs
-                    )
-                    
-                elif run.status in ['failed', 'expired']:
-                    print(f"Run failed with status: {run.status}")
-                    break
-                
-                time.sleep(1)
+            except NotFoundError:
+                thread_id = agent.get_or_create_thread(new=True)
+                message = agent.client.beta.threads.messages.create(
+                    thread_id=thread_id,
+                    role="user",
+                    content=user_input
+                )
+
+            # Only messages after this one need to be fetched for the reply
+            agent.state["last_message_id"] = message.id
+
+            # Create and process run, warming up wallet state in the background while the assistant thinks
+            with profiling.span("turn", "turn", prompt=user_input[:80]):
+                agent.prefetch(user_input)
+                process_run(agent, thread_id, assistant_id)
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
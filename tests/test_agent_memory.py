@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world"))
+
+from library.agent_memory import AgentStore, ToolResultLog, WalletRegistry
+from run import CryptoAIAgent
+
+ENV = {
+    "OPENAI_API_KEY": "x",
+    "CROSSMINT_SERVER_API_KEY": "x",
+    "SIGNER_ADDRESS": "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23",
+    "SIGNER_PRIVATE_KEY": "0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318",
+    "AGENT_MAX_RESIDENT_TOOL_RESULTS": "1",
+}
+
+
+def wallet(index):
+    return {"address": f"0x{index:040x}", "type": "evm-smart-wallet", "config": {"adminSigner": {"address": "0xA"}}}
+
+
+class AgentMemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.store = AgentStore(max_tool_results=5)
+        self.addCleanup(self.store.close)
+
+    def test_evicted_wallets_are_reloaded_by_address(self):
+        wallets = WalletRegistry(self.store, max_resident=2)
+        wallets.extend(wallet(index) for index in range(4))
+
+        self.assertEqual((len(wallets), wallets.count()), (2, 4))
+        self.assertEqual([w["address"] for w in wallets], [wallet(2)["address"], wallet(3)["address"]])
+        self.assertEqual(wallets.get(wallet(0)["address"])["type"], "evm-smart-wallet")
+        self.assertEqual(wallets.reloads, 1)
+        self.assertNotIn("config", wallets[-1])
+        self.assertEqual(wallets.payload(wallet(0)["address"])["config"], wallet(0)["config"])
+
+        # Re-adding a tracked wallet doesn't count it twice
+        wallets.add(wallet(1))
+        self.assertEqual(wallets.count(), 4)
+
+    def test_tool_results_beyond_the_window_come_from_the_store(self):
+        log = ToolResultLog(self.store, max_resident=2)
+        for index in range(7):
+            log.append({"tool": "get_wallet_balance", "result": {"balance": index}})
+
+        self.assertEqual([entry["result"]["balance"] for entry in log], [5, 6])
+        self.assertEqual([entry["result"]["balance"] for entry in log.recent(4)], [3, 4, 5, 6])
+        # Only max_tool_results are kept on disk
+        self.assertEqual(log.count(), 5)
+
+    def test_namespaces_share_a_file_without_mixing_rows(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "memory.sqlite3")
+        first, second = AgentStore(path, "first"), AgentStore(path, "second")
+        self.addCleanup(first.close)
+        self.addCleanup(second.close)
+
+        WalletRegistry(first).add(wallet(1))
+        self.assertEqual(second.wallet_count(), 0)
+        # A new store on the file picks up the namespace's wallets
+        reopened = AgentStore(path, "first")
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(WalletRegistry(reopened)), 1)
+
+
+class CliAgentMemoryTest(unittest.TestCase):
+    def test_tool_calls_are_recorded_in_the_tool_result_log(self):
+        with mock.patch.dict(os.environ, ENV):
+            agent = CryptoAIAgent(interactive=False)
+        self.addCleanup(agent.memory.close)
+
+        for _ in range(2):
+            agent.execute_tool_call("unknown_tool", {})
+
+        tool_results = agent.memory.tool_results
+        self.assertEqual((len(tool_results), tool_results.count()), (1, 2))
+        self.assertEqual(tool_results.recent(1)[0]["result"]["status"], "error")
+        self.assertEqual(agent.memory_report()["tool_results"]["stored"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+# Loaded under its own name, the CLI agent's run.py is imported as "run" by other tests
+_spec = importlib.util.spec_from_file_location(
+    "assistant_run", Path(__file__).parent.parent / "src" / "openai_assistant-hello-world" / "run.py")
+assistant_run = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(assistant_run)
+
+
+def requires_action(*call_ids):
+    tool_calls = [SimpleNamespace(id=call_id) for call_id in call_ids]
+    return SimpleNamespace(id="run_1", status="requires_action",
+                           required_action=SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=tool_calls)))
+
+
+COMPLETED = SimpleNamespace(id="run_1", status="completed", required_action=None)
+
+
+class FakeStream:
+    """Yields the events of one run update, then breaks if told to"""
+
+    def __init__(self, run, fail_on_enter=False, break_after_events=False):
+        self.current_run = run
+        self.fail_on_enter = fail_on_enter
+        self.break_after_events = break_after_events
+
+    def __enter__(self):
+        if self.fail_on_enter:
+            raise httpx.ConnectError("connection reset")
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        yield SimpleNamespace(event=f"thread.run.{self.current_run.status}", data=self.current_run)
+        if self.break_after_events:
+            raise httpx.ReadError("stream broke")
+
+
+class FakeRuns:
+    def __init__(self, streams, server_run):
+        self.streams = list(streams)
+        self.server_run = server_run
+        self.submitted = []
+
+    def stream(self, **kwargs):
+        return self.streams.pop(0)
+
+    def submit_tool_outputs_stream(self, **kwargs):
+        return self.streams.pop(0)
+
+    def retrieve(self, thread_id, run_id):
+        return self.server_run
+
+    def submit_tool_outputs(self, thread_id, run_id, tool_outputs):
+        self.submitted.append([output["tool_call_id"] for output in tool_outputs])
+        return COMPLETED
+
+
+class DriveRunTest(unittest.TestCase):
+    def drive(self, runs):
+        handled = []
+
+        def handle_tool_calls(tool_calls):
+            handled.append([call.id for call in tool_calls])
+            return [{"tool_call_id": call.id, "output": "{}"} for call in tool_calls]
+
+        agent = SimpleNamespace(
+            client=SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs))),
+            handle_tool_calls=handle_tool_calls,
+            usage=SimpleNamespace(record_run=lambda run, seconds: None)
+        )
+        run = assistant_run._drive_run(agent, "thread_1", "asst_1", "stream")
+        self.assertEqual(run.status, "completed")
+        return handled
+
+    def test_resubmits_outputs_when_the_submit_never_went_through(self):
+        runs = FakeRuns([FakeStream(requires_action("call_a")), FakeStream(None, fail_on_enter=True)],
+                        server_run=requires_action("call_a"))
+        self.assertEqual(self.drive(runs), [["call_a"]])
+        self.assertEqual(runs.submitted, [["call_a"]])
+
+    def test_runs_a_later_round_instead_of_resubmitting_the_previous_one(self):
+        # The first round's outputs were accepted, then the stream broke and the run asked for another tool call
+        runs = FakeRuns([FakeStream(requires_action("call_a")),
+                         FakeStream(SimpleNamespace(id="run_1", status="in_progress"), break_after_events=True)],
+                        server_run=requires_action("call_b"))
+        self.assertEqual(self.drive(runs), [["call_a"], ["call_b"]])
+        self.assertEqual(runs.submitted, [["call_b"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
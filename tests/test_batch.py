@@ -0,0 +1,54 @@
+import io
+import json
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world"))
+
+import batch
+
+ENV = {
+    "OPENAI_API_KEY": "x",
+    "CROSSMINT_SERVER_API_KEY": "x",
+    "SIGNER_ADDRESS": "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23",
+    "SIGNER_PRIVATE_KEY": "0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318",
+}
+
+LINES = [
+    '{"id": "s1", "prompt": "Create an evm wallet"}',
+    "",
+    '{"prompts": []',
+    '["not", "a", "session"]',
+    '{"prompts": []}',
+]
+
+
+class BatchTest(unittest.TestCase):
+    def test_malformed_lines_become_failed_sessions(self):
+        sessions = batch.read_sessions(io.StringIO("\n".join(LINES)))
+
+        self.assertEqual([session["id"] for session in sessions], ["s1", "line-3", "line-4", "line-5"])
+        self.assertEqual(sessions[0]["prompts"], ["Create an evm wallet"])
+        self.assertIn("line 3", sessions[1]["parse_error"])
+        self.assertIn("expected a JSON object", sessions[2]["parse_error"])
+        self.assertNotIn("parse_error", sessions[3])
+
+    def test_batch_reports_malformed_lines_and_runs_the_rest(self):
+        sessions = batch.read_sessions(io.StringIO("\n".join(LINES[2:])))
+        output = io.StringIO()
+        with mock.patch.dict(os.environ, ENV), mock.patch("sys.stdout", io.StringIO()):
+            summary = batch.run_batch(sessions, workers=2, output=output)
+
+        results = {result["id"]: result for result in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual((summary["sessions"], summary["succeeded"], summary["failed"]), (3, 1, 2))
+        self.assertEqual((results["line-1"]["status"], results["line-1"]["line"]), ("error", 1))
+        self.assertEqual(results["line-2"]["turns"], [])
+        self.assertEqual(results["line-3"]["status"], "success")
+
+
+if __name__ == "__main__":
+    unittest.main()
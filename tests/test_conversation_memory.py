@@ -0,0 +1,52 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.conversation_memory import ConversationMemory
+
+
+def tool_call_message(call_id, name):
+    return {"role": "assistant", "content": None, "tool_calls": [
+        {"id": call_id, "type": "function", "function": {"name": name, "arguments": "{}"}}]}
+
+
+class ConversationMemoryTest(unittest.TestCase):
+    def test_folds_oldest_turns_into_the_summary(self):
+        memory = ConversationMemory(max_tokens=300, max_summary_tokens=100)
+        for index in range(10):
+            memory.add_user_message(f"question {index} " + "x" * 100)
+            memory.add_assistant_message({"role": "assistant", "content": f"answer {index}"})
+
+        self.assertLessEqual(memory.token_count(), 300)
+        messages = memory.messages()
+        self.assertEqual(messages[0]["role"], "system")
+        # Only the latest summary lines fit the summary budget
+        self.assertIn("user asked: question", messages[0]["content"])
+        self.assertNotIn("question 0", messages[0]["content"])
+        self.assertEqual(messages[-1]["content"], "answer 9")
+
+    def test_keeps_tool_calls_with_their_results(self):
+        memory = ConversationMemory(max_tokens=150)
+        for index in range(5):
+            memory.add_user_message(f"balance {index}")
+            memory.add_assistant_message(tool_call_message(f"call_{index}", "get_wallet_balance"))
+            memory.add_tool_result(f"call_{index}", {"balance": index})
+
+        messages = [message for message in memory.messages() if message["role"] != "system"]
+        self.assertEqual(messages[0]["role"], "user")
+        call_ids = [call["id"] for message in messages for call in message.get("tool_calls", [])]
+        result_ids = [message["tool_call_id"] for message in messages if message["role"] == "tool"]
+        self.assertEqual(call_ids, result_ids)
+
+    def test_truncates_long_tool_output(self):
+        memory = ConversationMemory(max_tool_output_chars=50)
+        memory.add_user_message("hi")
+        memory.add_assistant_message(tool_call_message("call_1", "create_new_wallet"))
+        memory.add_tool_result("call_1", "y" * 500)
+        self.assertIn("[truncated 450 chars]", memory.messages()[-1]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
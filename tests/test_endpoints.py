@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world" / "flow"))
+
+from crossmint_stub import start_stub
+from library.endpoints import CrossmintEndpoints, create_session, endpoints_from_env
+
+
+class CrossmintEndpointsTest(unittest.TestCase):
+    def test_urls_for_an_environment(self):
+        endpoints = CrossmintEndpoints("production")
+        self.assertEqual(endpoints.approvals("0xabc", "tx1"),
+                         "https://www.crossmint.com/api/2022-06-09/wallets/0xabc/transactions/tx1/approvals")
+        self.assertEqual(endpoints.balances("0xabc"),
+                         "https://www.crossmint.com/api/v1-alpha2/wallets/0xabc/balances")
+        with self.assertRaises(ValueError):
+            CrossmintEndpoints("devnet")
+
+    def test_base_url_from_env_overrides_the_host(self):
+        with mock.patch.dict(os.environ, {"CROSSMINT_ENV": "devnet", "CROSSMINT_BASE_URL": "http://127.0.0.1:9/"}):
+            endpoints = endpoints_from_env()
+        self.assertEqual(endpoints.wallets(), "http://127.0.0.1:9/api/2022-06-09/wallets")
+
+
+class PooledSessionTest(unittest.TestCase):
+    def setUp(self):
+        server, self.stub, self.base_url = start_stub()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def test_threads_get_their_own_session_on_a_shared_pool(self):
+        pooled = create_session(pool_size=4)
+        self.addCleanup(pooled.adapter.close)
+        url = CrossmintEndpoints(base_url=self.base_url).wallets()
+        sessions, statuses = [], []
+
+        def call():
+            sessions.append(pooled.session())
+            statuses.append(pooled.request("POST", url, json={"type": "evm-smart-wallet", "config": {}}).status_code)
+
+        # One after the other, so the second thread can reuse the first one's connection
+        for _ in range(2):
+            thread = threading.Thread(target=call)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(statuses, [201, 201])
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertIs(sessions[0].get_adapter(url), sessions[1].get_adapter(url))
+        pools = pooled.adapter.poolmanager.pools
+        self.assertEqual([pools[key].num_connections for key in pools.keys()], [1])
+        self.assertIs(pooled.session(), pooled.session())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.faucet_scheduler import FaucetScheduler
+
+
+class FaucetSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.balances = {}
+        self.faucet_calls = []
+
+        def get_wallet_balance(api_key, chain, wallet_address):
+            return {"status": "success", "balance": self.balances.get(wallet_address, 0.0)}
+
+        def get_usdc_from_faucet(api_key, chain, wallet_address, amount):
+            self.faucet_calls.append((wallet_address, amount))
+            self.balances[wallet_address] = self.balances.get(wallet_address, 0.0) + amount
+            return {"status": "success"}
+
+        patches = [
+            mock.patch("library.faucet_scheduler.get_wallet_balance", side_effect=get_wallet_balance),
+            mock.patch("library.faucet_scheduler.get_usdc_from_faucet", side_effect=get_usdc_from_faucet),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.scheduler = FaucetScheduler("key", min_interval=0, poll_interval=0.01, confirm_timeout=1)
+        self.addCleanup(self.scheduler.shutdown)
+
+    def test_confirms_once_funds_arrive(self):
+        result = self.scheduler.wait(self.scheduler.request("0xA", 5), timeout=2)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["balance"], 5.0)
+
+    def test_merges_queued_requests_for_a_wallet(self):
+        # Hold the worker on the first request so the next two queue up together
+        with self.scheduler._cond:
+            futures = [self.scheduler.request("0xA", 1), self.scheduler.request("0xB", 1),
+                       self.scheduler.request("0xB", 2)]
+        results = [self.scheduler.wait(future, timeout=2) for future in futures]
+        self.assertTrue(all(result["status"] == "success" for result in results))
+        self.assertIn(("0xB", 3), self.faucet_calls)
+        self.assertEqual(self.scheduler.stats()["merged"], 1)
+
+    def test_exception_fails_the_request_and_keeps_the_worker(self):
+        with mock.patch("library.faucet_scheduler.get_wallet_balance", side_effect=RuntimeError("bad balance")):
+            result = self.scheduler.wait(self.scheduler.request("0xA", 5), timeout=2)
+        self.assertEqual(result["status"], "error")
+        self.assertIn("bad balance", result["error"])
+
+        result = self.scheduler.wait(self.scheduler.request("0xA", 5), timeout=2)
+        self.assertEqual(result["status"], "success")
+
+    def test_retries_a_failed_baseline_read_instead_of_assuming_zero(self):
+        self.balances["0xA"] = 10.0
+        reads = []
+
+        def flaky_balance(api_key, chain, wallet_address):
+            reads.append(wallet_address)
+            if len(reads) == 1:
+                return {"status": "error", "error": "timeout"}
+            return {"status": "success", "balance": self.balances[wallet_address]}
+
+        # The faucet accepts the call but the credit never lands: a balance already above
+        # the requested amount must not count as confirmation
+        with mock.patch("library.faucet_scheduler.get_wallet_balance", side_effect=flaky_balance), \
+                mock.patch("library.faucet_scheduler.get_usdc_from_faucet", return_value={"status": "success"}):
+            result = self.scheduler.wait(self.scheduler.request("0xA", 5), timeout=3)
+        self.assertEqual(result["status"], "error")
+        self.assertIn("did not show up", result["error"])
+
+    def test_fails_without_calling_the_faucet_when_the_balance_cannot_be_read(self):
+        with mock.patch("library.faucet_scheduler.get_wallet_balance", return_value={"status": "error"}):
+            result = self.scheduler.wait(self.scheduler.request("0xA", 5), timeout=2)
+        self.assertIn("Could not read the balance", result["error"])
+        self.assertEqual(self.faucet_calls, [])
+
+    def test_restarts_a_dead_worker(self):
+        self.scheduler.wait(self.scheduler.request("0xA", 1), timeout=2)
+        dead = mock.Mock(is_alive=mock.Mock(return_value=False))
+        self.scheduler._thread = dead
+        result = self.scheduler.wait(self.scheduler.request("0xA", 1), timeout=2)
+        self.assertEqual(result["status"], "success")
+        self.assertIsNot(self.scheduler._thread, dead)
+
+    def test_wait_times_out_with_an_error(self):
+        with mock.patch("library.faucet_scheduler.get_usdc_from_faucet", return_value={"status": "success"}):
+            result = self.scheduler.wait(self.scheduler.request("0xA", 5), timeout=0.1)
+        self.assertEqual(result["status"], "error")
+        self.assertIn("did not complete", result["error"])
+
+    def test_request_after_shutdown_fails_right_away(self):
+        self.scheduler.shutdown()
+        result = self.scheduler.wait(self.scheduler.request("0xA", 1), timeout=0.5)
+        self.assertEqual(result["error"], "Faucet scheduler was shut down")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.flow_dag import FlowCheckpoint, FlowExecutor, FlowStep
+
+
+def fail(outputs):
+    raise RuntimeError("step failed")
+
+
+class FlowExecutorTest(unittest.TestCase):
+    def test_runs_steps_after_their_deps(self):
+        steps = [
+            FlowStep("sum", lambda outputs: outputs["a"] + outputs["b"], ["a", "b"]),
+            FlowStep("a", lambda outputs: 1),
+            FlowStep("b", lambda outputs: 2),
+        ]
+        self.assertEqual(FlowExecutor(steps).run()["sum"], 3)
+
+    def test_skips_transitive_dependents_of_a_failed_step(self):
+        # Declared before their deps, so a single scan can't see that b is skipped when it reaches c
+        steps = [
+            FlowStep("c", lambda outputs: "c", ["b"]),
+            FlowStep("b", lambda outputs: "b", ["a"]),
+            FlowStep("a", fail),
+            FlowStep("other", lambda outputs: "other"),
+        ]
+        executor = FlowExecutor(steps)
+        with self.assertRaises(RuntimeError):
+            executor.run()
+        self.assertEqual(set(executor.skipped), {"b", "c"})
+        self.assertEqual(set(executor.errors), {"a"})
+        self.assertEqual(executor.outputs, {"other": "other"})
+
+    def test_rejects_cycles_and_unknown_deps(self):
+        with self.assertRaises(ValueError):
+            FlowExecutor([FlowStep("a", fail, ["b"]), FlowStep("b", fail, ["a"])])
+        with self.assertRaises(ValueError):
+            FlowExecutor([FlowStep("a", fail, ["missing"])])
+
+
+class FlowCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "state.json")
+
+    def test_resumes_only_checkpointed_steps(self):
+        calls = []
+
+        def steps(fail_read):
+            def create(outputs):
+                calls.append("create")
+                return "0xA"
+
+            def read(outputs):
+                calls.append("read")
+                if fail_read:
+                    raise RuntimeError("read failed")
+                return 1.0
+
+            return [FlowStep("create", create), FlowStep("read", read, ["create"], checkpoint=False),
+                    FlowStep("after", lambda outputs: outputs["read"], ["read"])]
+
+        with self.assertRaises(RuntimeError):
+            FlowExecutor(steps(fail_read=True), checkpoint=FlowCheckpoint(self.path, "flow")).run()
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["outputs"], {"create": "0xA"})
+
+        executor = FlowExecutor(steps(fail_read=False), checkpoint=FlowCheckpoint(self.path, "flow"))
+        self.assertEqual(executor.run()["after"], 1.0)
+        self.assertEqual(executor.resumed, ["create"])
+        self.assertEqual(calls, ["create", "read", "read"])
+
+    def test_failed_step_resets_the_steps_it_names(self):
+        sent = []
+
+        def send(outputs):
+            sent.append(len(sent))
+            return f"tx{len(sent)}"
+
+        def verify(fail):
+            def step(outputs):
+                if fail:
+                    raise RuntimeError(f"{outputs['send']} failed")
+                return outputs["send"]
+            return step
+
+        def steps(fail):
+            return [FlowStep("send", send), FlowStep("verify", verify(fail), ["send"], checkpoint=False, resets=["send"])]
+
+        with self.assertRaises(RuntimeError):
+            FlowExecutor(steps(fail=True), checkpoint=FlowCheckpoint(self.path, "flow")).run()
+        self.assertEqual(FlowCheckpoint(self.path, "flow").outputs, {})
+
+        self.assertEqual(FlowExecutor(steps(fail=False), checkpoint=FlowCheckpoint(self.path, "flow")).run()["verify"], "tx2")
+        self.assertEqual(len(sent), 2)
+
+    def test_unreadable_state_is_treated_as_empty(self):
+        for content in ['{"flow": "flow", "outp', '[1, 2]', '{"flow": "flow", "outputs": null}']:
+            with open(self.path, "w") as f:
+                f.write(content)
+            self.assertEqual(FlowCheckpoint(self.path, "flow").outputs, {})
+
+    def test_fresh_removes_the_state_file(self):
+        with open(self.path, "w") as f:
+            f.write("not json")
+        checkpoint = FlowCheckpoint(self.path, "flow", fresh=True)
+        self.assertEqual(checkpoint.outputs, {})
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_ignores_state_of_another_flow(self):
+        FlowCheckpoint(self.path, "other").save("create", "0xA")
+        self.assertEqual(FlowCheckpoint(self.path, "flow").outputs, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import gzip
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.http_replay import RecordingTransport, ReplayResponse, ReplayTransport
+
+BASE_URL = "https://staging.crossmint.com/api/2022-06-09/wallets"
+
+
+class HttpReplayTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "session.jsonl.gz")
+
+        statuses = iter(["pending", "success"])
+
+        def inner(method, url, headers=None, json=None, **kwargs):
+            if method == "GET":
+                return ReplayResponse(200, f'{{"status": "{next(statuses)}"}}')
+            return ReplayResponse(201, '{"address": "0xA"}')
+
+        # Create a wallet, then poll a transaction twice, 0.2s apart
+        recorder = RecordingTransport(self.path, inner)
+        headers = {"X-API-KEY": "secret-key"}
+        recorder("POST", BASE_URL, headers=headers, json={"type": "evm-smart-wallet"})
+        recorder("GET", f"{BASE_URL}/0xA/transactions/tx1", headers=headers)
+        time.sleep(0.2)
+        recorder("GET", f"{BASE_URL}/0xA/transactions/tx1", headers=headers)
+        recorder.close()
+
+    def replay_polls(self, speed):
+        replay = ReplayTransport(self.path, speed)
+        replay("POST", "http://127.0.0.1:8000/api/2022-06-09/wallets")
+        started = time.perf_counter()
+        statuses = [replay("GET", f"http://127.0.0.1:8000/api/2022-06-09/wallets/0xA/transactions/tx1").json()["status"]
+                    for _ in range(3)]
+        return statuses, time.perf_counter() - started, replay
+
+    def test_recording_has_no_request_headers(self):
+        with gzip.open(self.path, "rt") as f:
+            self.assertNotIn("secret-key", f.read())
+
+    def test_replays_in_order_and_repeats_the_last_response(self):
+        statuses, _, replay = self.replay_polls("fast")
+        self.assertEqual(statuses, ["pending", "success", "success"])
+        self.assertEqual((replay.served, replay.repeated, replay.remaining()), (3, 1, 0))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            replay("GET", "http://127.0.0.1:8000/api/v1-alpha2/wallets/0xA/balances")
+
+    def test_original_speed_keeps_the_recorded_timeline(self):
+        _, elapsed, _ = self.replay_polls("original")
+        self.assertGreaterEqual(elapsed, 0.18)
+
+        _, elapsed, _ = self.replay_polls("2")
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.18)
+
+        _, elapsed, _ = self.replay_polls("fast")
+        self.assertLess(elapsed, 0.05)
+
+    def test_rejects_unknown_speeds(self):
+        for speed in ["slow", "0", "-1"]:
+            with self.assertRaises(ValueError):
+                ReplayTransport(self.path, speed)
+
+
+if __name__ == "__main__":
+    unittest.main()
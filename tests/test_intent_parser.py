@@ -0,0 +1,43 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.intent_parser import IntentParser
+
+WALLET_A = "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23"
+WALLET_B = "0x1111111111111111111111111111111111111111"
+
+
+class IntentParserTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = IntentParser()
+
+    def test_parses_unambiguous_commands(self):
+        self.assertEqual(self.parser.parse("Please create a new EVM smart wallet."),
+                         ("create_new_wallet", {"wallet_type": "evm-smart-wallet"}))
+        self.assertEqual(self.parser.parse(f"what's the  balance of wallet {WALLET_A}?"),
+                         ("get_wallet_balance", {"wallet_address": WALLET_A}))
+        self.assertEqual(self.parser.parse(f"fund 5 USDC to {WALLET_A} from the faucet"),
+                         ("get_usdc_from_faucet", {"wallet_address": WALLET_A, "amount": 5}))
+        self.assertEqual(self.parser.parse(f"send 2 usdc from {WALLET_A} to wallet {WALLET_B}"),
+                         ("transfer_usdc", {"from_wallet_address": WALLET_A, "to_wallet_address": WALLET_B,
+                                            "amount": 2}))
+
+    def test_anything_else_falls_back_to_the_llm(self):
+        self.assertIsNone(self.parser.parse("create an evm wallet and then send it 5 USDC"))
+        self.assertIsNone(self.parser.parse(f"what's the balance of {WALLET_A} in euros"))
+        self.assertIsNone(self.parser.parse("hello"))
+
+    def test_stats(self):
+        self.parser.parse("create a solana wallet")
+        self.parser.parse("hello")
+        stats = self.parser.stats(avg_llm_latency=1.5)
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertEqual(stats["hits_by_tool"], {"create_new_wallet": 1})
+        self.assertEqual(stats["estimated_latency_saved_s"], 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.journal import JournalReader, OperationJournal
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_segment_rollover_keeps_records_aligned(self):
+        # Segments of two records fill up within the same millisecond
+        journal = OperationJournal(self.directory, segment_records=2)
+        for index in range(10):
+            journal.append("transfer", "success", 0.5, wallet="0xA", counterparty="0xB",
+                           transaction_id=f"tx{index}", amount=index)
+        journal.close()
+
+        reader = JournalReader(self.directory)
+        self.assertEqual(reader.stats()["segments"], 5)
+        records = list(reader.scan())
+        self.assertEqual([record["transaction_id"] for record in records], [f"tx{index}" for index in range(10)])
+        self.assertEqual([record["amount"] for record in records], list(range(10)))
+
+    def test_journals_sharing_a_directory_never_share_a_segment(self):
+        first = OperationJournal(self.directory)
+        second = OperationJournal(self.directory)
+        for journal, transaction_id in [(first, "tx1"), (second, "tx2"), (first, "tx3")]:
+            journal.append("get_transaction", "success", 0.1, wallet="0xA", transaction_id=transaction_id)
+        first.close()
+        # Reopening after close starts a new segment
+        first.append("get_transaction", "success", 0.1, wallet="0xA", transaction_id="tx4")
+        first.close()
+        second.close()
+
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+        ids = sorted(record["transaction_id"] for record in JournalReader(self.directory).scan())
+        self.assertEqual(ids, ["tx1", "tx2", "tx3", "tx4"])
+
+    def test_lookups_and_latency(self):
+        journal = OperationJournal(self.directory)
+        journal.append("transfer", "success", 0.2, wallet="0xAbC", counterparty="0xdef", transaction_id="tx1")
+        journal.append("get_balance", "error", 0.4, wallet="0xdef")
+        journal.append("get_balance", "success", 0.6, wallet="0x123")
+        journal.close()
+
+        reader = JournalReader(self.directory)
+        self.assertEqual([record["operation"] for record in reader.scan(wallet="0xDEF")], ["transfer", "get_balance"])
+        self.assertEqual([record["wallet"] for record in reader.scan(transaction_id="tx1")], ["0xabc"])
+        report = reader.latency("operation")
+        self.assertEqual(report["get_balance"]["count"], 2)
+        self.assertEqual(report["get_balance"]["errors"], 1)
+        self.assertEqual(report["transfer"]["p50_s"], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
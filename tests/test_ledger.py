@@ -0,0 +1,78 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world" / "flow"))
+
+from crossmint_stub import start_stub
+from library import wallet_utils
+from library.endpoints import CrossmintEndpoints
+from library.ledger import WalletLedger
+
+CHAIN = "base-sepolia"
+
+
+class WalletLedgerTest(unittest.TestCase):
+    def setUp(self):
+        server, self.stub, base_url = start_stub()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        previous = wallet_utils.get_endpoints()
+        self.addCleanup(wallet_utils.set_endpoints, previous)
+        wallet_utils.set_endpoints(CrossmintEndpoints(base_url=base_url))
+
+        self.ledger = WalletLedger().attach()
+        self.addCleanup(self.ledger.close)
+
+    def wallet(self):
+        _, wallet = self.stub.create_wallet({"type": "evm-smart-wallet", "config": {}})
+        return wallet["address"]
+
+    def test_records_faucet_credits_until_detached(self):
+        wallet = self.wallet()
+        self.assertEqual(wallet_utils.get_usdc_from_faucet("key", CHAIN, wallet, 3)["status"], "success")
+        self.assertEqual(self.ledger.expected_balance(wallet), 3 * 10**6)
+
+        self.ledger.detach()
+        wallet_utils.get_usdc_from_faucet("key", CHAIN, wallet, 2)
+        self.assertEqual(self.ledger.expected_balance(wallet), 3 * 10**6)
+
+    def test_reconcile_checks_dirty_wallets_and_keeps_mismatches_dirty(self):
+        funded, missing = self.wallet(), self.wallet()
+        wallet_utils.get_usdc_from_faucet("key", CHAIN, funded, 4)
+        # The ledger expects funds the wallet never got
+        self.ledger.record_event({"type": "transfer", "chain": CHAIN, "from_wallet_address": funded,
+                                  "to_wallet_address": missing, "amount": 10**6, "reference": "tx1"})
+        self.stub.balances[(funded.lower(), CHAIN)] -= 10**6
+
+        report = self.ledger.reconcile("key")
+        self.assertEqual(report["checked"], 2)
+        self.assertEqual([m["wallet_address"] for m in report["mismatches"]], [missing.lower()])
+        self.assertEqual(report["mismatches"][0]["difference"], -1.0)
+
+        report = self.ledger.reconcile("key")
+        self.assertEqual((report["checked"], report["skipped_clean"]), (1, 1))
+
+    def test_reads_wait_for_a_write_in_progress(self):
+        wallet = self.wallet()
+        self.ledger.record(wallet, CHAIN, 5, "faucet_credit")
+        reads = []
+        readers = [threading.Thread(target=lambda: reads.append(self.ledger.expected_balance(wallet))),
+                   threading.Thread(target=lambda: reads.append(self.ledger.dirty_wallets(CHAIN)))]
+
+        # Stands in for a record() between its statements and its commit
+        with self.ledger._lock:
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join(0.2)
+            self.assertEqual(reads, [])
+        for reader in readers:
+            reader.join(5)
+        self.assertEqual(len(reads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
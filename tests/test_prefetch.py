@@ -0,0 +1,77 @@
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world" / "flow"))
+
+from crossmint_stub import start_stub
+from library import wallet_utils
+from library.endpoints import CrossmintEndpoints
+from library.prefetch import WalletPrefetcher
+from library.request_scheduler import RequestScheduler
+
+CHAIN = "base-sepolia"
+
+
+class WalletPrefetcherTest(unittest.TestCase):
+    def setUp(self):
+        server, self.stub, base_url = start_stub()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        for getter, setter in [(wallet_utils.get_endpoints, wallet_utils.set_endpoints),
+                               (wallet_utils.get_scheduler, wallet_utils.set_scheduler)]:
+            self.addCleanup(setter, getter())
+        wallet_utils.set_endpoints(CrossmintEndpoints(base_url=base_url))
+        wallet_utils.set_scheduler(RequestScheduler())
+
+        _, wallet = self.stub.create_wallet({"type": "evm-smart-wallet", "config": {}})
+        self.wallet = wallet["address"]
+        self.stub.faucet(self.wallet, {"chain": CHAIN, "amount": 2})
+
+    def prefetcher(self, **options):
+        prefetcher = WalletPrefetcher("key", **options)
+        self.addCleanup(wallet_utils.remove_operation_listener, prefetcher._on_operation)
+        return prefetcher
+
+    def wait_for_prefetch(self, prefetcher, count=1):
+        deadline = time.monotonic() + 5
+        while prefetcher.stats()["prefetched"] < count:
+            self.assertLess(time.monotonic(), deadline, "prefetch never finished")
+            time.sleep(0.01)
+
+    def test_serves_prefetched_balances_until_the_wallet_changes(self):
+        prefetcher = self.prefetcher()
+        self.assertEqual(prefetcher.prefetch([(self.wallet, CHAIN)]), 1)
+        self.wait_for_prefetch(prefetcher)
+
+        result = prefetcher.balance(self.wallet, CHAIN)
+        self.assertTrue(result["cached"])
+        self.assertEqual(result["balance"], 2)
+        # Still fresh, so it isn't fetched again
+        self.assertEqual(prefetcher.prefetch([(self.wallet, CHAIN)]), 0)
+
+        wallet_utils.get_usdc_from_faucet("key", CHAIN, self.wallet, 3)
+        result = prefetcher.balance(self.wallet, CHAIN)
+        self.assertNotIn("cached", result)
+        self.assertEqual(result["balance"], 5)
+
+    def test_stays_out_of_the_way_of_real_requests(self):
+        scheduler = RequestScheduler(max_concurrency=1, interactive_reserve=0)
+        wallet_utils.set_scheduler(scheduler)
+        prefetcher = self.prefetcher(max_per_minute=1)
+
+        with scheduler.slot("interactive"):
+            self.assertEqual(prefetcher.prefetch([(self.wallet, CHAIN)]), 0)
+        self.assertEqual(prefetcher.stats()["skipped_busy"], 1)
+
+        self.assertEqual(prefetcher.prefetch([(self.wallet, CHAIN)]), 1)
+        self.wait_for_prefetch(prefetcher)
+        prefetcher.invalidate(self.wallet)
+        self.assertEqual(prefetcher.prefetch([(self.wallet, CHAIN)]), 0)
+        self.assertEqual(prefetcher.stats()["skipped_cap"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library import profiling
+from library.profiling import Profiler, http_span_name
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_self_time_excludes_child_spans(self):
+        with self.profiler.span("turn", "turn"):
+            time.sleep(0.02)
+            with self.profiler.span("POST /wallets", "http"):
+                time.sleep(0.05)
+
+        spans = {span["name"]: span for span in self.profiler.spans}
+        self.assertEqual(spans["POST /wallets"]["parent"], spans["turn"]["id"])
+        categories = self.profiler.breakdown()["categories"]
+        self.assertGreaterEqual(categories["http"], 0.05)
+        self.assertGreaterEqual(categories["turn"], 0.02)
+        self.assertLess(categories["turn"], 0.05)
+
+    def test_spans_on_another_thread_attach_to_the_parent(self):
+        with self.profiler.span("flow", "step"):
+            parent = self.profiler.current_span_id()
+
+            def work():
+                with self.profiler.attach(parent), self.profiler.span("step", "step"):
+                    pass
+
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        spans = {span["name"]: span for span in self.profiler.spans}
+        self.assertEqual(spans["step"]["parent"], spans["flow"]["id"])
+        self.assertNotEqual(spans["step"]["thread"], spans["flow"]["thread"])
+
+    def test_writes_chrome_trace_and_folded_stacks(self):
+        with self.profiler.span("turn", "turn", model="gpt-4o-mini"):
+            with self.profiler.span("tool a;b", "tool"):
+                time.sleep(0.01)
+
+        trace_path = os.path.join(self.directory, "trace.json")
+        self.profiler.write_trace(trace_path)
+        with open(trace_path) as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual([event["name"] for event in events], ["turn", "tool a;b"])
+        self.assertEqual(events[0]["args"], {"model": "gpt-4o-mini"})
+
+        folded_path = os.path.join(self.directory, "trace.folded")
+        self.profiler.write_trace(folded_path)
+        with open(folded_path) as f:
+            stacks = dict(line.rsplit(" ", 1) for line in f.read().splitlines())
+        self.assertEqual(set(stacks), {"turn", "turn;tool a,b"})
+        self.assertGreaterEqual(int(stacks["turn;tool a,b"]), 10_000)
+
+    def test_module_spans_are_no_ops_when_disabled(self):
+        self.assertIsNone(profiling.get_profiler())
+        with profiling.span("ignored"), profiling.attach(None):
+            self.assertIsNone(profiling.current_span_id())
+
+    def test_http_span_names_group_by_endpoint(self):
+        self.assertEqual(
+            http_span_name("GET", f"https://api.example.com/api/v1/wallets/0x{'ab' * 20}/balances?chain=base"),
+            "GET /api/v1/wallets/{id}/balances")
+        self.assertEqual(
+            http_span_name("POST", "https://api.example.com/tx/123e4567-e89b-12d3-a456-426614174000/approvals"),
+            "POST /tx/{id}/approvals")
+
+
+if __name__ == "__main__":
+    unittest.main()
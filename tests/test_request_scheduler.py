@@ -0,0 +1,87 @@
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.request_scheduler import RequestScheduler, current_priority, request_priority
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    def wait_until_waiting(self, scheduler, count):
+        deadline = time.monotonic() + 5
+        while sum(c["waiting"] for c in scheduler.stats()["classes"].values()) < count:
+            self.assertLess(time.monotonic(), deadline, "requests never queued")
+            time.sleep(0.01)
+
+    def test_admits_waiting_requests_in_priority_order(self):
+        scheduler = RequestScheduler(max_concurrency=1, interactive_reserve=0)
+        admitted = []
+        scheduler.acquire("normal")
+
+        def request(priority):
+            with scheduler.slot(priority):
+                admitted.append(priority)
+
+        threads = []
+        for count, priority in enumerate(["bulk", "normal", "interactive"], start=1):
+            thread = threading.Thread(target=request, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            # Queue them one by one so arrival order is the reverse of priority order
+            self.wait_until_waiting(scheduler, count)
+
+        scheduler.release()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(admitted, ["interactive", "normal", "bulk"])
+        self.assertEqual(scheduler.stats()["classes"]["bulk"]["queued"], 1)
+
+    def test_reserved_slots_are_only_for_interactive_requests(self):
+        scheduler = RequestScheduler(max_concurrency=4, interactive_reserve=0.25)
+        for _ in range(3):
+            scheduler.acquire("bulk")
+
+        self.assertFalse(scheduler.has_spare_capacity("bulk"))
+        self.assertTrue(scheduler.has_spare_capacity("interactive"))
+        scheduler.acquire("interactive")
+        self.assertEqual(scheduler.stats()["in_flight"], 4)
+        self.assertEqual(scheduler.stats()["classes"]["interactive"]["queued"], 0)
+
+    def test_rate_limit_spends_the_burst_then_waits_for_tokens(self):
+        scheduler = RequestScheduler(rate=10, burst=2, interactive_reserve=0)
+        started = time.monotonic()
+        for _ in range(2):
+            with scheduler.slot("normal"):
+                pass
+        self.assertLess(time.monotonic() - started, 0.05)
+
+        with scheduler.slot("normal"):
+            pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.08)
+
+    def test_throttle_holds_back_every_request(self):
+        scheduler = RequestScheduler()
+        scheduler.throttle(0.2)
+        self.assertFalse(scheduler.has_spare_capacity("interactive"))
+
+        started = time.monotonic()
+        with scheduler.slot("interactive"):
+            pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.18)
+        self.assertEqual(scheduler.stats()["throttled"], 1)
+
+    def test_request_priority_sets_the_default_class(self):
+        scheduler = RequestScheduler()
+        with request_priority("bulk"):
+            self.assertEqual(scheduler.acquire(), "bulk")
+        self.assertEqual(current_priority(), "normal")
+        with self.assertRaises(ValueError):
+            with request_priority("urgent"):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
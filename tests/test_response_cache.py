@@ -0,0 +1,69 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.response_cache import ResponseCache, make_cache_key
+
+SYSTEM = {"role": "system", "content": "Available wallets:\n0xA"}
+BALANCE_CALL = {
+    "role": "assistant",
+    "content": None,
+    "tool_calls": [{"id": "call_1", "type": "function",
+                    "function": {"name": "get_wallet_balance", "arguments": "{\"wallet_address\": \"0xA\"}"}}]
+}
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_earlier_turns_change_the_key(self):
+        # "yes" means something else in another conversation
+        first = make_cache_key("model", [SYSTEM, {"role": "user", "content": "send 5 USDC?"},
+                                         {"role": "assistant", "content": "Shall I?"}, {"role": "user", "content": "yes"}])
+        other = make_cache_key("model", [SYSTEM, {"role": "user", "content": "check my balance?"},
+                                         {"role": "assistant", "content": "Shall I?"}, {"role": "user", "content": "yes"}])
+        self.assertNotEqual(first, other)
+
+    def test_whitespace_does_not_change_the_key(self):
+        self.assertEqual(make_cache_key("model", [SYSTEM, {"role": "user", "content": "what is my balance"}]),
+                         make_cache_key("model", [SYSTEM, {"role": "user", "content": " what  is my\nbalance "}]))
+
+    def test_system_prompt_and_current_turn_change_the_key(self):
+        key = make_cache_key("model", [SYSTEM, {"role": "user", "content": "balance"}])
+        other_wallets = make_cache_key("model", [{"role": "system", "content": "No wallets created yet."},
+                                                 {"role": "user", "content": "balance"}])
+        other_question = make_cache_key("model", [SYSTEM, {"role": "user", "content": "transfer"}])
+        self.assertNotIn(key, {other_wallets, other_question})
+
+    def test_tool_call_ids_do_not_change_the_key(self):
+        def turn(call_id):
+            call = dict(BALANCE_CALL, tool_calls=[dict(BALANCE_CALL["tool_calls"][0], id=call_id)])
+            return [SYSTEM, {"role": "user", "content": "balance"}, call,
+                    {"role": "tool", "tool_call_id": call_id, "content": "{}"}]
+
+        self.assertEqual(make_cache_key("model", turn("call_1")), make_cache_key("model", turn("call_2")))
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_replay_gets_new_tool_call_ids(self):
+        cache = ResponseCache()
+        self.assertTrue(cache.put("key", BALANCE_CALL, 0.5))
+
+        first, second = cache.get("key"), cache.get("key")
+        ids = {first["tool_calls"][0]["id"], second["tool_calls"][0]["id"], "call_1"}
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(first["tool_calls"][0]["function"], BALANCE_CALL["tool_calls"][0]["function"])
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_skips_side_effects_and_expires(self):
+        cache = ResponseCache(ttl=-1)
+        transfer = dict(BALANCE_CALL, tool_calls=[{"id": "call_1", "type": "function",
+                                                   "function": {"name": "transfer_usdc", "arguments": "{}"}}])
+        self.assertFalse(cache.put("transfer", transfer, 0.5))
+        cache.put("key", {"role": "assistant", "content": "Hi!"}, 0.5)
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["skipped_side_effects"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
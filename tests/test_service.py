@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from aiohttp.test_utils import TestClient, TestServer
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world"))
+
+import service
+
+ENV = {
+    "OPENAI_API_KEY": "x",
+    "CROSSMINT_SERVER_API_KEY": "x",
+    "SIGNER_ADDRESS": "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23",
+    "SIGNER_PRIVATE_KEY": "0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318",
+}
+
+
+class ServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        store_path = os.path.join(tempfile.mkdtemp(), "agent.sqlite3")
+        patch = mock.patch.dict(os.environ, dict(ENV, AGENT_MEMORY_STORE_PATH=store_path))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    async def client(self, app):
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def test_sessions_share_the_workers_clients_and_store(self):
+        client = await self.client(service.create_app())
+        sessions = client.app["sessions"]
+        ids = [(await (await client.post("/sessions")).json())["session_id"] for _ in range(2)]
+
+        first, second = (sessions.get(session_id)["agent"] for session_id in ids)
+        self.assertIs(first.openai_client, second.openai_client)
+        self.assertIs(first.async_openai_client, second.async_openai_client)
+        self.assertIs(first.memory.store.db, second.memory.store.db)
+        self.assertEqual(first.memory.store.namespace, ids[0])
+
+    async def test_deleting_a_session_removes_its_stored_rows(self):
+        client = await self.client(service.create_app())
+        sessions = client.app["sessions"]
+        kept, deleted = [(await (await client.post("/sessions")).json())["session_id"] for _ in range(2)]
+        for session_id in (kept, deleted):
+            sessions.get(session_id)["agent"].memory.store.save_wallet({"address": "0xabc"}, {"address": "0xabc"})
+
+        response = await client.delete(f"/sessions/{deleted}")
+        self.assertEqual(response.status, 204)
+        self.assertEqual(sessions.store.view(deleted).wallet_count(), 0)
+        self.assertEqual(sessions.store.view(kept).wallet_count(), 1)
+        self.assertEqual((await client.get(f"/sessions/{deleted}")).status, 404)
+
+    async def test_delete_is_refused_while_a_turn_is_running(self):
+        client = await self.client(service.create_app())
+        session_id = (await (await client.post("/sessions")).json())["session_id"]
+
+        async with client.app["sessions"].get(session_id)["lock"]:
+            response = await client.delete(f"/sessions/{session_id}")
+            self.assertEqual(response.status, 409)
+        self.assertEqual((await client.delete(f"/sessions/{session_id}")).status, 204)
+
+    async def test_router_sends_every_request_of_a_session_to_its_worker(self):
+        workers = [await self.client(service.create_app()) for _ in range(2)]
+        worker_urls = [str(worker.make_url("")).rstrip("/") for worker in workers]
+        router = await self.client(service.create_router_app(worker_urls))
+
+        for _ in range(4):
+            session_id = (await (await router.post("/sessions")).json())["session_id"]
+            index = service.worker_for(session_id, len(workers))
+            self.assertIn(session_id, workers[index].app["sessions"].sessions)
+            self.assertNotIn(session_id, workers[1 - index].app["sessions"].sessions)
+
+            response = await router.get(f"/sessions/{session_id}")
+            self.assertEqual(response.status, 200)
+            self.assertEqual((await response.json())["session_id"], session_id)
+
+    async def test_a_router_assigned_id_is_used_once(self):
+        client = await self.client(service.create_app())
+        headers = {service.ROUTER_SESSION_HEADER: "abc"}
+        response = await client.post("/sessions", headers=headers)
+        self.assertEqual((await response.json())["session_id"], "abc")
+        self.assertEqual((await client.post("/sessions", headers=headers)).status, 409)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world" / "flow"))
+
+from crossmint_stub import start_stub
+from library import wallet_utils
+from library.endpoints import CrossmintEndpoints
+
+SIGNER = "0x2c7536E3605D9C16a7a3D7b1898e529396a65c23"
+PRIVATE_KEY = "0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318"
+OTHER_KEY = "0x" + "11" * 32
+
+
+class SignatureTest(unittest.TestCase):
+    def test_recovers_the_signer_of_a_user_operation_hash(self):
+        user_op_hash = "0x" + "ab" * 32
+        signature = wallet_utils.generate_signature(PRIVATE_KEY, user_op_hash)
+
+        self.assertEqual(wallet_utils.recover_signer(user_op_hash, signature), SIGNER)
+        self.assertTrue(wallet_utils.verify_signature(user_op_hash, signature, f"evm-keypair:{SIGNER.lower()}"))
+        self.assertFalse(wallet_utils.verify_signature("0x" + "cd" * 32, signature, SIGNER))
+        self.assertFalse(wallet_utils.verify_signature(
+            user_op_hash, wallet_utils.generate_signature(OTHER_KEY, user_op_hash), SIGNER))
+        self.assertFalse(wallet_utils.verify_signature(user_op_hash, "0x1234", SIGNER))
+
+
+class SubmitApprovalTest(unittest.TestCase):
+    def setUp(self):
+        server, self.stub, base_url = start_stub()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        for getter, setter in [(wallet_utils.get_endpoints, wallet_utils.set_endpoints),
+                               (wallet_utils.get_journal, wallet_utils.set_journal)]:
+            self.addCleanup(setter, getter())
+        wallet_utils.set_endpoints(CrossmintEndpoints(base_url=base_url))
+        wallet_utils.set_journal(None)
+
+        _, wallet = self.stub.create_wallet(
+            {"type": "evm-smart-wallet", "config": {"adminSigner": {"type": "evm-keypair", "address": SIGNER}}})
+        self.wallet = wallet["address"]
+        _, self.transaction = self.stub.create_transaction(self.wallet, {"params": {}})
+        self.user_op_hash = self.transaction["onChain"]["userOperationHash"]
+
+    def submit(self, private_key):
+        return wallet_utils.submit_transaction_approval(
+            "key", self.wallet, self.transaction["id"], f"evm-keypair:{SIGNER}",
+            wallet_utils.generate_signature(private_key, self.user_op_hash), self.user_op_hash)
+
+    def test_rejects_a_signature_from_another_key_without_calling_the_api(self):
+        result = self.submit(OTHER_KEY)
+
+        self.assertEqual(result["status"], "error")
+        self.assertTrue(result["signature_mismatch"])
+        self.assertEqual(self.stub.get_transaction(self.transaction["id"])[1]["status"], "awaiting-approval")
+
+    def test_submits_a_matching_signature(self):
+        result = self.submit(PRIVATE_KEY)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["transaction_data"]["status"], "pending")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.tool_output import compact_tool_output, project_tool_output
+
+TRANSFER_RESULT = {
+    "status": "success",
+    "message": "USDC transfer completed",
+    "data": {
+        "transaction_data": {"id": "tx1", "status": "success", "onChain": {"explorerLink": "https://example/tx1"},
+                             "params": {"calls": [{"data": "0x" + "ab" * 200}]}},
+        "amount": 5,
+        "from_wallet_explorer": "https://example/a",
+        "to_wallet_explorer": "https://example/b"
+    },
+    "timestamp": "2026-10-19T10:00:00"
+}
+
+
+class ToolOutputTest(unittest.TestCase):
+    def test_projects_the_fields_the_model_needs(self):
+        projected = project_tool_output("transfer_usdc", TRANSFER_RESULT)
+        self.assertEqual(projected["amount"], 5)
+        self.assertEqual(projected["transaction_id"], "tx1")
+        self.assertEqual(projected["explorer_url"], "https://example/tx1")
+        self.assertNotIn("params", json.dumps(projected))
+
+    def test_unknown_tools_keep_top_level_scalars(self):
+        self.assertEqual(project_tool_output("other", {"status": "ok", "nested": {"a": 1}, "timestamp": "t"}),
+                         {"status": "ok"})
+        self.assertEqual(project_tool_output("other", "plain"), {"result": "plain"})
+
+    def test_oversized_output_stays_valid_json(self):
+        result = {"status": "success", "message": "m" * 2000, "note": "n" * 300, "count": 3}
+        for max_chars in (800, 120, 40):
+            output = compact_tool_output("other", result, max_chars=max_chars)
+            self.assertLessEqual(len(output), max_chars)
+            parsed = json.loads(output)
+            self.assertTrue(parsed["truncated"])
+            self.assertEqual(parsed["status"], "success")
+
+    def test_small_output_is_not_marked_truncated(self):
+        output = compact_tool_output("transfer_usdc", TRANSFER_RESULT)
+        self.assertNotIn("truncated", json.loads(output))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import base64
+import json
+import secrets
+import sys
+import time
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "cli-hello-world" / "flow"))
+
+from crossmint_stub import start_stub
+from library import wallet_utils
+from library.endpoints import CrossmintEndpoints
+from library.transaction_waiter import PollingWaiter, WebhookReceiver, WebhookWaiter, sign_webhook
+
+SECRET = "whsec_" + base64.b64encode(b"test webhook secret").decode()
+
+
+class WebhookTest(unittest.TestCase):
+    """The stand-in sends signed callbacks to a receiver, the waiter polls the stand-in when they don't arrive"""
+
+    def setUp(self):
+        self.receiver = WebhookReceiver(SECRET).start()
+        self.addCleanup(self.receiver.stop)
+        previous = wallet_utils.get_endpoints()
+        self.addCleanup(wallet_utils.set_endpoints, previous)
+
+    def start_stub(self, **options):
+        server, stub, base_url = start_stub(settle_time=0.05, webhook_url=self.receiver.url, **options)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        wallet_utils.set_endpoints(CrossmintEndpoints(base_url=base_url))
+        return stub
+
+    def approved_transaction(self, stub):
+        _, wallet = stub.create_wallet({"type": "evm-smart-wallet", "config": {}})
+        _, transaction = stub.create_transaction(wallet["address"], {"params": {"calls": []}})
+        stub.approve(transaction["id"], {"approvals": []})
+        return wallet["address"], transaction["id"]
+
+    def post(self, body: bytes, message_id: str, secret: str = SECRET) -> int:
+        timestamp = int(time.time())
+        request = urllib.request.Request(self.receiver.url, data=body, method="POST", headers={
+            "svix-id": message_id,
+            "svix-timestamp": str(timestamp),
+            "svix-signature": sign_webhook(secret, message_id, timestamp, body)
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_callback_resolves_the_wait(self):
+        stub = self.start_stub(webhook_secret=SECRET)
+        waiter = WebhookWaiter(self.receiver, PollingWaiter("key", poll_interval=5), fallback_after=5)
+        wallet, transaction_id = self.approved_transaction(stub)
+
+        result = waiter.wait(wallet, transaction_id, timeout=5)
+        self.assertEqual(result["source"], "webhook")
+        self.assertEqual(result["transaction_data"]["status"], "success")
+        self.assertEqual(waiter.fallback.stats()["polls"], 0)
+
+    def test_rejects_callbacks_with_the_wrong_signature(self):
+        other_secret = "whsec_" + base64.b64encode(secrets.token_bytes(16)).decode()
+        stub = self.start_stub(webhook_secret=other_secret)
+        _, transaction_id = self.approved_transaction(stub)
+
+        self.assertIsNone(self.receiver.wait_for(transaction_id, 1))
+        self.assertEqual(self.receiver.stats()["rejected"], 1)
+        self.assertEqual(stub.webhook_counts["failed"], 1)
+
+    def test_applies_a_redelivered_message_once(self):
+        body = json.dumps({"data": {"id": "tx1", "status": "success"}}).encode()
+        self.assertEqual(self.post(body, "msg_1"), 200)
+        self.assertEqual(self.post(body, "msg_1"), 200)
+        stats = self.receiver.stats()
+        self.assertEqual((stats["received"], stats["duplicates"]), (1, 1))
+        self.assertEqual(self.receiver.wait_for("tx1", 0)["status"], "success")
+
+    def test_falls_back_to_polling_when_callbacks_are_dropped(self):
+        stub = self.start_stub(webhook_secret=SECRET, webhook_drop_rate=1.0)
+        waiter = WebhookWaiter(self.receiver, PollingWaiter("key", poll_interval=0.05), fallback_after=0.3)
+        wallet, transaction_id = self.approved_transaction(stub)
+
+        started = time.monotonic()
+        result = waiter.wait(wallet, transaction_id, timeout=5)
+        self.assertEqual(result["source"], "poll")
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(stub.webhook_counts["dropped"], 1)
+
+        # The receiver has now been silent for longer than fallback_after, so the next wait polls right away
+        wallet, transaction_id = self.approved_transaction(stub)
+        started = time.monotonic()
+        result = waiter.wait(wallet, transaction_id, timeout=5)
+        self.assertEqual(result["source"], "poll")
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertEqual(waiter.stats()["polled_right_away"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from library.usage_meter import (
+    BudgetExceededError, UsageMeter, estimate_cost, process_snapshot, prometheus_metrics
+)
+
+
+class UsageMeterTest(unittest.TestCase):
+    def test_dated_snapshots_use_the_base_model_price(self):
+        self.assertAlmostEqual(estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 1_000_000), 0.75)
+        # The longest prefix wins, gpt-4o-mini isn't priced as gpt-4o
+        self.assertAlmostEqual(estimate_cost("gpt-4o-mini", 1_000_000, 0), 0.15)
+        self.assertEqual(estimate_cost("unknown-model", 1000, 1000), 0.0)
+
+    def test_records_session_and_process_totals(self):
+        before = process_snapshot()
+        meter = UsageMeter()
+        response = SimpleNamespace(model="gpt-4o", usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=500))
+        meter.record_chat_completion(response, 0.3)
+        meter.record_run(SimpleNamespace(model="gpt-4o", usage=None, status="failed"), 5)
+
+        session = meter.snapshot()["session"]
+        self.assertEqual((session["calls"], session["errors"], session["total_tokens"]), (2, 1, 1500))
+        self.assertAlmostEqual(session["cost_usd"], 0.0075)
+        self.assertEqual(session["calls_by_kind"], {"chat_completion": 1, "assistant_run": 1})
+        self.assertEqual(session["max_latency_s"], 5)
+
+        after = process_snapshot()
+        self.assertEqual(after["calls"] - before["calls"], 2)
+        self.assertEqual(after["total_tokens"] - before["total_tokens"], 1500)
+
+    def test_soft_limit_warns_once_and_hard_limit_raises(self):
+        meter = UsageMeter(soft_limit_tokens=100, hard_limit_tokens=300)
+        self.assertIsNone(meter.check_budget())
+
+        meter.record("chat_completion", "gpt-4o-mini", 100, 50, 0.1)
+        self.assertIn("soft usage budget", meter.check_budget())
+        self.assertIsNone(meter.check_budget())
+
+        meter.record("chat_completion", "gpt-4o-mini", 100, 50, 0.1)
+        with self.assertRaises(BudgetExceededError):
+            meter.check_budget()
+
+    def test_prometheus_histogram_is_cumulative(self):
+        UsageMeter().record("chat_completion", "gpt-4o-mini", 1, 1, 1.5)
+        samples = dict(line.rsplit(" ", 1) for line in prometheus_metrics().splitlines() if not line.startswith("#"))
+        buckets = [int(samples[f'agent_openai_latency_seconds_bucket{{le="{le}"}}'])
+                   for le in ["0.25", "1", "2", "64", "+Inf"]]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], int(samples["agent_openai_latency_seconds_count"]))
+
+
+if __name__ == "__main__":
+    unittest.main()